@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import event
+
+from .metrics import Histogram
+from .models import User
+from .tokens import token_revocations
+
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+# How long a stateless read trusts a user's token generation before re-reading it, i.e.
+# how long another worker keeps accepting a token revoked elsewhere
+AUTH_GENERATION_CACHE_SECONDS = float(os.getenv("AUTH_GENERATION_CACHE_SECONDS", "5"))
+
+# Latency of the users-table lookup a cache miss has to pay
+auth_user_lookup_seconds = Histogram(
+    "auth_user_lookup_seconds",
+    "Time spent loading the authenticated user from the database on a cache miss",
+)
+
+
+class AuthenticatedUser(NamedTuple):
+    """
+    The verified principal behind a bearer token, detached from any DB session.
+    """
+    id: int
+    email: str
+    locale: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "AuthenticatedUser":
+        return cls(id=user.id, email=user.email, locale=user.locale, is_active=user.is_active)
+
+
+class PrincipalCache:
+    """
+    Bounded LRU of verified principals keyed by access token.
+
+    Entries expire after `ttl_seconds` or at the token's own expiry, whichever comes
+    first, and can be dropped per user when the account changes.
+    """
+
+    def __init__(self, ttl_seconds: float = AUTH_CACHE_TTL_SECONDS, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[AuthenticatedUser, float]]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[AuthenticatedUser]:
+        now = time.time()
+        with self._lock:
+            cached = self._entries.get(token)
+            if cached is not None:
+                principal, expires_at = cached
+                if expires_at > now:
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    return principal
+                self._remove(token)
+            self.misses += 1
+        return None
+
+    def put(self, token: str, principal: AuthenticatedUser, token_expires_at: Optional[float] = None) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            self._remove(token)
+            self._entries[token] = (principal, expires_at)
+            self._tokens_by_user.setdefault(principal.id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def discard(self, token: str) -> None:
+        with self._lock:
+            self._remove(token)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """
+        Drops every cached token of a user, e.g. after deactivation.
+        """
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(token)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def _remove(self, token: str) -> None:
+        cached = self._entries.pop(token, None)
+        if cached is None:
+            return
+        user_id = cached[0].id
+        tokens = self._tokens_by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user_id]
+
+    @property
+    def estimated_seconds_saved(self) -> float:
+        """
+        Cache hits times the average users lookup a miss paid: the auth latency saved.
+        """
+        lookup = auth_user_lookup_seconds.snapshot()
+        average_lookup = (lookup["sum"] / lookup["count"]) if lookup["count"] else 0.0
+        return self.hits * average_lookup
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+            "lookup_latency": auth_user_lookup_seconds.snapshot(),
+            "estimated_seconds_saved": self.estimated_seconds_saved,
+        }
+
+
+# Process-wide principal cache used by get_current_user
+principal_cache = PrincipalCache()
+
+
+class GenerationCache:
+    """
+    Bounded LRU of users' current token generations for stateless reads, which check
+    the token's `gen` claim against it instead of loading the whole user. Entries are
+    trusted for `ttl_seconds`, so a revocation made by another worker (a bumped
+    generation in the users table) is seen within that window.
+    """
+
+    def __init__(self, ttl_seconds: float = AUTH_GENERATION_CACHE_SECONDS, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[int]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached is None:
+                return None
+            if cached[1] <= now:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return cached[0]
+
+    def put(self, user_id: int, generation: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._entries[user_id] = (generation, time.monotonic() + self.ttl_seconds)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Process-wide generation cache used by get_current_principal
+generation_cache = GenerationCache()
+
+
+@event.listens_for(User.is_active, "set")
+@event.listens_for(User.locale, "set")
+@event.listens_for(User.email, "set")
+def _invalidate_on_user_change(target: User, value, oldvalue, initiator) -> None:
+    if target.id is not None and value != oldvalue:
+        principal_cache.invalidate_user(target.id)
+
+
+@event.listens_for(User.is_active, "set")
+@event.listens_for(User.email, "set")
+def _revoke_tokens_on_user_change(target: User, value, oldvalue, initiator) -> None:
+    # Stateless tokens embed email and are trusted while active; deactivation or a new
+    # email must invalidate them. Locale is a snapshot refreshed at the next login.
+    if target.id is None or value == oldvalue or (initiator.key == "is_active" and value):
+        return
+    target.token_generation = (target.token_generation or 0) + 1
+    token_revocations.revoke_user(target.id, target.token_generation)
+    generation_cache.discard(target.id)
+
+
+# Exported symbols
+__all__ = [
+    "AUTH_CACHE_TTL_SECONDS",
+    "AuthenticatedUser",
+    "PrincipalCache",
+    "principal_cache",
+    "GenerationCache",
+    "generation_cache",
+    "auth_user_lookup_seconds",
+]
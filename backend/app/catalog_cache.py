@@ -0,0 +1,303 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .i18n import DEFAULT_LOCALE, locale_negotiator, parse_i18n_text
+from .models import NotificationType, NotificationTypeTranslation
+from .schemas import NotificationTypeListResponse, NotificationTypeOut
+from .serialization import (
+    CATALOG_FIELDS,
+    COMPACT_DEFAULT_FIELDS,
+    FAST_JSON_RESPONSES,
+    JSON_MEDIA_TYPE,
+    catalog_items,
+    dumps,
+    encode_catalog,
+)
+from .translations import I18N_TRANSLATIONS_TABLE, catalog_columns, translation_locales
+
+logger = logging.getLogger("notification_preferences_app.catalog_cache")
+
+# How long a loaded catalog is trusted before its version stamp is re-checked
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "30"))
+# Previous catalog versions remembered for `since=` delta responses
+CATALOG_DELTA_HISTORY = int(os.getenv("CATALOG_DELTA_HISTORY", "16"))
+# Encoded field selections / encodings / deltas kept per catalog version
+CATALOG_VARIANT_CACHE_SIZE = 256
+# Variant key shared by every `since` that is not a remembered version
+_UNKNOWN_SINCE = "(unknown)"
+
+
+class CatalogEntry(NamedTuple):
+    """
+    A pre-serialized catalog response body for one locale.
+    """
+    version: str
+    locale: str
+    body: bytes
+    etag: str
+    items: List[dict]
+
+
+class _CatalogSnapshot(NamedTuple):
+    version: str
+    payloads: Dict[str, CatalogEntry]
+    type_ids: Dict[str, int]
+    variants: Dict[tuple, CatalogEntry]
+
+
+async def _compute_version(db: AsyncSession) -> str:
+    """
+    Derives the catalog version stamp from the newest `updated_at` and the row count,
+    so inserts, updates and deletes all produce a new version. With the translations
+    table in use, its rows are stamped the same way.
+    """
+    tables = [NotificationType]
+    if I18N_TRANSLATIONS_TABLE:
+        tables.append(NotificationTypeTranslation)
+    stamps = []
+    for table in tables:
+        result = await db.execute(select(func.count(), func.max(table.updated_at)).select_from(table))
+        count, last_updated = result.one()
+        stamp = last_updated.isoformat() if isinstance(last_updated, datetime) else "0"
+        stamps.append(f"{count}-{stamp}")
+    return "/".join(stamps)
+
+
+def _compute_etag(version: str, locale: str, variant: str = "") -> str:
+    """
+    Strong ETag for the catalog body served for `locale` at `version`; `variant`
+    distinguishes field selections, encodings and deltas of the same catalog.
+    """
+    key = f"{version}:{locale}:{variant}" if variant else f"{version}:{locale}"
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _catalog_entry(version: str, locale: str, rows: List[Sequence]) -> CatalogEntry:
+    items = catalog_items(rows, locale)
+    if FAST_JSON_RESPONSES:
+        body = dumps({"notification_types": items})
+    else:
+        result = [NotificationTypeOut(**item) for item in items]
+        body = NotificationTypeListResponse(notification_types=result).model_dump_json().encode("utf-8")
+    return CatalogEntry(version, locale, body, _compute_etag(version, locale), items)
+
+
+def _available_locales(rows: List[Sequence]) -> List[str]:
+    locales = {DEFAULT_LOCALE}
+    for row in rows:
+        locales.update(row[1] or {})
+        locales.update(parse_i18n_text(row[4]) or {})
+    return sorted(locales)
+
+
+def _catalog_query(locale: str):
+    return (
+        select(*catalog_columns(locale), NotificationType.id)
+        .where(NotificationType.is_active == True)
+        .order_by(NotificationType.key.asc())
+    )
+
+
+class CatalogCache:
+    """
+    In-process cache of the active notification type catalog.
+
+    The catalog is loaded once and serialized for every locale it contains. Within the
+    TTL window a lookup is a single dict access; after it, one cheap version query
+    decides whether the snapshot is still current.
+    """
+
+    def __init__(self, ttl_seconds: float = CATALOG_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[_CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        # version -> locale -> key -> item, oldest first
+        self._history: "OrderedDict[str, Dict[str, Dict[str, dict]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    async def get(self, db: AsyncSession, locale: str) -> CatalogEntry:
+        """
+        Returns the serialized catalog for `locale`, falling back to the default locale
+        when no notification type is translated into it.
+        """
+        snapshot = await self._current(db)
+        entry = snapshot.payloads.get(locale)
+        if entry is None:
+            entry = snapshot.payloads[DEFAULT_LOCALE]
+        return entry
+
+    async def get_variant(
+        self,
+        db: AsyncSession,
+        locale: str,
+        fields: Optional[Tuple[str, ...]] = None,
+        media_type: str = JSON_MEDIA_TYPE,
+        since: Optional[str] = None,
+    ) -> CatalogEntry:
+        """
+        Returns the catalog for `locale` restricted to `fields`, in `media_type`, and,
+        with `since`, only the types changed since that catalog version. Variants are
+        encoded once per catalog version and then served from memory.
+        """
+        snapshot = await self._current(db)
+        base = snapshot.payloads.get(locale) or snapshot.payloads[DEFAULT_LOCALE]
+        if fields is None and media_type == JSON_MEDIA_TYPE and since is None:
+            return base
+        if fields is None:
+            fields = CATALOG_FIELDS if media_type == JSON_MEDIA_TYPE else COMPACT_DEFAULT_FIELDS
+        if since is not None and since not in self._history:
+            # Every unknown or expired version gets the same full response, so arbitrary
+            # client values cannot grow the variant cache
+            since = _UNKNOWN_SINCE
+        variant_key = (base.locale, fields, media_type, since)
+        entry = snapshot.variants.get(variant_key)
+        if entry is None:
+            entry = self._build_variant(snapshot.version, base, fields, media_type, since)
+            if len(snapshot.variants) >= CATALOG_VARIANT_CACHE_SIZE:
+                snapshot.variants.clear()
+            snapshot.variants[variant_key] = entry
+        return entry
+
+    def _build_variant(
+        self, version: str, base: CatalogEntry, fields: Tuple[str, ...], media_type: str, since: Optional[str],
+    ) -> CatalogEntry:
+        items = base.items
+        extra: dict = {"version": version}
+        if since is not None:
+            previous = self._history.get(since, {}).get(base.locale)
+            if previous is None:
+                # Unknown or expired version (or a locale added since): the delta is the whole catalog
+                extra.update(since=None if since == _UNKNOWN_SINCE else since, full=True, removed=[])
+            else:
+                current_keys = {item["key"] for item in items}
+                items = [item for item in items if previous.get(item["key"]) != item]
+                extra.update(since=since, full=False, removed=sorted(set(previous) - current_keys))
+        body = encode_catalog(items, fields, media_type, extra)
+        etag = _compute_etag(version, base.locale, f"{','.join(fields)}:{media_type}:{since or ''}")
+        return CatalogEntry(version, base.locale, body, etag, items)
+
+    async def type_ids(self, db: AsyncSession) -> Dict[str, int]:
+        """
+        Returns the key -> id mapping of the active notification types.
+        """
+        snapshot = await self._current(db)
+        return snapshot.type_ids
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        """
+        Loads the catalog if nothing is cached yet, so the locale negotiator knows the
+        catalog's locales before the first request is negotiated. Not counted as a
+        lookup: the request's own `get` or `get_variant` counts it.
+        """
+        if self._snapshot is None:
+            await self._revalidate(db, count=False)
+
+    async def refresh(self, db: AsyncSession) -> str:
+        """
+        Forces a reload of the catalog from the database and returns the new version.
+        """
+        async with self._lock:
+            snapshot = await self._load(db, await _compute_version(db))
+        return snapshot.version
+
+    def invalidate(self) -> None:
+        """
+        Drops the cached catalog; the next lookup reloads it from the database.
+        """
+        self._snapshot = None
+        self._checked_at = 0.0
+
+    @property
+    def version(self) -> Optional[str]:
+        snapshot = self._snapshot
+        return snapshot.version if snapshot else None
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+        }
+
+    async def _current(self, db: AsyncSession) -> _CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() - self._checked_at >= self.ttl_seconds:
+            return await self._revalidate(db)
+        self.hits += 1
+        return snapshot
+
+    async def _revalidate(self, db: AsyncSession, count: bool = True) -> _CatalogSnapshot:
+        async with self._lock:
+            snapshot = self._snapshot
+            # Another request may have revalidated while this one waited for the lock
+            if snapshot is not None and time.monotonic() - self._checked_at < self.ttl_seconds:
+                if count:
+                    self.hits += 1
+                return snapshot
+            version = await _compute_version(db)
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == version:
+                self._checked_at = time.monotonic()
+                if count:
+                    self.hits += 1
+                return snapshot
+            if count:
+                self.misses += 1
+            return await self._load(db, version)
+
+    async def _load(self, db: AsyncSession, version: str) -> _CatalogSnapshot:
+        if I18N_TRANSLATIONS_TABLE:
+            # One query per locale, each returning only that locale's strings
+            payloads = {}
+            for locale in await translation_locales(db):
+                rows = (await db.execute(_catalog_query(locale))).all()
+                payloads[locale] = _catalog_entry(version, locale, rows)
+        else:
+            rows = (await db.execute(_catalog_query(DEFAULT_LOCALE))).all()
+            payloads = {locale: _catalog_entry(version, locale, rows) for locale in _available_locales(rows)}
+        locale_negotiator.set_supported(payloads)
+        type_ids = {row[0]: row[5] for row in rows}
+        self._remember(version, payloads)
+        snapshot = _CatalogSnapshot(version, payloads, type_ids, {})
+        self._snapshot = snapshot
+        self._checked_at = time.monotonic()
+        self.refreshes += 1
+        logger.info(f"Notification catalog loaded (version={version}, locales={len(payloads)})")
+        return snapshot
+
+    def _remember(self, version: str, payloads: Dict[str, CatalogEntry]) -> None:
+        self._history[version] = {
+            locale: {item["key"]: item for item in entry.items} for locale, entry in payloads.items()
+        }
+        self._history.move_to_end(version)
+        while len(self._history) > CATALOG_DELTA_HISTORY:
+            self._history.popitem(last=False)
+
+
+# Process-wide catalog cache used by the notifications router
+catalog_cache = CatalogCache()
+
+# Exported symbols
+__all__ = [
+    "CATALOG_CACHE_TTL_SECONDS",
+    "CATALOG_DELTA_HISTORY",
+    "CatalogEntry",
+    "CatalogCache",
+    "catalog_cache",
+]
@@ -0,0 +1,447 @@
+"""
+Change feed for the notification catalog.
+
+Every committed change to a NotificationType (or one of its translations) is published as
+a CatalogChange. Each worker subscribes to the feed to drop its catalog cache, and the
+/notifications/stream endpoint relays the events to browsers as Server-Sent Events.
+
+Backends:
+
+* postgres - events travel through LISTEN/NOTIFY on CHANGE_FEED_CHANNEL, so every worker
+  (on every node) sees them. The application sends one NOTIFY per flush inside the
+  writing transaction, so PostgreSQL delivers it exactly when the transaction commits
+  (and never on rollback). Changes made outside the application are covered by the
+  trigger installed with `python -m app.change_feed install-trigger`; the trigger stays
+  silent for transactions the application already notifies about, so nothing is
+  delivered twice.
+* memory - in-process fan-out only; used with SQLite, in tests and as the fallback.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from typing import AsyncIterator, List, NamedTuple, Optional, Sequence, Set
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from .catalog_cache import catalog_cache
+from .database import DATABASE_URL, engine, normalize_database_url
+from .metrics import CallbackMetric
+from .models import NotificationType, NotificationTypeTranslation
+
+logger = logging.getLogger("notification_preferences_app.change_feed")
+
+# "auto" picks postgres when DATABASE_URL points at PostgreSQL, memory otherwise
+CHANGE_FEED_BACKEND = os.getenv("CHANGE_FEED_BACKEND", "auto").lower()
+CHANGE_FEED_CHANNEL = os.getenv("CHANGE_FEED_CHANNEL", "notification_catalog_changes")
+# Events buffered per subscriber; the oldest are dropped when a client falls behind
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "100"))
+CHANGE_FEED_RECONNECT_SECONDS = float(os.getenv("CHANGE_FEED_RECONNECT_SECONDS", "5"))
+# Open /notifications/stream connections allowed per worker
+CHANGE_FEED_MAX_SUBSCRIBERS = int(os.getenv("CHANGE_FEED_MAX_SUBSCRIBERS", "1000"))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_RETRY_MILLISECONDS = 5000
+# NOTIFY payloads must stay below 8000 bytes
+NOTIFY_PAYLOAD_LIMIT = 7500
+# Transaction-local setting telling the trigger the application sends the NOTIFY
+APP_NOTIFY_SETTING = "notification_prefs.app_notify"
+
+_CATALOG_MODELS = (NotificationType, NotificationTypeTranslation)
+
+
+class CatalogChange(NamedTuple):
+    """
+    One catalog change. `op` is insert/update/delete, or "resync" when events may have
+    been missed (e.g. after the LISTEN connection was re-established).
+    """
+    op: str
+    table: str
+    id: Optional[int] = None
+    key: Optional[str] = None
+
+    def to_json(self) -> str:
+        return json.dumps(self._asdict(), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, payload: str) -> "CatalogChange":
+        data = json.loads(payload)
+        return cls(
+            op=str(data.get("op", "update")),
+            table=str(data.get("table", NotificationType.__tablename__)),
+            id=data.get("id"),
+            key=data.get("key"),
+        )
+
+
+RESYNC = CatalogChange("resync", NotificationType.__tablename__)
+
+
+def parse_changes(payload: str) -> List[CatalogChange]:
+    """
+    Decodes a NOTIFY payload: a JSON array of changes (application) or a single change
+    object (trigger).
+    """
+    data = json.loads(payload)
+    items = data if isinstance(data, list) else [data]
+    return [CatalogChange.from_json(json.dumps(item)) for item in items]
+
+
+def notify_payloads(changes: Sequence[CatalogChange], limit: int = NOTIFY_PAYLOAD_LIMIT) -> List[str]:
+    """
+    Packs changes into as few JSON array payloads as fit under the NOTIFY size limit.
+    """
+    payloads: List[str] = []
+    batch: List[str] = []
+    size = 2
+    for change in changes:
+        encoded = change.to_json()
+        if batch and size + len(encoded) + 1 > limit:
+            payloads.append(f"[{','.join(batch)}]")
+            batch, size = [], 2
+        batch.append(encoded)
+        size += len(encoded) + 1
+    if batch:
+        payloads.append(f"[{','.join(batch)}]")
+    return payloads
+
+
+class ChangeFeed:
+    """
+    In-process fan-out of catalog changes to subscriber queues (the memory backend).
+    """
+
+    def __init__(self, queue_size: int = CHANGE_FEED_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    @property
+    def notifies_in_transaction(self) -> bool:
+        """
+        True when changes are published by NOTIFY from the writing transaction rather
+        than dispatched locally after commit.
+        """
+        return False
+
+    def dispatch(self, change: CatalogChange) -> None:
+        """
+        Delivers `change` to every local subscriber without blocking.
+        """
+        self.published += 1
+        for queue in list(self._subscribers):
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(change)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class PostgresChangeFeed(ChangeFeed):
+    """
+    Fan-out fed by LISTEN on a dedicated asyncpg connection, reconnecting with a fixed
+    delay. The connection is only used for listening: changes are published by NOTIFY
+    from the writing transaction (see _notify_catalog_changes), so every worker,
+    this one included, receives them through LISTEN.
+    """
+
+    def __init__(self, dsn: str, channel: str = CHANGE_FEED_CHANNEL, queue_size: int = CHANGE_FEED_QUEUE_SIZE):
+        super().__init__(queue_size)
+        self.dsn = dsn
+        self.channel = channel
+        self._connection = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def notifies_in_transaction(self) -> bool:
+        return True
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            changes = parse_changes(payload)
+        except (ValueError, TypeError, AttributeError):
+            logger.warning(f"Ignoring malformed change feed payload: {payload!r}")
+            return
+        for change in changes:
+            self.dispatch(change)
+
+    async def _listen(self) -> None:
+        import asyncpg
+
+        connected_before = False
+        while True:
+            closed = asyncio.Event()
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(self.channel, self._on_notify)
+                self._connection = connection
+                logger.info(f"Listening for catalog changes on {self.channel}")
+                if connected_before:
+                    self.dispatch(RESYNC)
+                connected_before = True
+                await closed.wait()
+                logger.warning("Change feed connection lost")
+            except asyncio.CancelledError:
+                if self._connection is not None:
+                    await self._connection.close()
+                    self._connection = None
+                raise
+            except Exception as exc:
+                logger.warning(f"Change feed connection failed: {exc}")
+            self._connection = None
+            await asyncio.sleep(CHANGE_FEED_RECONNECT_SECONDS)
+
+
+def _listen_dsn(url: str) -> str:
+    return make_url(normalize_database_url(url)).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def create_change_feed(backend: str = CHANGE_FEED_BACKEND, url: str = DATABASE_URL) -> ChangeFeed:
+    if backend == "auto":
+        backend = "postgres" if make_url(normalize_database_url(url)).get_backend_name() == "postgresql" else "memory"
+    if backend == "postgres":
+        return PostgresChangeFeed(_listen_dsn(url))
+    if backend != "memory":
+        raise ValueError(f"Unsupported change feed backend: {backend}")
+    return ChangeFeed()
+
+
+# Process-wide change feed
+change_feed = create_change_feed()
+_invalidator: Optional[asyncio.Task] = None
+
+CallbackMetric("change_feed_subscribers", "Open catalog change subscriptions", lambda: change_feed.subscriber_count)
+CallbackMetric("change_feed_events_total", "Catalog changes delivered to this worker", lambda: change_feed.published, "counter")
+CallbackMetric("change_feed_dropped_total", "Catalog changes dropped for slow subscribers", lambda: change_feed.dropped, "counter")
+
+
+def _change_for(instance, op: str) -> CatalogChange:
+    if isinstance(instance, NotificationType):
+        return CatalogChange(op, NotificationType.__tablename__, instance.id, instance.key)
+    return CatalogChange(op, NotificationTypeTranslation.__tablename__, instance.notification_type_id)
+
+
+def _notifies_in_transaction(session: Session) -> bool:
+    return change_feed.notifies_in_transaction and session.get_bind().dialect.name == "postgresql"
+
+
+@event.listens_for(Session, "before_flush")
+def _mark_app_notify(session: Session, flush_context, instances) -> None:
+    if not _notifies_in_transaction(session) or session.info.get("catalog_notify_marked"):
+        return
+    pending = (*session.new, *session.dirty, *session.deleted)
+    if any(isinstance(instance, _CATALOG_MODELS) for instance in pending):
+        # The trigger skips this transaction; the after_flush NOTIFY below covers it
+        session.connection().execute(
+            text("SELECT set_config(:name, 'on', true)"), {"name": APP_NOTIFY_SETTING}
+        )
+        session.info["catalog_notify_marked"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_catalog_changes(session: Session, flush_context) -> None:
+    changes = []
+    for op, instances in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for instance in instances:
+            if isinstance(instance, _CATALOG_MODELS) and (op != "update" or session.is_modified(instance)):
+                changes.append(_change_for(instance, op))
+    if not changes:
+        return
+    if _notifies_in_transaction(session):
+        # Delivered by PostgreSQL when (and only if) the transaction commits
+        connection = session.connection()
+        for payload in notify_payloads(changes):
+            connection.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": change_feed.channel, "payload": payload},
+            )
+    else:
+        session.info.setdefault("catalog_changes", []).extend(changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_catalog_changes(session: Session) -> None:
+    session.info.pop("catalog_notify_marked", None)
+    for change in session.info.pop("catalog_changes", None) or ():
+        change_feed.dispatch(change)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session: Session) -> None:
+    session.info.pop("catalog_notify_marked", None)
+    session.info.pop("catalog_changes", None)
+
+
+async def _invalidate_catalog_on_change() -> None:
+    queue = change_feed.subscribe()
+    try:
+        while True:
+            change = await queue.get()
+            catalog_cache.invalidate()
+            logger.info(f"Catalog cache invalidated by change feed ({change.op} {change.table} {change.key or change.id or ''})")
+    finally:
+        change_feed.unsubscribe(queue)
+
+
+async def start_change_feed() -> None:
+    """
+    Starts the feed and the task that keeps this worker's catalog cache in sync.
+    """
+    global _invalidator
+    await change_feed.start()
+    if _invalidator is None:
+        _invalidator = asyncio.create_task(_invalidate_catalog_on_change())
+
+
+async def stop_change_feed() -> None:
+    global _invalidator
+    if _invalidator is not None:
+        _invalidator.cancel()
+        try:
+            await _invalidator
+        except asyncio.CancelledError:
+            pass
+        _invalidator = None
+    await change_feed.stop()
+
+
+def _sse(event_name: str, data: str) -> bytes:
+    return f"event: {event_name}\ndata: {data}\n\n".encode("utf-8")
+
+
+async def iter_catalog_events(feed: Optional[ChangeFeed] = None) -> AsyncIterator[bytes]:
+    """
+    Server-Sent Events stream: a `ready` event, then one `catalog` event per change and a
+    comment line every SSE_HEARTBEAT_SECONDS to keep proxies from closing the connection.
+    """
+    feed = feed or change_feed
+    queue = feed.subscribe()
+    try:
+        yield f"retry: {SSE_RETRY_MILLISECONDS}\n\n".encode("utf-8")
+        yield _sse("ready", json.dumps({"version": catalog_cache.version}))
+        while True:
+            try:
+                change = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            yield _sse("catalog", change.to_json())
+    finally:
+        feed.unsubscribe(queue)
+
+
+_TRIGGER_SQL = [
+    f"""
+    CREATE OR REPLACE FUNCTION notify_catalog_change() RETURNS trigger AS $$
+    DECLARE
+        changed jsonb;
+    BEGIN
+        -- The application already sends a NOTIFY for its own transactions
+        IF current_setting('{APP_NOTIFY_SETTING}', true) = 'on' THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'DELETE' THEN
+            changed := to_jsonb(OLD);
+        ELSE
+            changed := to_jsonb(NEW);
+        END IF;
+        PERFORM pg_notify('{CHANGE_FEED_CHANNEL}', json_build_object(
+            'op', lower(TG_OP),
+            'table', TG_TABLE_NAME,
+            'id', COALESCE(changed->>'notification_type_id', changed->>'id')::int,
+            'key', changed->>'key'
+        )::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    *(
+        statement
+        for table in (NotificationType.__tablename__, NotificationTypeTranslation.__tablename__)
+        for statement in (
+            f"DROP TRIGGER IF EXISTS {table}_notify_change ON {table}",
+            f"CREATE TRIGGER {table}_notify_change AFTER INSERT OR UPDATE OR DELETE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION notify_catalog_change()",
+        )
+    ),
+]
+
+
+async def install_trigger() -> None:
+    """
+    Installs NOTIFY triggers so catalog edits made outside the application (SQL consoles,
+    migrations) reach the feed as well.
+    """
+    async with engine.begin() as conn:
+        if conn.dialect.name != "postgresql":
+            raise RuntimeError("The change feed trigger requires PostgreSQL")
+        for statement in _TRIGGER_SQL:
+            await conn.execute(text(statement))
+    await engine.dispose()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage the notification catalog change feed.")
+    parser.add_argument("command", choices=("install-trigger",))
+    parser.parse_args(argv)
+    asyncio.run(install_trigger())
+    print(f"Installed catalog change triggers on channel {CHANGE_FEED_CHANNEL}", file=sys.stderr)
+    return 0
+
+
+# Exported symbols
+__all__ = [
+    "CHANGE_FEED_CHANNEL",
+    "CHANGE_FEED_MAX_SUBSCRIBERS",
+    "CatalogChange",
+    "parse_changes",
+    "notify_payloads",
+    "ChangeFeed",
+    "PostgresChangeFeed",
+    "create_change_feed",
+    "change_feed",
+    "start_change_feed",
+    "stop_change_feed",
+    "iter_catalog_events",
+    "install_trigger",
+    "main",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Streaming export of user notification preferences.
+
+Rows are read in keyset-paginated pages ordered by UserNotificationPreference.id, and each
+page is consumed through a server-side cursor, so memory stays flat regardless of table
+size. The cursor token is the last exported preference id; passing it back resumes the
+export right after that row.
+
+Command line usage (from the backend directory):
+
+    python -m app.export --format ndjson --output preferences.ndjson
+    python -m app.export --format csv --cursor 123456 >> preferences.csv
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import sys
+from typing import AsyncIterator, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+
+from .database import AsyncSessionLocal
+from .models import NotificationType, UserNotificationPreference
+
+logger = logging.getLogger("notification_preferences_app.export")
+
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "50000"))
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "1000"))
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_COLUMNS = ("id", "user_id", "notification_type_id", "notification_type_key", "enabled", "updated_at")
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def parse_cursor(cursor: Optional[str]) -> int:
+    """
+    Converts a cursor token into the preference id to resume after. Raises ValueError.
+    """
+    if not cursor:
+        return 0
+    after_id = int(cursor)
+    if after_id < 0:
+        raise ValueError("cursor must not be negative")
+    return after_id
+
+
+async def iter_preference_rows(after_id: int = 0) -> AsyncIterator[Sequence]:
+    last_id = after_id
+    while True:
+        stmt = (
+            select(
+                UserNotificationPreference.id,
+                UserNotificationPreference.user_id,
+                UserNotificationPreference.notification_type_id,
+                NotificationType.key,
+                UserNotificationPreference.enabled,
+                UserNotificationPreference.updated_at,
+            )
+            .join(NotificationType, NotificationType.id == UserNotificationPreference.notification_type_id)
+            .where(UserNotificationPreference.id > last_id)
+            .order_by(UserNotificationPreference.id)
+            .limit(EXPORT_PAGE_SIZE)
+            .execution_options(yield_per=EXPORT_FETCH_SIZE)
+        )
+        page_rows = 0
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(stmt)
+            async for row in result:
+                page_rows += 1
+                last_id = row[0]
+                yield row
+        if page_rows < EXPORT_PAGE_SIZE:
+            return
+
+
+def _format_ndjson(rows: Sequence[Sequence]) -> str:
+    lines = []
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        record["updated_at"] = record["updated_at"].isoformat() if record["updated_at"] else None
+        lines.append(json.dumps(record, separators=(",", ":")))
+    return "\n".join(lines) + "\n"
+
+
+def _format_csv(rows: Sequence[Sequence], header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow(
+            [value.isoformat() if hasattr(value, "isoformat") else value for value in row]
+        )
+    return buffer.getvalue()
+
+
+def _encode(fmt: str, rows: Sequence[Sequence], header: bool) -> bytes:
+    if fmt == "ndjson":
+        return _format_ndjson(rows).encode("utf-8") if rows else b""
+    return _format_csv(rows, header).encode("utf-8")
+
+
+async def iter_export(fmt: str, after_id: int = 0) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Yields (last_id, chunk) pairs of encoded output, one chunk per fetch batch. The CSV
+    header is only written on a fresh export so resumed output can be appended.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    header = fmt == "csv" and after_id == 0
+    batch = []
+    async for row in iter_preference_rows(after_id):
+        batch.append(row)
+        if len(batch) >= EXPORT_FETCH_SIZE:
+            yield batch[-1][0], _encode(fmt, batch, header)
+            header = False
+            batch = []
+    if batch or header:
+        yield (batch[-1][0] if batch else after_id), _encode(fmt, batch, header)
+
+
+async def iter_export_bytes(fmt: str, after_id: int = 0) -> AsyncIterator[bytes]:
+    async for _, chunk in iter_export(fmt, after_id):
+        yield chunk
+
+
+async def _run_cli(fmt: str, after_id: int, output: Optional[str]) -> int:
+    last_id = after_id
+    stream = open(output, "ab" if after_id else "wb") if output else sys.stdout.buffer
+    try:
+        async for last_id, chunk in iter_export(fmt, after_id):
+            stream.write(chunk)
+        stream.flush()
+    except BaseException:
+        print(f"Export interrupted; resume with --cursor {last_id}", file=sys.stderr)
+        raise
+    finally:
+        if output:
+            stream.close()
+    print(f"Export complete; last cursor {last_id}", file=sys.stderr)
+    return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export user notification preferences.")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--cursor", default=None, help="Resume after this preference id")
+    parser.add_argument("--output", default=None, help="File to write (appended when resuming); stdout by default")
+    args = parser.parse_args(argv)
+    try:
+        after_id = parse_cursor(args.cursor)
+    except ValueError:
+        parser.error("--cursor must be a non-negative integer")
+    return asyncio.run(_run_cli(args.format, after_id, args.output))
+
+
+# Exported symbols
+__all__ = [
+    "EXPORT_FORMATS",
+    "EXPORT_MEDIA_TYPES",
+    "parse_cursor",
+    "iter_preference_rows",
+    "iter_export",
+    "iter_export_bytes",
+    "main",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
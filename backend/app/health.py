@@ -0,0 +1,190 @@
+"""
+Liveness and readiness checks.
+
+Liveness only says the event loop is answering. Readiness additionally checks the
+database (a `SELECT 1` with a timeout), connection pool saturation and event-loop lag.
+The readiness result is cached for HEALTH_CACHE_SECONDS and concurrent probes share the
+check in flight, so however many probes arrive, the database is pinged at most once per
+interval per worker. Draining is never cached: it fails readiness immediately.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.middleware.httpsredirect import HTTPSRedirectMiddleware
+from starlette.types import Receive, Scope, Send
+
+from .database import engine
+from .lifecycle import server_state
+from .loop_monitor import loop_monitor
+from .metrics import CallbackMetric, Counter
+
+logger = logging.getLogger("notification_preferences_app.health")
+
+# Seconds a readiness result is reused before the checks run again
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "2"))
+# Seconds the database ping may take before the database counts as down
+HEALTH_DB_TIMEOUT_SECONDS = float(os.getenv("HEALTH_DB_TIMEOUT_SECONDS", "1"))
+# Fraction of pool capacity (pool size + overflow) checked out at which readiness fails
+HEALTH_POOL_SATURATION = float(os.getenv("HEALTH_POOL_SATURATION", "0.9"))
+# Event-loop lag in seconds at which readiness fails
+HEALTH_MAX_LOOP_LAG_SECONDS = float(os.getenv("HEALTH_MAX_LOOP_LAG_SECONDS", "0.5"))
+HEALTH_PATH = "/health"
+
+CheckResult = Dict[str, object]
+
+readiness_checks = Counter("health_readiness_checks_total", "Readiness checks run (cache misses)", ["result"])
+
+
+async def check_database(engine: AsyncEngine, timeout: float = HEALTH_DB_TIMEOUT_SECONDS) -> CheckResult:
+    """
+    Runs `SELECT 1`; waiting for a pooled connection counts against the timeout.
+    """
+    started = time.perf_counter()
+
+    async def ping() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.wait_for(ping(), timeout)
+    except asyncio.TimeoutError:
+        return {"ok": False, "error": f"timed out after {timeout}s"}
+    except Exception as exc:
+        return {"ok": False, "error": type(exc).__name__}
+    return {"ok": True, "latency_seconds": round(time.perf_counter() - started, 4)}
+
+
+def check_pool(engine: AsyncEngine, threshold: float = HEALTH_POOL_SATURATION) -> CheckResult:
+    """
+    Compares checked-out connections with the pool capacity. Pools without a fixed
+    capacity (e.g. SQLite's static pools, or unlimited overflow) always pass.
+    """
+    pool = engine.pool
+    if not hasattr(pool, "checkedout") or not hasattr(pool, "size"):
+        return {"ok": True, "pool": type(pool).__name__}
+    checked_out = pool.checkedout()
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    if max_overflow < 0:
+        return {"ok": True, "checked_out": checked_out, "capacity": None}
+    capacity = pool.size() + max_overflow
+    saturation = checked_out / capacity if capacity else 0.0
+    return {
+        "ok": saturation < threshold,
+        "checked_out": checked_out,
+        "capacity": capacity,
+        "saturation": round(saturation, 3),
+    }
+
+
+async def measure_loop_lag() -> float:
+    """
+    Seconds between scheduling a callback and the loop running it, i.e. how long
+    ready work is queued behind other tasks.
+    """
+    loop = asyncio.get_running_loop()
+    ran = loop.create_future()
+    started = time.perf_counter()
+    loop.call_soon(ran.set_result, None)
+    await ran
+    return time.perf_counter() - started
+
+
+async def check_loop_lag(threshold: float = HEALTH_MAX_LOOP_LAG_SECONDS) -> CheckResult:
+    lag = await measure_loop_lag()
+    if loop_monitor.running:
+        # The continuous sampler also sees lag between probes
+        lag = max(lag, loop_monitor.last_lag)
+    return {"ok": lag < threshold, "lag_seconds": round(lag, 4)}
+
+
+class ReadinessProbe:
+    """
+    Caches the combined readiness checks for `ttl` seconds; concurrent callers during
+    a refresh await the same check instead of starting their own.
+    """
+
+    def __init__(self, engine: AsyncEngine, ttl: float = HEALTH_CACHE_SECONDS):
+        self.engine = engine
+        self.ttl = ttl
+        self._result: Optional[Tuple[bool, CheckResult]] = None
+        self._checked_at = 0.0
+        self._inflight: Optional[asyncio.Future] = None
+
+    @property
+    def ready(self) -> Optional[bool]:
+        """
+        Outcome of the last check (None before the first one).
+        """
+        return None if self._result is None else self._result[0]
+
+    async def _run_checks(self) -> Tuple[bool, CheckResult]:
+        database, loop_lag = await asyncio.gather(check_database(self.engine), check_loop_lag())
+        checks = {"database": database, "pool": check_pool(self.engine), "event_loop": loop_lag}
+        ready = all(check["ok"] for check in checks.values())
+        if not ready:
+            failing = [name for name, check in checks.items() if not check["ok"]]
+            logger.warning(f"Readiness check failed: {', '.join(failing)}")
+        readiness_checks.inc(result="ready" if ready else "not_ready")
+        return ready, checks
+
+    async def check(self) -> Tuple[bool, CheckResult]:
+        """
+        Returns (ready, checks), running the checks only when the cached result expired.
+        """
+        if server_state.draining:
+            return False, {"draining": {"ok": False}}
+        if self._result is not None and time.monotonic() - self._checked_at < self.ttl:
+            return self._result
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._refresh())
+        # Shielded so a probe that gives up does not cancel the check for the others
+        return await asyncio.shield(self._inflight)
+
+    async def _refresh(self) -> Tuple[bool, CheckResult]:
+        try:
+            self._result = await self._run_checks()
+            self._checked_at = time.monotonic()
+            return self._result
+        finally:
+            self._inflight = None
+
+
+class HealthExemptHTTPSRedirectMiddleware(HTTPSRedirectMiddleware):
+    """
+    HTTPS redirect that serves /health and /health/* over plain HTTP. Probes from inside
+    the container call the app directly; a 307 would pass `curl -f` whatever the status.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if scope["type"] == "http" and (path == HEALTH_PATH or path.startswith(HEALTH_PATH + "/")):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Process-wide readiness probe for the shared engine
+readiness_probe = ReadinessProbe(engine)
+
+CallbackMetric(
+    "health_ready",
+    "1 when the last readiness check passed, 0 when it failed or the process is draining",
+    lambda: 0 if server_state.draining or readiness_probe.ready is False else 1,
+)
+
+# Exported symbols
+__all__ = [
+    "HEALTH_CACHE_SECONDS",
+    "check_database",
+    "check_pool",
+    "check_loop_lag",
+    "measure_loop_lag",
+    "ReadinessProbe",
+    "readiness_probe",
+    "HealthExemptHTTPSRedirectMiddleware",
+]
@@ -1,42 +1,178 @@
-from typing import Optional
+import json
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl
 from fastapi import Request
-import threading
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import os
+
+DEFAULT_LOCALE = "en"
+# Locales assumed before the catalog has been loaded (the catalog cache replaces them)
+SUPPORTED_LOCALES = [
+    locale.strip().lower()
+    for locale in os.getenv("SUPPORTED_LOCALES", "en,fr").split(",")
+    if locale.strip()
+]
+LOCALE_CACHE_SIZE = int(os.getenv("LOCALE_CACHE_SIZE", "1024"))
+# Longer Accept-Language headers are truncated before parsing
+MAX_ACCEPT_LANGUAGE_LENGTH = 512
+
+def parse_accept_language(header: str) -> List[str]:
+    """
+    Parses an Accept-Language header into language tags ordered by q-value (highest first,
+    header order breaking ties). Tags with q=0 or a malformed q-value are dropped.
+    """
+    weighted: List[Tuple[float, int, str]] = []
+    for position, part in enumerate(header[:MAX_ACCEPT_LANGUAGE_LENGTH].split(",")):
+        tag, _, params = part.partition(";")
+        tag = tag.strip().lower().replace("_", "-")
+        if not tag:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if 0.0 < quality <= 1.0:
+            weighted.append((-quality, position, tag))
+    weighted.sort()
+    return [tag for _, _, tag in weighted]
+
+class LocaleNegotiator:
+    """
+    Resolves Accept-Language headers and locale overrides to a supported locale.
+    Matching is case-insensitive and tries the exact tag, then its language prefixes
+    (fr-ca -> fr), then any supported regional variant of the language (pt -> pt-BR).
+    The supported locale is returned as spelled in `supported`, so it can be used as a
+    key into the catalog. Results are memoized in a bounded LRU keyed by the raw header
+    value.
+    """
+
+    def __init__(self, supported: Iterable[str], default: str = DEFAULT_LOCALE, cache_size: int = LOCALE_CACHE_SIZE):
+        self.default = default
+        self.cache_size = cache_size
+        self.set_supported(supported)
+
+    def set_supported(self, supported: Iterable[str]) -> None:
+        """
+        Replaces the supported locale set and drops memoized results if it changed.
+        """
+        # lowercased tag -> locale as spelled by the caller
+        canonical = {locale.lower(): locale for locale in supported}
+        canonical.setdefault(self.default.lower(), self.default)
+        if getattr(self, "_canonical", None) == canonical:
+            return
+        self._canonical = canonical
+        self.supported = frozenset(canonical)
+        self._negotiate_cached: Callable[[str], str] = lru_cache(maxsize=self.cache_size)(self._negotiate)
+
+    def negotiate(self, accept_language: Optional[str]) -> str:
+        if not accept_language:
+            return self.default
+        return self._negotiate_cached(accept_language)
+
+    def cache_info(self):
+        return self._negotiate_cached.cache_info()
+
+    def _match(self, tag: str) -> Optional[str]:
+        if tag == "*":
+            return self.default
+        candidate = tag
+        while candidate:
+            if candidate in self.supported:
+                return self._canonical[candidate]
+            candidate = candidate.rpartition("-")[0]
+        prefix = tag.split("-", 1)[0] + "-"
+        regional = sorted(locale for locale in self.supported if locale.startswith(prefix))
+        return self._canonical[regional[0]] if regional else None
+
+    def _negotiate(self, accept_language: str) -> str:
+        for tag in parse_accept_language(accept_language):
+            match = self._match(tag)
+            if match:
+                return match
+        return self.default
+
+# Process-wide negotiator; the catalog cache keeps its supported set current
+locale_negotiator = LocaleNegotiator(SUPPORTED_LOCALES)
+
+# Locale of the request being handled; each asyncio task sees its own value
+_locale_ctx: ContextVar[str] = ContextVar("locale", default=DEFAULT_LOCALE)
 
 
 
 def get_locale_from_request(request: Request) -> str:
     """
-    Extracts the preferred locale from the request.
+    Extracts the preferred supported locale from the request.
     Checks the following in order:
-    1. 'Accept-Language' header
-    2. 'locale' query parameter
+    1. 'locale' query parameter (explicit override)
+    2. 'Accept-Language' header, honouring q-values
     3. Defaults to 'en'
     """
-    # Check query parameter first (explicit override)
     locale = request.query_params.get("locale")
     if locale:
-        return locale.lower()
-    # Check Accept-Language header
-    accept_language = request.headers.get("accept-language")
-    if accept_language:
-        # Parse the first language code from the header
-        languages = [lang.split(";")[0].strip() for lang in accept_language.split(",")]
-        if languages and languages[0]:
-            return languages[0].lower()
-    # Default locale
-    return "en"
+        return locale_negotiator.negotiate(locale)
+    return locale_negotiator.negotiate(request.headers.get("accept-language"))
+
+def get_locale_from_scope(scope: Scope) -> str:
+    """
+    Same resolution as get_locale_from_request, read straight from an ASGI scope.
+    """
+    query_string = scope.get("query_string", b"")
+    if b"locale=" in query_string:
+        for name, value in parse_qsl(query_string.decode("latin-1")):
+            if name == "locale" and value:
+                return locale_negotiator.negotiate(value)
+    for name, value in scope.get("headers", ()):
+        if name == b"accept-language":
+            return locale_negotiator.negotiate(value.decode("latin-1"))
+    return locale_negotiator.default
 
 def set_locale(locale: str) -> None:
     """
     Sets the locale for the current request context.
     """
-    _locale_ctx.locale = locale
+    _locale_ctx.set(locale)
 
 def get_locale() -> str:
     """
     Gets the locale for the current request context.
     """
-    return getattr(_locale_ctx, "locale", "en")
+    return _locale_ctx.get()
+
+class I18nMiddleware:
+    """
+    Pure ASGI middleware: resolves the request locale into the locale context variable
+    and adds a Content-Language header when the response starts.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        locale = get_locale_from_scope(scope)
+        content_language = (b"content-language", locale.encode("latin-1"))
+
+        async def send_with_content_language(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                if not any(name.lower() == b"content-language" for name, _ in headers):
+                    headers.append(content_language)
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _locale_ctx.set(locale)
+        try:
+            await self.app(scope, receive, send_with_content_language)
+        finally:
+            _locale_ctx.reset(token)
 
 def translate_i18n(i18n_dict: Optional[dict], locale: str = "en") -> Optional[str]:
     """
@@ -51,10 +187,37 @@ def translate_i18n(i18n_dict: Optional[dict], locale: str = "en") -> Optional[st
         return i18n_dict["en"]
     return next(iter(i18n_dict.values()), None)
 
+def parse_i18n_text(value) -> Optional[dict]:
+    """
+    Normalizes a text column that may hold either an i18n JSON object
+    ('{"en": "...", "fr": "..."}') or a plain string, which is taken as the
+    DEFAULT_LOCALE text.
+    """
+    if not value:
+        return None
+    if isinstance(value, dict):
+        return value
+    text = str(value)
+    if text.lstrip().startswith("{"):
+        try:
+            parsed = json.loads(text)
+        except ValueError:
+            parsed = None
+        if isinstance(parsed, dict):
+            return {str(locale): str(message) for locale, message in parsed.items() if message}
+    return {DEFAULT_LOCALE: text}
+
 # Exported symbols
 __all__ = [
+    "DEFAULT_LOCALE",
+    "LocaleNegotiator",
+    "locale_negotiator",
+    "parse_accept_language",
     "get_locale_from_request",
+    "get_locale_from_scope",
+    "I18nMiddleware",
     "set_locale",
     "get_locale",
     "translate_i18n",
+    "parse_i18n_text",
 ]
\ No newline at end of file
@@ -0,0 +1,201 @@
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .auth_cache import principal_cache
+from .catalog_cache import catalog_cache
+from .i18n import locale_negotiator
+from .metrics import (
+    DEFAULT_COUNT_BUCKETS,
+    DEFAULT_SIZE_BUCKETS,
+    CallbackMetric,
+    Counter,
+    Histogram,
+    RequestStats,
+    request_stats,
+)
+from .password_hashing import password_hasher
+
+# Adds a Server-Timing header (db, bcrypt, app) to every response; keep off in production
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+UNMATCHED_ROUTE = "unmatched"
+
+http_requests_total = Counter(
+    "http_requests_total", "HTTP requests handled", labelnames=("route", "method", "status")
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", labelnames=("route", "method")
+)
+http_response_size_bytes = Histogram(
+    "http_response_size_bytes",
+    "Response body size before (uncompressed) and after (sent) GZip",
+    buckets=DEFAULT_SIZE_BUCKETS,
+    labelnames=("route", "stage"),
+)
+db_queries_per_request = Histogram(
+    "db_queries_per_request",
+    "Database statements executed per request",
+    buckets=DEFAULT_COUNT_BUCKETS,
+    labelnames=("route",),
+)
+db_time_per_request_seconds = Histogram(
+    "db_time_per_request_seconds", "Time spent in database statements per request", labelnames=("route",)
+)
+db_query_duration_seconds = Histogram(
+    "db_query_duration_seconds", "Duration of individual database statements"
+)
+
+CallbackMetric(
+    "catalog_cache_hits_total", "Catalog lookups served from memory", lambda: catalog_cache.hits, "counter"
+)
+CallbackMetric(
+    "catalog_cache_misses_total", "Catalog lookups that reloaded from the database", lambda: catalog_cache.misses, "counter"
+)
+CallbackMetric(
+    "auth_cache_hits_total", "Token verifications served from the principal cache", lambda: principal_cache.hits, "counter"
+)
+CallbackMetric(
+    "auth_cache_misses_total", "Token verifications that queried the users table", lambda: principal_cache.misses, "counter"
+)
+CallbackMetric(
+    "auth_cache_seconds_saved_total",
+    "Estimated users lookup time saved by the principal cache (hits x average lookup latency)",
+    lambda: principal_cache.estimated_seconds_saved,
+    "counter",
+)
+CallbackMetric(
+    "locale_cache_hits_total", "Accept-Language negotiations served from the LRU", lambda: locale_negotiator.cache_info().hits, "counter"
+)
+CallbackMetric(
+    "locale_cache_misses_total", "Accept-Language negotiations computed", lambda: locale_negotiator.cache_info().misses, "counter"
+)
+CallbackMetric(
+    "password_hash_pending", "Password hashing jobs running or queued", lambda: password_hasher.pending
+)
+CallbackMetric(
+    "password_hash_rejected_total", "Password hashing jobs rejected by backpressure", lambda: password_hasher.rejected, "counter"
+)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Counts and times every statement executed on `engine`, attributing them to the
+    current request when there is one.
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start_time")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        db_query_duration_seconds.observe(elapsed)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.add_stage("db", elapsed)
+
+
+def _route_label(scope: Scope) -> str:
+    # Newer FastAPI keeps included routes unprefixed and records the full template here
+    effective = (scope.get("fastapi") or {}).get("effective_route_context")
+    path = getattr(effective, "path_format", None)
+    if path:
+        return path
+    return getattr(scope.get("route"), "path_format", UNMATCHED_ROUTE)
+
+
+def _server_timing(stats: RequestStats) -> bytes:
+    parts = []
+    for name, seconds in stats.stages.items():
+        if name == "db":
+            parts.append(f'db;dur={seconds * 1000:.2f};desc="{stats.db_queries} queries"')
+        else:
+            parts.append(f"{name};dur={seconds * 1000:.2f}")
+    parts.append(f"app;dur={(time.perf_counter() - stats.started) * 1000:.2f}")
+    return ", ".join(parts).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """
+    Outermost ASGI middleware: records per-route latency, status, DB usage and the
+    size of the body actually sent, and optionally emits Server-Timing.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = SERVER_TIMING_ENABLED):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        status_code = 500
+        sent_bytes = 0
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status_code, sent_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", ()))
+                    headers.append((b"server-timing", _server_timing(stats)))
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                sent_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            request_stats.reset(token)
+            route = _route_label(scope)
+            method = scope.get("method", "")
+            http_requests_total.inc(route=route, method=method, status=str(status_code))
+            http_request_duration_seconds.observe(time.perf_counter() - stats.started, route=route, method=method)
+            http_response_size_bytes.observe(stats.uncompressed_bytes, route=route, stage="uncompressed")
+            http_response_size_bytes.observe(sent_bytes, route=route, stage="sent")
+            db_queries_per_request.observe(stats.db_queries, route=route)
+            db_time_per_request_seconds.observe(stats.stages.get("db", 0.0), route=route)
+
+
+class ResponseSizeMiddleware:
+    """
+    Installed inside GZipMiddleware to measure response bodies before compression.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stats: Optional[RequestStats] = request_stats.get()
+        if scope["type"] != "http" or stats is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_counting(message: Message) -> None:
+            if message["type"] == "http.response.body":
+                stats.uncompressed_bytes += len(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, receive, send_counting)
+
+
+# Exported symbols
+__all__ = [
+    "SERVER_TIMING_ENABLED",
+    "instrument_engine",
+    "MetricsMiddleware",
+    "ResponseSizeMiddleware",
+]
@@ -0,0 +1,41 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger("notification_preferences_app.lifecycle")
+
+
+class ServerState:
+    """
+    Process lifecycle flags shared by the launcher and the health endpoints.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.draining_since: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def draining(self) -> bool:
+        return self.draining_since is not None
+
+    def start_draining(self) -> None:
+        """
+        Marks the process as shutting down: readiness fails from now on so load
+        balancers stop routing new requests here while in-flight ones finish.
+        """
+        with self._lock:
+            if self.draining_since is None:
+                self.draining_since = time.time()
+                logger.info("Draining: readiness now reports unavailable")
+
+
+# Process-wide lifecycle state
+server_state = ServerState()
+
+# Exported symbols
+__all__ = [
+    "ServerState",
+    "server_state",
+]
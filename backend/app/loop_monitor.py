@@ -0,0 +1,224 @@
+"""
+Event-loop lag and blocking-call detector (opt-in, LOOP_MONITOR_ENABLED=true).
+
+A sampler task sleeps LOOP_MONITOR_INTERVAL_SECONDS at a time and records how late it
+wakes up as event-loop lag. A watchdog thread watches the sampler's heartbeat: when the
+loop has not come back for LOOP_BLOCK_THRESHOLD_SECONDS it captures the loop thread's
+stack while the blocking call is still running, and attributes it to the route being
+served by looking for the ASGI scope on that stack. Findings are served on
+/internal/debug/event-loop and counted in /metrics.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from .metrics import CallbackMetric, Counter, Histogram
+
+logger = logging.getLogger("notification_preferences_app.loop_monitor")
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "false").lower() == "true"
+# Seconds between lag samples
+LOOP_MONITOR_INTERVAL_SECONDS = float(os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", "0.05"))
+# A callback holding the loop this long is recorded as blocking
+LOOP_BLOCK_THRESHOLD_SECONDS = float(os.getenv("LOOP_BLOCK_THRESHOLD_SECONDS", "0.1"))
+# Blocking findings kept for the debug endpoint
+LOOP_MONITOR_MAX_FINDINGS = int(os.getenv("LOOP_MONITOR_MAX_FINDINGS", "50"))
+# Frames kept per captured stack (innermost)
+LOOP_MONITOR_STACK_DEPTH = 30
+NO_ROUTE = "(no request)"
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+loop_lag = Histogram("event_loop_lag_seconds", "How late the event loop ran a scheduled wake-up", LAG_BUCKETS)
+loop_blocks = Counter("event_loop_blocks_total", "Callbacks that blocked the event loop past the threshold", ["route"])
+loop_block_duration = Histogram(
+    "event_loop_block_seconds", "Duration of callbacks that blocked the event loop", LAG_BUCKETS, ["route"],
+)
+
+
+def _route_from_stack(frame) -> str:
+    """
+    Name of the endpoint whose request is on the stack. Starlette's router stores the
+    matched endpoint in the request scope, which every ASGI layer holds as `scope`.
+    """
+    while frame is not None:
+        if "scope" in frame.f_code.co_varnames:
+            scope = frame.f_locals.get("scope")
+            if isinstance(scope, dict) and scope.get("type") in ("http", "websocket"):
+                endpoint = scope.get("endpoint")
+                if endpoint is not None:
+                    return getattr(endpoint, "__name__", str(endpoint))
+                route = scope.get("route")
+                if route is not None:
+                    return getattr(route, "path", NO_ROUTE)
+                return scope.get("path", NO_ROUTE)
+        frame = frame.f_back
+    return NO_ROUTE
+
+
+class BlockingFinding:
+    """
+    One stall of the event loop, with the stack seen while it was blocked.
+    """
+
+    __slots__ = ("route", "started_at", "blocked_seconds", "stack")
+
+    def __init__(self, route: str, started_at: float, stack: List[str]):
+        self.route = route
+        self.started_at = started_at
+        self.blocked_seconds = 0.0
+        self.stack = stack
+
+    def as_dict(self) -> dict:
+        return {
+            "route": self.route,
+            "started_at": self.started_at,
+            "blocked_seconds": round(self.blocked_seconds, 4),
+            "stack": self.stack,
+        }
+
+
+class LoopMonitor:
+    """
+    Samples event-loop lag from inside the loop and detects blocking calls from a
+    watchdog thread.
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_MONITOR_INTERVAL_SECONDS,
+        threshold: float = LOOP_BLOCK_THRESHOLD_SECONDS,
+        max_findings: int = LOOP_MONITOR_MAX_FINDINGS,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.findings: Deque[BlockingFinding] = deque(maxlen=max_findings)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Event-loop monitor started (interval {self.interval}s, threshold {self.threshold}s)")
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self._heartbeat = now
+            loop_lag.observe(lag)
+
+    def _capture(self) -> BlockingFinding:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return BlockingFinding(NO_ROUTE, time.time(), [])
+        stack = traceback.format_stack(frame, limit=LOOP_MONITOR_STACK_DEPTH)
+        return BlockingFinding(_route_from_stack(frame), time.time(), stack)
+
+    def _watch(self) -> None:
+        poll = min(self.interval, self.threshold) / 2
+        stalled_since: Optional[float] = None
+        finding: Optional[BlockingFinding] = None
+        while not self._stopped.wait(poll):
+            heartbeat = self._heartbeat
+            if heartbeat != stalled_since and finding is not None:
+                # The loop came back: the stall lasted from the last heartbeat until now
+                finding.blocked_seconds = max(0.0, heartbeat - stalled_since - self.interval)
+                self._record(finding)
+                finding = None
+            if finding is None and time.monotonic() - heartbeat > self.interval + self.threshold:
+                stalled_since = heartbeat
+                finding = self._capture()
+
+    def _record(self, finding: BlockingFinding) -> None:
+        with self._lock:
+            self.findings.append(finding)
+        loop_blocks.inc(route=finding.route)
+        loop_block_duration.observe(finding.blocked_seconds, route=finding.route)
+        logger.warning(
+            f"Event loop blocked for {finding.blocked_seconds:.3f}s in {finding.route}: "
+            f"{finding.stack[-1].strip() if finding.stack else 'no stack'}"
+        )
+
+    def report(self) -> dict:
+        with self._lock:
+            findings = [finding.as_dict() for finding in reversed(self.findings)]
+        by_route: Dict[str, dict] = {}
+        for finding in findings:
+            summary = by_route.setdefault(finding["route"], {"count": 0, "max_seconds": 0.0})
+            summary["count"] += 1
+            summary["max_seconds"] = max(summary["max_seconds"], finding["blocked_seconds"])
+        return {
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "threshold_seconds": self.threshold,
+            "lag": {
+                "last_seconds": round(self.last_lag, 4),
+                "max_seconds": round(self.max_lag, 4),
+                "histogram": loop_lag.snapshot(),
+            },
+            "blocking_by_route": by_route,
+            "recent_blocking": findings,
+        }
+
+
+# Process-wide monitor, started on application startup when enabled
+loop_monitor = LoopMonitor()
+
+CallbackMetric("event_loop_lag_last_seconds", "Most recent event-loop lag sample", lambda: loop_monitor.last_lag)
+
+
+async def start_loop_monitor() -> None:
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+
+
+async def stop_loop_monitor() -> None:
+    await loop_monitor.stop()
+
+
+# Exported symbols
+__all__ = [
+    "LOOP_MONITOR_ENABLED",
+    "BlockingFinding",
+    "LoopMonitor",
+    "loop_monitor",
+    "start_loop_monitor",
+    "stop_loop_monitor",
+]
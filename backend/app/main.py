@@ -3,23 +3,32 @@ import os
 from typing import Any
 
 from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from .routes.notifications import router as notifications_router
 from .routes.auth import router as auth_router
-from .i18n import get_locale_from_request, set_locale
+from .routes.dispatch import router as dispatch_router
+from .routes.export import router as export_router
+from .routes.debug import router as debug_router
+from .i18n import I18nMiddleware
 from .schemas import ErrorResponse
+from .password_hashing import password_hasher
+from .rate_limit import auth_rate_limiter
+from .change_feed import start_change_feed, stop_change_feed
+from .lifecycle import server_state
+from .loop_monitor import start_loop_monitor, stop_loop_monitor
+from .health import HealthExemptHTTPSRedirectMiddleware, readiness_probe
+from .database import dispose_engine, engine
+from .instrumentation import MetricsMiddleware, ResponseSizeMiddleware, instrument_engine
+from .metrics import REGISTRY
+from .structured_logging import configure_logging, log_error
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(name)s %(message)s"
-)
+# Configure logging (JSON lines through a non-blocking queue, see app.structured_logging)
+configure_logging()
 logger = logging.getLogger("notification_preferences_app")
 
 # Instantiate FastAPI app
@@ -41,70 +50,142 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Enforce HTTPS in production
+# Enforce HTTPS in production (health probes stay reachable over plain HTTP)
 if os.getenv("FORCE_HTTPS", "true").lower() == "true":
-    app.add_middleware(HTTPSRedirectMiddleware)
+    app.add_middleware(HealthExemptHTTPSRedirectMiddleware)
+
+# Measure response bodies before compression (must sit inside GZip)
+app.add_middleware(ResponseSizeMiddleware)
 
 # Enable GZip compression for performance
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
-# Internationalization: set locale per request
-@app.middleware("http")
-async def i18n_middleware(request: Request, call_next):
-    locale = get_locale_from_request(request)
-    set_locale(locale)
-    response = await call_next(request)
-    response.headers["Content-Language"] = locale
-    return response
+# Internationalization: set locale per request (pure ASGI, no BaseHTTPMiddleware overhead)
+app.add_middleware(I18nMiddleware)
 
-# Global error handler for HTTP exceptions
+# Per-request metrics and optional Server-Timing (outermost, added last)
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+
+# Global error handler for HTTP exceptions (sampled logging, exact counts in errors_total)
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
-    logger.warning(f"HTTPException: {exc.detail} (status_code={exc.status_code})")
+    log_error(
+        logger,
+        logging.WARNING,
+        f"http_{exc.status_code}",
+        "HTTPException",
+        lambda: {"status_code": exc.status_code, "detail": exc.detail, "path": request.url.path},
+    )
     return JSONResponse(
         status_code=exc.status_code,
         content=ErrorResponse(
             error="http_error",
             message=str(exc.detail)
-        ).dict()
+        ).model_dump(),
+        headers=getattr(exc, "headers", None),
     )
 
 # Global error handler for validation errors
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    logger.warning(f"ValidationError: {exc.errors()}")
+    errors = exc.errors()
+    log_error(
+        logger,
+        logging.WARNING,
+        "validation_error",
+        "ValidationError",
+        # The full error list goes back to the client; the log only needs its shape
+        lambda: {
+            "path": request.url.path,
+            "error_count": len(errors),
+            "first_error": {"loc": errors[0].get("loc"), "type": errors[0].get("type")} if errors else None,
+        },
+    )
     return JSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content=ErrorResponse(
             error="validation_error",
             message="Invalid request data.",
-            details=exc.errors()
-        ).dict()
+            details=errors
+        ).model_dump()
     )
 
 # Global error handler for unexpected exceptions
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Unhandled Exception: {exc}", exc_info=True)
+    log_error(
+        logger,
+        logging.ERROR,
+        f"server_error:{type(exc).__name__}",
+        "Unhandled Exception",
+        lambda: {"path": request.url.path, "detail": str(exc)},
+        exc_info=exc,
+    )
     return JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content=ErrorResponse(
             error="server_error",
             message="An unexpected error occurred. Please try again later."
-        ).dict()
+        ).model_dump()
     )
 
 # Include API routers
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(notifications_router, prefix="/notifications", tags=["Notifications"])
+app.include_router(dispatch_router, prefix="/internal/dispatch", tags=["Dispatch"])
+app.include_router(export_router, prefix="/internal/export", tags=["Export"])
+app.include_router(debug_router, prefix="/internal/debug", tags=["Debug"])
+
+@app.on_event("startup")
+async def start_background_services() -> None:
+    await start_loop_monitor()
+    await start_change_feed()
+
+@app.on_event("shutdown")
+async def shutdown_resources() -> None:
+    await stop_loop_monitor()
+    await stop_change_feed()
+    password_hasher.shutdown()
+    await auth_rate_limiter.close()
+    await dispose_engine()
 
 # Health check endpoint
 @app.get("/health", tags=["Health"], response_model=dict)
 async def health_check() -> dict:
     """
-    Health check endpoint for readiness/liveness probes.
+    Health check endpoint kept for existing probes; prefer /health/live and /health/ready.
+    Reports 503 while the process drains after SIGTERM (see app.server).
     """
+    if server_state.draining:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"status": "draining"})
+    return {"status": "ok"}
+
+# Liveness probe: answers as long as the event loop does, without touching dependencies
+@app.get("/health/live", tags=["Health"], response_model=dict)
+async def liveness_check() -> dict:
     return {"status": "ok"}
 
+# Readiness probe: database, pool saturation and event-loop lag, cached (see app.health)
+@app.get("/health/ready", tags=["Health"], response_model=dict)
+async def readiness_check() -> dict:
+    """
+    Reports 503 while a dependency check fails or the process drains.
+    """
+    if server_state.draining:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"status": "draining"})
+    ready, checks = await readiness_probe.check()
+    if not ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unavailable", "checks": checks},
+        )
+    return {"status": "ok", "checks": checks}
+
+# Prometheus scrape endpoint
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse, include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # Export FastAPI app instance
 __all__ = ["app"]
\ No newline at end of file
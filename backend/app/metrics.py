@@ -0,0 +1,282 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Upper bounds (seconds) suited to request and bcrypt latencies
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+# Upper bounds (bytes) for response bodies
+DEFAULT_SIZE_BUCKETS: Tuple[float, ...] = (
+    128, 512, 1024, 4096, 16384, 65536, 262144, 1048576,
+)
+# Upper bounds for per-request counts (e.g. DB queries, to spot N+1 patterns)
+DEFAULT_COUNT_BUCKETS: Tuple[float, ...] = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(labelnames, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """
+    Collects metrics and renders them in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric") -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+# Default registry served by /metrics
+REGISTRY = MetricsRegistry()
+
+
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (), registry: Optional[MetricsRegistry] = REGISTRY):
+        self.name = name
+        self.description = description
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+
+    def expose(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing counter, optionally labelled.
+    """
+    metric_type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def expose(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        lines = self._header()
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """
+    Gauge or counter whose samples are read from a callback at scrape time, for values
+    other components already track. The callback returns either a number or a mapping
+    of label-value tuples to numbers.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        callback: Callable[[], object],
+        metric_type: str = "gauge",
+        labelnames: Sequence[str] = (),
+        registry: Optional[MetricsRegistry] = REGISTRY,
+    ):
+        super().__init__(name, description, labelnames, registry)
+        self.callback = callback
+        self.metric_type = metric_type
+
+    def expose(self) -> List[str]:
+        samples = self.callback()
+        if not isinstance(samples, dict):
+            samples = {(): samples}
+        lines = self._header()
+        for key, value in sorted(samples.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(float(value))}")
+        return lines
+
+
+class _HistogramState:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """
+    Thread-safe cumulative histogram with fixed bucket bounds, optionally labelled.
+    """
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+        labelnames: Sequence[str] = (),
+        registry: Optional[MetricsRegistry] = REGISTRY,
+    ):
+        super().__init__(name, description, labelnames, registry)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self._states: Dict[LabelValues, _HistogramState] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _HistogramState(len(self.buckets) + 1)
+            state.counts[index] += 1
+            state.sum += value
+            state.count += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """
+        Observes the wall-clock duration of the wrapped block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _cumulative(self, state: _HistogramState) -> List[Tuple[str, int]]:
+        running = 0
+        buckets = []
+        for bound, bucket_count in zip(self.buckets, state.counts):
+            running += bucket_count
+            buckets.append((_format_value(bound), running))
+        buckets.append(("+Inf", state.count))
+        return buckets
+
+    def snapshot(self, **labels: str) -> Dict[str, object]:
+        """
+        Returns cumulative bucket counts keyed by upper bound, plus count and sum.
+        """
+        key = self._key(labels)
+        with self._lock:
+            state = self._states.get(key) or _HistogramState(len(self.buckets) + 1)
+            return {
+                "buckets": dict(self._cumulative(state)),
+                "count": state.count,
+                "sum": state.sum,
+            }
+
+    def expose(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            for key, state in sorted(self._states.items()):
+                for bound, count in self._cumulative(state):
+                    labels = _format_labels(self.labelnames, key, ("le", bound))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(state.sum)}")
+                lines.append(f"{self.name}_count{labels} {state.count}")
+        return lines
+
+
+class RequestStats:
+    """
+    Per-request accumulator for time spent in named stages (db, bcrypt, ...).
+    """
+    __slots__ = ("started", "db_queries", "stages", "uncompressed_bytes")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.stages: Dict[str, float] = {}
+        self.uncompressed_bytes = 0
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+
+# Stats of the request being handled; None outside a request
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """
+    Adds `seconds` to stage `name` of the current request, if any.
+    """
+    stats = request_stats.get()
+    if stats is not None:
+        stats.add_stage(name, seconds)
+
+
+# Exported symbols
+__all__ = [
+    "DEFAULT_LATENCY_BUCKETS",
+    "DEFAULT_SIZE_BUCKETS",
+    "DEFAULT_COUNT_BUCKETS",
+    "MetricsRegistry",
+    "REGISTRY",
+    "Counter",
+    "CallbackMetric",
+    "Histogram",
+    "RequestStats",
+    "request_stats",
+    "record_stage",
+]
@@ -16,8 +16,13 @@ from sqlalchemy import (
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.dialects.postgresql import JSONB
 
+from .i18n import parse_i18n_text, translate_i18n
+
 Base = declarative_base()
 
+# JSONB on PostgreSQL, plain JSON elsewhere (SQLite for local benchmarks)
+I18nJSON = JSON().with_variant(JSONB(), "postgresql")
+
 class NotificationType(Base):
     """
     Represents a type of notification that can be sent to users.
@@ -32,15 +37,18 @@ class NotificationType(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     key = Column(String(64), nullable=False, unique=True, index=True, doc="Unique identifier for the notification type")
     # Descriptions are stored as a JSON object: { "en": "desc", "fr": "desc", ... }
-    descriptions = Column(JSONB, nullable=False, doc="Internationalized descriptions (language code -> description)")
+    descriptions = Column(I18nJSON, nullable=False, doc="Internationalized descriptions (language code -> description)")
     is_active = Column(Boolean, nullable=False, default=True, doc="Whether this notification type is available")
     is_deprecated = Column(Boolean, nullable=False, default=False, doc="Whether this notification type is deprecated")
-    deprecated_reason = Column(Text, nullable=True, doc="Reason for deprecation (i18n JSON: lang->reason)")
+    deprecated_reason = Column(Text, nullable=True, doc="Reason for deprecation: i18n JSON text (lang->reason) or a plain default-locale string")
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     user_preferences = relationship("UserNotificationPreference", back_populates="notification_type")
+    translations = relationship(
+        "NotificationTypeTranslation", back_populates="notification_type", cascade="all, delete-orphan"
+    )
 
     def get_description(self, locale: str = "en") -> str:
         """
@@ -59,19 +67,29 @@ class NotificationType(Base):
         """
         Get the deprecation reason in the requested locale, if any.
         """
-        if not self.deprecated_reason:
-            return None
-        try:
-            reasons = self.deprecated_reason
-            if isinstance(reasons, dict):
-                if locale in reasons:
-                    return reasons[locale]
-                if "en" in reasons:
-                    return reasons["en"]
-                return next(iter(reasons.values()), None)
-            return str(reasons)
-        except Exception:
-            return None
+        return translate_i18n(parse_i18n_text(self.deprecated_reason), locale)
+
+class NotificationTypeTranslation(Base):
+    """
+    One localized string of a notification type (normalized form of `descriptions` and
+    `deprecated_reason`), so a catalog query can fetch a single locale.
+    """
+    __tablename__ = "notification_type_translations"
+    __table_args__ = (
+        Index("ix_notification_type_translations_locale", "locale"),
+    )
+
+    # Primary key order serves the per-type, per-field fallback lookup
+    notification_type_id = Column(
+        Integer, ForeignKey("notification_types.id", ondelete="CASCADE"), primary_key=True
+    )
+    field = Column(String(32), primary_key=True, doc="description or deprecated_reason")
+    locale = Column(String(8), primary_key=True, doc="Language code")
+    text = Column(Text, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    notification_type = relationship("NotificationType", back_populates="translations")
 
 class User(Base):
     """
@@ -87,6 +105,8 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, nullable=False, default=True)
     locale = Column(String(8), nullable=False, default="en", doc="Preferred language code")
+    # Existing databases get this column from `python -m app.tokens migrate`
+    token_generation = Column(Integer, nullable=False, default=0, server_default="0", doc="Bumped to revoke every token issued so far")
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -101,6 +121,13 @@ class UserNotificationPreference(Base):
     __table_args__ = (
         UniqueConstraint("user_id", "notification_type_id", name="uq_user_notification_type"),
         Index("ix_user_notification_preferences_user_id", "user_id"),
+        # Covering index for dispatcher fan-out: index-only scans per (type, enabled)
+        Index(
+            "ix_user_notification_preferences_type_enabled_user",
+            "notification_type_id",
+            "enabled",
+            "user_id",
+        ),
     )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -118,6 +145,7 @@ class UserNotificationPreference(Base):
 __all__ = [
     "Base",
     "NotificationType",
+    "NotificationTypeTranslation",
     "User",
     "UserNotificationPreference",
 ]
\ No newline at end of file
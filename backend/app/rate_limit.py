@@ -0,0 +1,250 @@
+import logging
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from .metrics import Counter
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # pragma: no cover - optional dependency
+    redis_asyncio = None
+
+logger = logging.getLogger("notification_preferences_app.rate_limit")
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# "memory" (per process) or "redis" (shared across workers and nodes)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Use the first X-Forwarded-For hop as client IP; only enable behind a trusted proxy
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+# Bucket sizes as "<requests>/<seconds>"
+LOGIN_RATE_LIMIT_PER_IP = os.getenv("LOGIN_RATE_LIMIT_PER_IP", "20/60")
+LOGIN_RATE_LIMIT_PER_ACCOUNT = os.getenv("LOGIN_RATE_LIMIT_PER_ACCOUNT", "10/60")
+REGISTER_RATE_LIMIT_PER_IP = os.getenv("REGISTER_RATE_LIMIT_PER_IP", "5/60")
+REGISTER_RATE_LIMIT_PER_ACCOUNT = os.getenv("REGISTER_RATE_LIMIT_PER_ACCOUNT", "3/60")
+
+rate_limit_rejections_total = Counter(
+    "rate_limit_rejections_total", "Requests rejected by a rate limit rule", labelnames=("rule",)
+)
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when a bucket is empty; `retry_after` is the number of seconds until it
+    holds enough tokens again.
+    """
+
+    def __init__(self, rule: str, retry_after: float):
+        super().__init__(f"Rate limit {rule} exceeded")
+        self.rule = rule
+        self.retry_after = retry_after
+
+
+class RateLimitRule(NamedTuple):
+    """
+    Token bucket holding up to `capacity` tokens, refilled evenly over `period_seconds`.
+    """
+    name: str
+    capacity: int
+    period_seconds: float
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.capacity / self.period_seconds
+
+    @classmethod
+    def parse(cls, name: str, spec: str) -> "RateLimitRule":
+        count, sep, seconds = spec.partition("/")
+        if not sep:
+            raise ValueError(f"Invalid rate limit {spec!r} for {name}; expected <requests>/<seconds>")
+        return cls(name, int(count), float(seconds))
+
+
+class RateLimitBackend(ABC):
+    """
+    Storage for token buckets. `take` atomically refills the bucket, removes `cost`
+    tokens if available and returns 0, or returns the seconds to wait otherwise.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, rule: RateLimitRule, cost: float = 1.0) -> float:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+def _refill(tokens: float, updated_at: float, now: float, rule: RateLimitRule) -> float:
+    return min(float(rule.capacity), tokens + max(0.0, now - updated_at) * rule.refill_per_second)
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Per-process buckets in a bounded LRU; the least recently used keys are dropped
+    first, which at worst hands a full bucket back to an idle client.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rule: RateLimitRule, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (float(rule.capacity), now))
+            tokens = _refill(tokens, updated_at, now, rule)
+            retry_after = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                retry_after = (cost - tokens) / rule.refill_per_second
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+# Same algorithm as InMemoryRateLimitBackend, executed atomically inside Redis
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry_after = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(retry_after)
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Buckets shared by every worker through Redis. `client` is any object with the
+    redis-py asyncio `eval` coroutine, so a local fake can stand in for tests.
+    """
+
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str = RATE_LIMIT_REDIS_URL) -> "RedisRateLimitBackend":
+        if redis_asyncio is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the redis package")
+        return cls(redis_asyncio.from_url(url))
+
+    async def take(self, key: str, rule: RateLimitRule, cost: float = 1.0) -> float:
+        result = await self.client.eval(
+            _TOKEN_BUCKET_SCRIPT,
+            1,
+            self.prefix + key,
+            rule.capacity,
+            rule.refill_per_second,
+            time.time(),
+            cost,
+        )
+        if isinstance(result, bytes):
+            result = result.decode()
+        return float(result)
+
+    async def close(self) -> None:
+        close = getattr(self.client, "aclose", None) or getattr(self.client, "close", None)
+        if close is not None:
+            await close()
+
+
+class RateLimiter:
+    """
+    Checks requests against named rules. A backend error fails open (logged), so an
+    unavailable shared store never locks users out.
+    """
+
+    def __init__(self, backend: RateLimitBackend, rules: Dict[str, RateLimitRule], enabled: bool = RATE_LIMIT_ENABLED):
+        self.backend = backend
+        self.rules = rules
+        self.enabled = enabled
+
+    async def hit(self, rule_name: str, identity: Optional[str], cost: float = 1.0) -> None:
+        """
+        Takes `cost` tokens from the bucket of `identity` under `rule_name`, raising
+        RateLimitExceeded when it is empty.
+        """
+        if not self.enabled or not identity:
+            return
+        rule = self.rules[rule_name]
+        try:
+            retry_after = await self.backend.take(f"{rule.name}:{identity}", rule, cost)
+        except Exception as exc:
+            logger.warning(f"Rate limit backend unavailable, allowing request: {exc}")
+            return
+        if retry_after > 0:
+            rate_limit_rejections_total.inc(rule=rule.name)
+            raise RateLimitExceeded(rule.name, retry_after)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def client_ip(request) -> Optional[str]:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else None
+
+
+def retry_after_header(retry_after: float) -> str:
+    return str(max(1, math.ceil(retry_after)))
+
+
+def _backend_from_env() -> RateLimitBackend:
+    if RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitBackend.from_url()
+    if RATE_LIMIT_BACKEND != "memory":
+        raise ValueError(f"Unsupported rate limit backend: {RATE_LIMIT_BACKEND}")
+    return InMemoryRateLimitBackend()
+
+
+# Process-wide limiter guarding the bcrypt-backed auth endpoints
+auth_rate_limiter = RateLimiter(
+    _backend_from_env(),
+    {
+        rule.name: rule
+        for rule in (
+            RateLimitRule.parse("login_ip", LOGIN_RATE_LIMIT_PER_IP),
+            RateLimitRule.parse("login_account", LOGIN_RATE_LIMIT_PER_ACCOUNT),
+            RateLimitRule.parse("register_ip", REGISTER_RATE_LIMIT_PER_IP),
+            RateLimitRule.parse("register_account", REGISTER_RATE_LIMIT_PER_ACCOUNT),
+        )
+    },
+)
+
+# Exported symbols
+__all__ = [
+    "RATE_LIMIT_ENABLED",
+    "RateLimitExceeded",
+    "RateLimitRule",
+    "RateLimitBackend",
+    "InMemoryRateLimitBackend",
+    "RedisRateLimitBackend",
+    "RateLimiter",
+    "client_ip",
+    "retry_after_header",
+    "auth_rate_limiter",
+]
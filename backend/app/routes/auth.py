@@ -1,14 +1,18 @@
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from jose import JWTError, jwt
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 
 from ..models import User
 from ..schemas import UserCreate, UserOut, ErrorResponse
-from ..database import get_db
+from ..database import get_db, dialect_insert
+from ..auth_cache import AuthenticatedUser, auth_user_lookup_seconds, generation_cache, principal_cache
+from ..serialization import FAST_JSON_RESPONSES, FastJSONResponse
+from ..password_hashing import PasswordHasherBusy, password_hasher
+from ..rate_limit import RateLimitExceeded, auth_rate_limiter, client_ip, retry_after_header
+from ..tokens import InvalidToken, is_stateless, token_revocations, token_service
 
 import logging
 import os
@@ -16,103 +20,194 @@ import os
 router = APIRouter()
 logger = logging.getLogger("notification_preferences_app.auth")
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# OAuth2 settings
-SECRET_KEY = os.getenv("AUTH_SECRET_KEY", "supersecretkey")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60
+# Let read-only endpoints trust the signed claims (uid, locale, generation) instead of
+# loading the user; the generation is re-read every AUTH_GENERATION_CACHE_SECONDS, so a
+# revocation made by another worker takes effect here within that window
+AUTH_STATELESS_READS = os.getenv("AUTH_STATELESS_READS", "false").lower() == "true"
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+async def get_password_hash(password: str) -> str:
+    return await password_hasher.hash(password)
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
-    return db.query(User).filter(User.email == email).first()
+def hashing_busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service is busy. Please retry shortly.",
+        headers={"Retry-After": "1"},
+    )
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    user = get_user_by_email(db, email)
-    if not user or not verify_password(password, user.hashed_password):
-        return None
-    return user
+def rate_limited_exception(exc: RateLimitExceeded) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many attempts. Please retry later.",
+        headers={"Retry-After": retry_after_header(exc.retry_after)},
+    )
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials.",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def create_access_token(user: User, expires_delta: Optional[timedelta] = None) -> str:
+    return token_service.issue(
+        user_id=user.id,
+        email=user.email,
+        locale=user.locale,
+        generation=user.token_generation or 0,
+        expires_delta=expires_delta,
+    )
+
+def decode_token(token: str) -> dict:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = get_user_by_email(db, email)
-    if user is None or not user.is_active:
-        raise credentials_exception
+        return token_service.verify(token)
+    except InvalidToken:
+        raise credentials_exception()
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.email == email).limit(1))
+    return result.scalars().first()
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    user = await get_user_by_email(db, email)
+    if not user or not await verify_password(password, user.hashed_password):
+        return None
     return user
 
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> AuthenticatedUser:
+    """
+    Resolves the bearer token to its user, checking the account and its token generation
+    in the database. Verified principals are cached per token (see auth_cache), so repeat
+    calls skip both JWT decoding and the users lookup.
+    """
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
+    payload = decode_token(token)
+    with auth_user_lookup_seconds.time():
+        if "uid" in payload:
+            result = await db.execute(select(User).where(User.id == payload["uid"]).limit(1))
+            user = result.scalars().first()
+        else:
+            user = await get_user_by_email(db, payload["sub"])
+    if user is None or not user.is_active or user.email != payload["sub"]:
+        raise credentials_exception()
+    if payload.get("gen", 0) < (user.token_generation or 0):
+        # Revoked by another process; remember it so stateless reads here reject it too
+        token_revocations.revoke_user(user.id, user.token_generation)
+        raise credentials_exception()
+    principal = AuthenticatedUser.from_user(user)
+    principal_cache.put(token, principal, token_expires_at=payload.get("exp"))
+    return principal
+
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> AuthenticatedUser:
+    """
+    Dependency for read-only endpoints. With AUTH_STATELESS_READS the principal is built
+    from the token claims; only the user's token generation is checked, from a cache
+    refreshed every AUTH_GENERATION_CACHE_SECONDS (see auth_cache.GenerationCache).
+    Otherwise, and for tokens issued without the full claim set, it behaves like
+    get_current_user.
+    """
+    if AUTH_STATELESS_READS:
+        payload = decode_token(token)
+        if is_stateless(payload):
+            generation = await current_generation(db, payload["uid"])
+            if generation is None or payload["gen"] < generation:
+                if generation is not None:
+                    token_revocations.revoke_user(payload["uid"], generation)
+                raise credentials_exception()
+            return AuthenticatedUser(
+                id=payload["uid"], email=payload["sub"], locale=payload["loc"], is_active=True
+            )
+    return await get_current_user(token, db)
+
+async def current_generation(db: AsyncSession, user_id: int) -> Optional[int]:
+    """
+    The user's token generation, from generation_cache or the users table; None when
+    the user does not exist.
+    """
+    generation = generation_cache.get(user_id)
+    if generation is None:
+        result = await db.execute(select(User.token_generation).where(User.id == user_id))
+        generation = result.scalar_one_or_none()
+        if generation is not None:
+            generation_cache.put(user_id, generation)
+    return generation
+
 @router.post(
     "/register",
     response_model=UserOut,
     responses={
         400: {"model": ErrorResponse, "description": "Bad Request"},
         409: {"model": ErrorResponse, "description": "Email Already Registered"},
+        429: {"model": ErrorResponse, "description": "Too Many Requests"},
         500: {"model": ErrorResponse, "description": "Internal Server Error"},
+        503: {"model": ErrorResponse, "description": "Service Busy"},
     },
     summary="Register a new user",
     tags=["Authentication"],
 )
 async def register_user(
     user_in: UserCreate,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_db)
 ) -> UserOut:
     """
     Registers a new user.
+    Rate limited per client IP and per email before any password hashing happens.
+    The account is created with a single INSERT ... ON CONFLICT (email) DO NOTHING, so a
+    duplicate email (including a concurrent registration) maps to 409 in one round trip.
     """
     try:
-        existing_user = get_user_by_email(db, user_in.email)
-        if existing_user:
+        await auth_rate_limiter.hit("register_ip", client_ip(request))
+        await auth_rate_limiter.hit("register_account", user_in.email.lower())
+        hashed_password = await get_password_hash(user_in.password)
+        now = datetime.utcnow()
+        table = User.__table__
+        stmt = (
+            dialect_insert(db, table)
+            .values(
+                email=user_in.email,
+                hashed_password=hashed_password,
+                locale=user_in.locale,
+                is_active=True,
+                token_generation=0,
+                created_at=now,
+                updated_at=now,
+            )
+            .on_conflict_do_nothing(index_elements=[table.c.email])
+            .returning(table.c.id, table.c.email, table.c.locale, table.c.is_active)
+        )
+        row = (await db.execute(stmt)).first()
+        await db.commit()
+        if row is None:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Email is already registered."
             )
-        hashed_password = get_password_hash(user_in.password)
-        user = User(
-            email=user_in.email,
-            hashed_password=hashed_password,
-            locale=user_in.locale,
-            is_active=True,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow(),
-        )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
         return UserOut(
-            id=user.id,
-            email=user.email,
-            locale=user.locale,
-            is_active=user.is_active,
+            id=row.id,
+            email=row.email,
+            locale=row.locale,
+            is_active=row.is_active,
         )
     except HTTPException:
         raise
+    except RateLimitExceeded as exc:
+        raise rate_limited_exception(exc)
+    except PasswordHasherBusy:
+        raise hashing_busy_exception()
     except Exception as exc:
         logger.error(f"User registration failed: {exc}", exc_info=True)
         raise HTTPException(
@@ -125,29 +220,39 @@ async def register_user(
     response_model=dict,
     responses={
         401: {"model": ErrorResponse, "description": "Unauthorized"},
+        429: {"model": ErrorResponse, "description": "Too Many Requests"},
         500: {"model": ErrorResponse, "description": "Internal Server Error"},
+        503: {"model": ErrorResponse, "description": "Service Busy"},
     },
     summary="Authenticate user and return access token",
     tags=["Authentication"],
 )
 async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> dict:
     """
     Authenticates a user and returns an access token.
+    Rate limited per client IP and per account before the password is verified.
     """
     try:
-        user = authenticate_user(db, form_data.username, form_data.password)
+        await auth_rate_limiter.hit("login_ip", client_ip(request))
+        await auth_rate_limiter.hit("login_account", form_data.username.lower())
+        user = await authenticate_user(db, form_data.username, form_data.password)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password."
             )
-        access_token = create_access_token(data={"sub": user.email})
+        access_token = create_access_token(user)
         return {"access_token": access_token, "token_type": "bearer"}
     except HTTPException:
         raise
+    except RateLimitExceeded as exc:
+        raise rate_limited_exception(exc)
+    except PasswordHasherBusy:
+        raise hashing_busy_exception()
     except Exception as exc:
         logger.error(f"Login failed: {exc}", exc_info=True)
         raise HTTPException(
@@ -166,11 +271,14 @@ async def login(
     tags=["Authentication"],
 )
 async def get_me(
-    current_user: User = Depends(get_current_user)
+    current_user: AuthenticatedUser = Depends(get_current_principal)
 ) -> UserOut:
     """
     Returns the current authenticated user's information.
+    With AUTH_STATELESS_READS this is answered from the token claims without a database hit.
     """
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(current_user._asdict())
     return UserOut(
         id=current_user.id,
         email=current_user.email,
@@ -178,5 +286,72 @@ async def get_me(
         is_active=current_user.is_active,
     )
 
-# Exported router and get_current_user dependency
-__all__ = ["router", "get_current_user"]
\ No newline at end of file
+async def _revoke_user_tokens(db: AsyncSession, user_id: int) -> Response:
+    """
+    Bumps the user's token generation, which this worker enforces at once. Other
+    workers compare the token's `gen` claim with the users table: get_current_user
+    on each principal cache miss, so within AUTH_CACHE_TTL_SECONDS, and stateless
+    reads within AUTH_GENERATION_CACHE_SECONDS.
+    """
+    try:
+        result = await db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(token_generation=User.token_generation + 1, updated_at=datetime.utcnow())
+            .returning(User.token_generation)
+        )
+        generation = result.scalar_one()
+        await db.commit()
+        token_revocations.revoke_user(user_id, generation)
+        principal_cache.invalidate_user(user_id)
+        generation_cache.put(user_id, generation)
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    except Exception as exc:
+        logger.error(f"Token revocation failed: {exc}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not revoke tokens at this time."
+        )
+
+@router.post(
+    "/logout",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={
+        401: {"model": ErrorResponse, "description": "Unauthorized"},
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+    },
+    summary="Log out of every session of the current user",
+    tags=["Authentication"],
+)
+async def logout(
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> Response:
+    """
+    Same as /logout-all: bumps the user's token generation, so this token and every
+    other session of the user end. The worker handling the call rejects them at once,
+    the others once they re-read the generation (see _revoke_user_tokens).
+    """
+    return await _revoke_user_tokens(db, current_user.id)
+
+@router.post(
+    "/logout-all",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={
+        401: {"model": ErrorResponse, "description": "Unauthorized"},
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+    },
+    summary="Revoke every access token issued to the current user",
+    tags=["Authentication"],
+)
+async def logout_all(
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> Response:
+    """
+    Bumps the user's token generation, so tokens issued before now are rejected.
+    """
+    return await _revoke_user_tokens(db, current_user.id)
+
+# Exported router and auth dependencies
+__all__ = ["router", "get_current_user", "get_current_principal"]
\ No newline at end of file
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from ..schemas import ErrorResponse
+from ..loop_monitor import loop_monitor
+from ..routes.dispatch import require_service_key
+
+import logging
+
+router = APIRouter()
+logger = logging.getLogger("notification_preferences_app.debug")
+
+@router.get(
+    "/event-loop",
+    response_model=dict,
+    responses={
+        401: {"model": ErrorResponse, "description": "Unauthorized"},
+        404: {"model": ErrorResponse, "description": "Event-Loop Monitor Disabled"},
+    },
+    summary="Event-loop lag and the most recent blocking calls of this worker",
+    tags=["Debug"],
+    dependencies=[Depends(require_service_key)],
+)
+async def event_loop_report() -> dict:
+    """
+    Lag histogram, blocking calls grouped by route and the latest stacks captured while
+    the loop was blocked. Only available with LOOP_MONITOR_ENABLED=true.
+    """
+    if not loop_monitor.running:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event-loop monitor is not running."
+        )
+    return loop_monitor.report()
+
+# Exported router
+__all__ = ["router"]
@@ -0,0 +1,183 @@
+from typing import AsyncIterator, Optional
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import APIKeyHeader
+from sqlalchemy import and_, exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import User, UserNotificationPreference
+from ..schemas import PreferenceResolveRequest, PreferenceResolveResponse, ErrorResponse
+from ..catalog_cache import catalog_cache
+from ..database import get_db, AsyncSessionLocal
+
+import logging
+import os
+
+router = APIRouter()
+logger = logging.getLogger("notification_preferences_app.dispatch")
+
+# Shared secret for internal sending services; the router rejects every call while unset
+DISPATCH_API_KEY = os.getenv("DISPATCH_API_KEY", "")
+DISPATCH_MAX_BATCH = int(os.getenv("DISPATCH_MAX_BATCH", "10000"))
+DISPATCH_STREAM_CHUNK = int(os.getenv("DISPATCH_STREAM_CHUNK", "5000"))
+
+api_key_header = APIKeyHeader(name="X-Service-Key", auto_error=False)
+
+def require_service_key(api_key: Optional[str] = Depends(api_key_header)) -> None:
+    if not DISPATCH_API_KEY or not api_key or not secrets.compare_digest(api_key, DISPATCH_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid service key."
+        )
+
+async def resolve_type_id(db: AsyncSession, notification_type_key: str) -> int:
+    type_ids = await catalog_cache.type_ids(db)
+    type_id = type_ids.get(notification_type_key)
+    if type_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unknown or inactive notification type."
+        )
+    return type_id
+
+@router.post(
+    "/resolve",
+    response_model=PreferenceResolveResponse,
+    responses={
+        401: {"model": ErrorResponse, "description": "Unauthorized"},
+        404: {"model": ErrorResponse, "description": "Unknown Notification Type"},
+        422: {"model": ErrorResponse, "description": "Batch Too Large"},
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+    },
+    summary="Filter a batch of users down to the active ones with a notification type enabled",
+    tags=["Dispatch"],
+    dependencies=[Depends(require_service_key)],
+)
+async def resolve_preferences(
+    resolve_in: PreferenceResolveRequest,
+    db: AsyncSession = Depends(get_db),
+) -> PreferenceResolveResponse:
+    """
+    Returns the requested users that are active and have the type enabled; users
+    without a stored preference count as `default_enabled`. Deactivated and
+    nonexistent user IDs are never reported as enabled but listed separately.
+    One query reads each user by primary key together with its preference row
+    for the type (unique index on user_id, notification_type_id).
+    """
+    if len(resolve_in.user_ids) > DISPATCH_MAX_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {DISPATCH_MAX_BATCH} user IDs can be resolved per request."
+        )
+    try:
+        type_id = await resolve_type_id(db, resolve_in.notification_type_key)
+        user_ids = list(dict.fromkeys(resolve_in.user_ids))
+        users = {}
+        if user_ids:
+            result = await db.execute(
+                select(User.id, User.is_active, UserNotificationPreference.enabled)
+                .outerjoin(
+                    UserNotificationPreference,
+                    and_(
+                        UserNotificationPreference.user_id == User.id,
+                        UserNotificationPreference.notification_type_id == type_id,
+                    ),
+                )
+                .where(User.id.in_(user_ids))
+            )
+            users = {row.id: row for row in result}
+        enabled_user_ids, inactive_user_ids, unknown_user_ids = [], [], []
+        for user_id in user_ids:
+            row = users.get(user_id)
+            if row is None:
+                unknown_user_ids.append(user_id)
+            elif not row.is_active:
+                inactive_user_ids.append(user_id)
+            elif (resolve_in.default_enabled if row.enabled is None else row.enabled):
+                enabled_user_ids.append(user_id)
+        return PreferenceResolveResponse(
+            notification_type_key=resolve_in.notification_type_key,
+            enabled_user_ids=enabled_user_ids,
+            inactive_user_ids=inactive_user_ids,
+            unknown_user_ids=unknown_user_ids,
+        )
+    except HTTPException:
+        raise
+    except Exception as exc:
+        logger.error(f"Failed to resolve preferences: {exc}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not resolve preferences at this time."
+        )
+
+async def iter_enabled_user_ids(type_id: int, default_enabled: bool) -> AsyncIterator[bytes]:
+    """
+    Yields newline-separated user IDs in keyset-paginated chunks, each chunk on a short
+    session of its own so no connection is held between chunks.
+    """
+    last_id = 0
+    while True:
+        if default_enabled:
+            disabled = exists().where(
+                UserNotificationPreference.notification_type_id == type_id,
+                UserNotificationPreference.enabled == False,
+                UserNotificationPreference.user_id == User.id,
+            )
+            stmt = (
+                select(User.id)
+                .where(User.is_active == True, User.id > last_id, ~disabled)
+                .order_by(User.id)
+                .limit(DISPATCH_STREAM_CHUNK)
+            )
+        else:
+            stmt = (
+                select(UserNotificationPreference.user_id)
+                .join(User, User.id == UserNotificationPreference.user_id)
+                .where(
+                    UserNotificationPreference.notification_type_id == type_id,
+                    UserNotificationPreference.enabled == True,
+                    UserNotificationPreference.user_id > last_id,
+                    User.is_active == True,
+                )
+                .order_by(UserNotificationPreference.user_id)
+                .limit(DISPATCH_STREAM_CHUNK)
+            )
+        async with AsyncSessionLocal() as session:
+            user_ids = (await session.execute(stmt)).scalars().all()
+        if not user_ids:
+            return
+        yield ("\n".join(map(str, user_ids)) + "\n").encode("ascii")
+        if len(user_ids) < DISPATCH_STREAM_CHUNK:
+            return
+        last_id = user_ids[-1]
+
+@router.get(
+    "/types/{notification_type_key}/enabled-users",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"text/plain": {}}, "description": "Newline-separated user IDs"},
+        401: {"model": ErrorResponse, "description": "Unauthorized"},
+        404: {"model": ErrorResponse, "description": "Unknown Notification Type"},
+    },
+    summary="Stream every active user with a notification type enabled",
+    tags=["Dispatch"],
+    dependencies=[Depends(require_service_key)],
+)
+async def stream_enabled_users(
+    notification_type_key: str,
+    default_enabled: bool = Query(True, description="Whether users without a stored preference count as enabled"),
+    db: AsyncSession = Depends(get_db),
+) -> StreamingResponse:
+    """
+    Streams opted-in user IDs in ascending order as text/plain, one per line.
+    """
+    type_id = await resolve_type_id(db, notification_type_key)
+    return StreamingResponse(
+        iter_enabled_user_ids(type_id, default_enabled),
+        media_type="text/plain",
+    )
+
+# Exported router
+__all__ = ["router"]
@@ -0,0 +1,56 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from ..schemas import ErrorResponse
+from ..export import EXPORT_FORMATS, EXPORT_MEDIA_TYPES, iter_export_bytes, parse_cursor
+from ..routes.dispatch import require_service_key
+
+import logging
+
+router = APIRouter()
+logger = logging.getLogger("notification_preferences_app.export")
+
+@router.get(
+    "/preferences",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()},
+            "description": "Preferences ordered by id",
+        },
+        401: {"model": ErrorResponse, "description": "Unauthorized"},
+        422: {"model": ErrorResponse, "description": "Invalid Format or Cursor"},
+    },
+    summary="Stream every user's notification preferences as NDJSON or CSV",
+    tags=["Export"],
+    dependencies=[Depends(require_service_key)],
+)
+async def export_preferences(
+    format: str = Query("ndjson", description="Output format: ndjson or csv"),
+    cursor: Optional[str] = Query(None, description="Resume after this preference id (the last `id` received)"),
+) -> StreamingResponse:
+    """
+    Streams all preferences with keyset pagination and server-side cursors; memory use
+    does not grow with the number of rows.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}."
+        )
+    try:
+        after_id = parse_cursor(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid cursor."
+        )
+    return StreamingResponse(
+        iter_export_bytes(format, after_id),
+        media_type=EXPORT_MEDIA_TYPES[format],
+    )
+
+# Exported router
+__all__ = ["router"]
@@ -1,24 +1,77 @@
 from typing import List, Optional
+from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models import NotificationType, User
-from ..schemas import NotificationTypeListResponse, NotificationTypeOut, ErrorResponse
+from ..auth_cache import AuthenticatedUser
+from ..models import NotificationType, UserNotificationPreference
+from ..schemas import (
+    NotificationTypeListResponse,
+    NotificationPreferenceOut,
+    NotificationPreferenceListResponse,
+    NotificationPreferenceUpdate,
+    NotificationPreferenceUpdateResponse,
+    UserNotificationPreferenceOut,
+    ErrorResponse,
+)
+from ..catalog_cache import catalog_cache
+from ..change_feed import CHANGE_FEED_MAX_SUBSCRIBERS, change_feed, iter_catalog_events
+from ..serialization import (
+    COMPACT_JSON_MEDIA_TYPE,
+    FAST_JSON_RESPONSES,
+    MSGPACK_MEDIA_TYPE,
+    catalog_media_types,
+    negotiate_media_type,
+    parse_fields,
+    preference_items,
+    serialize_preferences,
+)
 from ..i18n import get_locale_from_request
-from ..routes.auth import get_current_user
-from ..database import get_db
+from ..translations import catalog_columns
+from ..routes.auth import get_current_principal, get_current_user
+from ..database import get_db, dialect_insert
 
 import logging
+import os
 
 router = APIRouter()
 logger = logging.getLogger("notification_preferences_app.notifications")
 
+# Browsers must revalidate with If-None-Match; override (e.g. "public, max-age=60") to let nginx cache
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "private, no-cache")
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluates an If-None-Match header against a strong ETag (weak comparison, per RFC 9110).
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
 @router.get(
     "/",
     response_model=NotificationTypeListResponse,
     responses={
+        200: {
+            "content": {COMPACT_JSON_MEDIA_TYPE: {}, MSGPACK_MEDIA_TYPE: {}},
+            "description": "The catalog, as JSON objects or compact rows depending on Accept",
+        },
+        304: {"description": "Not Modified (If-None-Match matched the current ETag)"},
         401: {"model": ErrorResponse, "description": "Unauthorized"},
+        406: {"model": ErrorResponse, "description": "No Acceptable Encoding"},
+        422: {"model": ErrorResponse, "description": "Unknown Field"},
         500: {"model": ErrorResponse, "description": "Internal Server Error"},
     },
     summary="Get all available notification types and their descriptions",
@@ -26,45 +79,262 @@ logger = logging.getLogger("notification_preferences_app.notifications")
 )
 async def list_notification_types(
     request: Request,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to include; `key` is always included"),
+    since: Optional[str] = Query(None, description="Catalog version (X-Catalog-Version) to return changes since"),
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_principal),
 ) -> NotificationTypeListResponse:
     """
     Returns all available notification types and their descriptions in the user's selected language.
     Unavailable or deprecated types are either hidden or clearly marked with explanations.
     Only accessible to authenticated users.
+    The response body is served from the in-process catalog cache and carries a strong ETag;
+    clients sending a matching If-None-Match receive 304 Not Modified.
+
+    `fields` restricts the attributes sent. Accept selects the encoding: JSON objects
+    (default), or rows of values in `fields` order as compact JSON
+    (application/vnd.notification-catalog.compact+json) or MessagePack
+    (application/msgpack). With `since`, only types changed since that version are sent,
+    plus the keys of removed ones; `full` is true when the version is no longer known
+    and the whole catalog was sent instead.
+    """
+    try:
+        selected_fields = parse_fields(fields)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown fields: {exc}."
+        )
+    media_type = negotiate_media_type(request.headers.get("accept"), catalog_media_types())
+    if media_type is None:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"Supported encodings: {', '.join(catalog_media_types())}."
+        )
+    try:
+        await catalog_cache.ensure_loaded(db)
+        locale = get_locale_from_request(request)
+        entry = await catalog_cache.get_variant(db, locale, selected_fields, media_type, since)
+        headers = {
+            "ETag": entry.etag,
+            "Cache-Control": CATALOG_CACHE_CONTROL,
+            "Content-Language": entry.locale,
+            "Vary": "Accept-Language, Accept",
+            "X-Catalog-Version": entry.version,
+        }
+        if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=entry.body, media_type=media_type, headers=headers)
+    except Exception as exc:
+        logger.error(f"Failed to fetch notification types: {exc}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not fetch notification types at this time."
+        )
+
+@router.get(
+    "/stream",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"text/event-stream": {}}, "description": "Server-Sent Events stream of catalog changes"},
+        401: {"model": ErrorResponse, "description": "Unauthorized"},
+        503: {"model": ErrorResponse, "description": "Too Many Subscribers"},
+    },
+    summary="Subscribe to notification catalog changes",
+    tags=["Notifications"],
+)
+async def stream_catalog_changes(
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_principal),
+) -> StreamingResponse:
+    """
+    Streams a `catalog` Server-Sent Event whenever a notification type changes, so clients
+    can re-fetch the catalog instead of polling it.
+    """
+    # The stream outlives the request; don't keep a pooled connection checked out for it
+    await db.close()
+    if change_feed.subscriber_count >= CHANGE_FEED_MAX_SUBSCRIBERS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many open change streams. Please retry shortly.",
+            headers={"Retry-After": "5"},
+        )
+    return StreamingResponse(
+        iter_catalog_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get(
+    "/preferences",
+    response_model=NotificationPreferenceListResponse,
+    responses={
+        401: {"model": ErrorResponse, "description": "Unauthorized"},
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+    },
+    summary="Get the notification catalog merged with the user's preferences",
+    tags=["Notifications"],
+)
+async def get_notification_preferences(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_principal),
+) -> NotificationPreferenceListResponse:
+    """
+    Returns every active notification type with the user's enabled flag, in a single joined query.
+    Types the user never toggled report the default (enabled). With the translations table
+    enabled, only the requested locale's strings are selected.
     """
     try:
         locale = get_locale_from_request(request)
-        # Fetch all notification types (active and deprecated, but not unavailable)
-        notification_types: List[NotificationType] = (
-            db.query(NotificationType)
-            .filter(NotificationType.is_active == True)
+        result = await db.execute(
+            select(*catalog_columns(locale), UserNotificationPreference.enabled)
+            .outerjoin(
+                UserNotificationPreference,
+                and_(
+                    UserNotificationPreference.notification_type_id == NotificationType.id,
+                    UserNotificationPreference.user_id == current_user.id,
+                ),
+            )
+            .where(NotificationType.is_active == True)
             .order_by(NotificationType.key.asc())
-            .all()
         )
+        rows = result.all()
+        if FAST_JSON_RESPONSES:
+            return Response(content=serialize_preferences(rows, locale), media_type="application/json")
+        preferences: List[NotificationPreferenceOut] = [
+            NotificationPreferenceOut(**item) for item in preference_items(rows, locale)
+        ]
+        return NotificationPreferenceListResponse(preferences=preferences)
+    except Exception as exc:
+        logger.error(f"Failed to fetch notification preferences: {exc}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not fetch notification preferences at this time."
+        )
+
+@router.put(
+    "/preferences",
+    response_model=NotificationPreferenceUpdateResponse,
+    responses={
+        401: {"model": ErrorResponse, "description": "Unauthorized"},
+        409: {"model": ErrorResponse, "description": "Notification Catalog Changed"},
+        422: {"model": ErrorResponse, "description": "Unknown Notification Type"},
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+    },
+    summary="Replace the user's notification preferences",
+    tags=["Notifications"],
+)
+async def replace_notification_preferences(
+    update: NotificationPreferenceUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+) -> NotificationPreferenceUpdateResponse:
+    """
+    Makes the submitted toggles the user's complete set: listed types are upserted and
+    every type not listed goes back to the default (enabled), in one transaction.
+    """
+    return await _save_preferences(update, db, current_user, replace=True)
+
+@router.patch(
+    "/preferences",
+    response_model=NotificationPreferenceUpdateResponse,
+    responses={
+        401: {"model": ErrorResponse, "description": "Unauthorized"},
+        409: {"model": ErrorResponse, "description": "Notification Catalog Changed"},
+        422: {"model": ErrorResponse, "description": "Unknown Notification Type"},
+        500: {"model": ErrorResponse, "description": "Internal Server Error"},
+    },
+    summary="Update some of the user's notification preferences",
+    tags=["Notifications"],
+)
+async def update_notification_preferences(
+    update: NotificationPreferenceUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+) -> NotificationPreferenceUpdateResponse:
+    """
+    Upserts the submitted toggles; types not listed keep their current setting.
+    """
+    return await _save_preferences(update, db, current_user, replace=False)
 
-        result: List[NotificationTypeOut] = []
-        for nt in notification_types:
-            # Hide deprecated types if not meant to be shown, or mark them
-            description = nt.get_description(locale)
-            deprecated_reason = nt.get_deprecated_reason(locale) if nt.is_deprecated else None
-            result.append(
-                NotificationTypeOut(
-                    key=nt.key,
-                    description=description,
-                    is_active=nt.is_active,
-                    is_deprecated=nt.is_deprecated,
-                    deprecated_reason=deprecated_reason,
+async def _save_preferences(
+    update: NotificationPreferenceUpdate,
+    db: AsyncSession,
+    current_user: AuthenticatedUser,
+    replace: bool,
+) -> NotificationPreferenceUpdateResponse:
+    """
+    Upserts all submitted toggles with one INSERT ... ON CONFLICT statement on
+    (user_id, notification_type_id). With `replace`, the user's rows for types not
+    submitted are deleted first, so they report the default again.
+    """
+    try:
+        # Later entries win when a key is submitted twice
+        toggles = {item.notification_type_key: item.enabled for item in update.preferences}
+        if not toggles and not replace:
+            return NotificationPreferenceUpdateResponse(preferences=[])
+        type_ids = await catalog_cache.type_ids(db)
+        unknown = sorted(key for key in toggles if key not in type_ids)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Unknown or inactive notification types: {', '.join(unknown)}"
+            )
+        table = UserNotificationPreference.__table__
+        if replace:
+            await db.execute(
+                delete(table).where(
+                    table.c.user_id == current_user.id,
+                    table.c.notification_type_id.not_in([type_ids[key] for key in toggles]),
                 )
             )
-
-        return NotificationTypeListResponse(notification_types=result)
+        saved = []
+        if toggles:
+            now = datetime.utcnow()
+            rows = [
+                {
+                    "user_id": current_user.id,
+                    "notification_type_id": type_ids[key],
+                    "enabled": enabled,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for key, enabled in toggles.items()
+            ]
+            stmt = dialect_insert(db, table).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.user_id, table.c.notification_type_id],
+                set_={"enabled": stmt.excluded.enabled, "updated_at": stmt.excluded.updated_at},
+            ).returning(table.c.id, table.c.notification_type_id, table.c.enabled)
+            saved = (await db.execute(stmt)).all()
+        await db.commit()
+        keys_by_id = {type_id: key for key, type_id in type_ids.items()}
+        return NotificationPreferenceUpdateResponse(
+            preferences=[
+                UserNotificationPreferenceOut(
+                    id=row.id,
+                    notification_type_key=keys_by_id[row.notification_type_id],
+                    enabled=row.enabled,
+                )
+                for row in saved
+            ]
+        )
+    except HTTPException:
+        raise
+    except IntegrityError:
+        # A type was removed after the catalog snapshot was taken
+        await db.rollback()
+        catalog_cache.invalidate()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The notification catalog changed. Please reload and try again."
+        )
     except Exception as exc:
-        logger.error(f"Failed to fetch notification types: {exc}", exc_info=True)
+        logger.error(f"Failed to save notification preferences: {exc}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Could not fetch notification types at this time."
+            detail="Could not save notification preferences at this time."
         )
 
 # Exported router
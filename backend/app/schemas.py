@@ -44,6 +44,41 @@ class UserNotificationPreferenceBase(BaseModel):
 class UserNotificationPreferenceOut(UserNotificationPreferenceBase):
     id: int = Field(..., description="Preference ID")
 
+class NotificationPreferenceOut(NotificationTypeOut):
+    enabled: bool = Field(..., description="Is this notification enabled for the user")
+
+class NotificationPreferenceListResponse(BaseModel):
+    preferences: List[NotificationPreferenceOut] = Field(
+        ..., description="Notification catalog merged with the user's settings"
+    )
+
+class NotificationPreferenceUpdate(BaseModel):
+    preferences: List[UserNotificationPreferenceBase] = Field(
+        ...,
+        description=(
+            "Toggles to save. PUT replaces the whole set (types not listed go back to the "
+            "default, enabled); PATCH merges (types not listed keep their current setting)"
+        ),
+    )
+
+class NotificationPreferenceUpdateResponse(BaseModel):
+    preferences: List[UserNotificationPreferenceOut] = Field(
+        ..., description="Saved preferences"
+    )
+
+class PreferenceResolveRequest(BaseModel):
+    notification_type_key: str = Field(..., description="Notification type key")
+    user_ids: List[int] = Field(..., description="User IDs to check")
+    default_enabled: bool = Field(
+        True, description="Whether users without a stored preference count as enabled"
+    )
+
+class PreferenceResolveResponse(BaseModel):
+    notification_type_key: str = Field(..., description="Notification type key")
+    enabled_user_ids: List[int] = Field(..., description="Subset of the requested active users with the type enabled")
+    inactive_user_ids: List[int] = Field(default_factory=list, description="Requested users whose account is deactivated")
+    unknown_user_ids: List[int] = Field(default_factory=list, description="Requested user IDs that do not exist")
+
 class ErrorResponse(BaseModel):
     error: str = Field(..., description="Error code")
     message: str = Field(..., description="User-friendly error message")
@@ -59,5 +94,11 @@ __all__ = [
     "UserOut",
     "UserNotificationPreferenceBase",
     "UserNotificationPreferenceOut",
+    "NotificationPreferenceOut",
+    "NotificationPreferenceListResponse",
+    "NotificationPreferenceUpdate",
+    "NotificationPreferenceUpdateResponse",
+    "PreferenceResolveRequest",
+    "PreferenceResolveResponse",
     "ErrorResponse",
 ]
\ No newline at end of file
@@ -0,0 +1,195 @@
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi.responses import Response
+
+from .i18n import parse_i18n_text, translate_i18n
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+# Opt-in: serve catalog, preferences and /auth/me through the serializers below
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+
+# Catalog encodings negotiated via Accept
+JSON_MEDIA_TYPE = "application/json"
+COMPACT_JSON_MEDIA_TYPE = "application/vnd.notification-catalog.compact+json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+CATALOG_FIELDS = ("key", "description", "is_active", "is_deprecated", "deprecated_reason")
+# is_active is always true in the served catalog, so compact encodings drop it by default
+COMPACT_DEFAULT_FIELDS = ("key", "description", "is_deprecated", "deprecated_reason")
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Compact JSON encoding; uses orjson when installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response rendered with `dumps`, skipping jsonable_encoder.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def translate_reason(deprecated_reason: Any, locale: str) -> Optional[str]:
+    """
+    Same result as NotificationType.get_deprecated_reason for a raw column value.
+    """
+    return translate_i18n(parse_i18n_text(deprecated_reason), locale)
+
+
+def translate_description(descriptions: Any, locale: str) -> str:
+    """
+    Picks `locale` from a descriptions dict; strings were already localized in SQL.
+    """
+    if isinstance(descriptions, str):
+        return descriptions
+    return translate_i18n(descriptions, locale) or ""
+
+
+def catalog_items(rows: Iterable[Sequence], locale: str) -> List[dict]:
+    """
+    Builds NotificationTypeOut-shaped dicts from
+    (key, descriptions, is_active, is_deprecated, deprecated_reason, ...) rows, where
+    descriptions/deprecated_reason are either raw i18n values or already-localized strings.
+    """
+    return [
+        {
+            "key": row[0],
+            "description": translate_description(row[1], locale),
+            "is_active": row[2],
+            "is_deprecated": row[3],
+            "deprecated_reason": translate_reason(row[4], locale) if row[3] else None,
+        }
+        for row in rows
+    ]
+
+
+def serialize_catalog(rows: Iterable[Sequence], locale: str) -> bytes:
+    return dumps({"notification_types": catalog_items(rows, locale)})
+
+
+def preference_items(rows: Sequence[Sequence], locale: str) -> List[dict]:
+    """
+    Catalog rows with a trailing `enabled` column (None when the user has no row).
+    """
+    items = catalog_items(rows, locale)
+    for item, row in zip(items, rows):
+        item["enabled"] = True if row[5] is None else row[5]
+    return items
+
+
+def serialize_preferences(rows: Sequence[Sequence], locale: str) -> bytes:
+    return dumps({"preferences": preference_items(rows, locale)})
+
+
+def catalog_media_types() -> List[str]:
+    """
+    Catalog encodings this process can produce, JSON first; MessagePack needs `msgpack`.
+    """
+    media_types = [JSON_MEDIA_TYPE, COMPACT_JSON_MEDIA_TYPE]
+    if msgpack is not None:
+        media_types.append(MSGPACK_MEDIA_TYPE)
+    return media_types
+
+
+def negotiate_media_type(accept: Optional[str], offered: Sequence[str]) -> Optional[str]:
+    """
+    Picks the offered media type the Accept header ranks highest (by q-value, then by
+    order of `offered`). Returns the first offer without a header, None if none is
+    acceptable.
+    """
+    if not accept:
+        return offered[0]
+    ranges: Dict[str, float] = {}
+    for part in accept.split(","):
+        media_range, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        media_range = media_range.strip().lower()
+        if media_range:
+            ranges[media_range] = max(quality, ranges.get(media_range, 0.0))
+    best, best_quality = None, 0.0
+    for media_type in offered:
+        main_type = media_type.split("/")[0]
+        quality = ranges.get(media_type, ranges.get(f"{main_type}/*", ranges.get("*/*", 0.0)))
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def parse_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Parses a comma-separated `fields=` selector into catalog field names in canonical
+    order, always including `key`. Raises ValueError on unknown names.
+    """
+    if value is None or not value.strip():
+        return None
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = requested - set(CATALOG_FIELDS)
+    if unknown:
+        raise ValueError(", ".join(sorted(unknown)))
+    requested.add("key")
+    return tuple(name for name in CATALOG_FIELDS if name in requested)
+
+
+def encode_catalog(items: Sequence[dict], fields: Sequence[str], media_type: str, extra: Optional[dict] = None) -> bytes:
+    """
+    Encodes catalog items restricted to `fields`: as objects under `notification_types`
+    for JSON, as one array per type under `rows` (column names in `fields`) for the
+    compact JSON and MessagePack encodings. `extra` adds top-level members.
+    """
+    body = dict(extra or {})
+    if media_type == JSON_MEDIA_TYPE:
+        body["notification_types"] = [{name: item[name] for name in fields} for item in items]
+        return dumps(body)
+    body["fields"] = list(fields)
+    body["rows"] = [[item[name] for name in fields] for item in items]
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(body, use_bin_type=True)
+    return dumps(body)
+
+
+# Exported symbols
+__all__ = [
+    "FAST_JSON_RESPONSES",
+    "JSON_MEDIA_TYPE",
+    "COMPACT_JSON_MEDIA_TYPE",
+    "MSGPACK_MEDIA_TYPE",
+    "CATALOG_FIELDS",
+    "COMPACT_DEFAULT_FIELDS",
+    "dumps",
+    "FastJSONResponse",
+    "translate_reason",
+    "translate_description",
+    "catalog_items",
+    "serialize_catalog",
+    "preference_items",
+    "serialize_preferences",
+    "catalog_media_types",
+    "negotiate_media_type",
+    "parse_fields",
+    "encode_catalog",
+]
@@ -0,0 +1,231 @@
+"""
+Production launcher (pre-fork).
+
+The parent process binds the listening socket, imports the application, builds the
+OpenAPI schema and warms the catalog and locale caches, then forks the workers. Workers
+inherit the warm caches copy-on-write and each run uvicorn on the shared socket; the
+parent only supervises them, restarting any that die.
+
+SIGTERM (or SIGINT) on the parent is forwarded to the workers. A worker receiving
+SIGTERM first drains: /health and /health/ready start answering 503 for
+SERVER_DRAIN_SECONDS so the load balancer stops sending traffic, then uvicorn stops
+accepting connections and waits up to SERVER_GRACEFUL_TIMEOUT for in-flight requests. A second signal stops it immediately.
+
+Usage (from the backend directory):
+
+    python -m app.server --workers 4 --port 8000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Dict, Optional, Sequence
+
+from .structured_logging import configure_logging, shutdown_logging
+
+logger = logging.getLogger("notification_preferences_app.server")
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+SERVER_PRELOAD = os.getenv("SERVER_PRELOAD", "true").lower() == "true"
+# Seconds /health reports "draining" before the worker stops accepting connections
+SERVER_DRAIN_SECONDS = float(os.getenv("SERVER_DRAIN_SECONDS", "5"))
+# Seconds in-flight requests get to finish once the worker stops accepting
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+# Workers exiting this soon after start are not restarted in a tight loop
+SERVER_RESTART_BACKOFF_SECONDS = 1.0
+
+
+async def _warm_caches() -> Dict[str, object]:
+    from .catalog_cache import catalog_cache
+    from .database import AsyncSessionLocal, dispose_engine
+    from .i18n import locale_negotiator
+
+    try:
+        async with AsyncSessionLocal() as db:
+            version = await catalog_cache.refresh(db)
+        # Pre-populate the Accept-Language LRU with the plain tags of every catalog locale
+        for locale in locale_negotiator.supported:
+            locale_negotiator.negotiate(locale)
+        return {"catalog_version": version, "locales": list(locale_negotiator.supported)}
+    finally:
+        # Pooled connections must not be shared with forked workers
+        await dispose_engine()
+
+
+def preload() -> Dict[str, object]:
+    """
+    Imports the app, compiles its routes and OpenAPI schema and warms the caches.
+    Returns the time each step took.
+    """
+    started = time.perf_counter()
+    from .main import app
+
+    imported = time.perf_counter()
+    app.openapi()
+    compiled = time.perf_counter()
+    warm: Dict[str, object] = {}
+    try:
+        warm = asyncio.run(_warm_caches())
+    except Exception as exc:
+        # Workers still start cold; the catalog loads on the first request
+        logger.warning(f"Cache warm-up failed, starting cold: {exc}")
+    finished = time.perf_counter()
+    return {
+        "import_seconds": imported - started,
+        "openapi_seconds": compiled - imported,
+        "warm_seconds": finished - compiled,
+        **warm,
+    }
+
+
+def _bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, drain_seconds: float, graceful_timeout: int) -> None:
+    import uvicorn
+
+    from .lifecycle import server_state
+    from .main import app
+
+    class DrainingServer(uvicorn.Server):
+        def handle_exit(self, sig, frame) -> None:
+            if sig == signal.SIGTERM and not server_state.draining and drain_seconds > 0:
+                server_state.start_draining()
+                timer = threading.Timer(drain_seconds, super().handle_exit, args=(sig, frame))
+                timer.daemon = True
+                timer.start()
+                return
+            super().handle_exit(sig, frame)
+
+    config = uvicorn.Config(
+        app,
+        lifespan="on",
+        log_config=None,
+        proxy_headers=True,
+        timeout_graceful_shutdown=graceful_timeout,
+    )
+    DrainingServer(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """
+    Forks and supervises the worker processes.
+    """
+
+    def __init__(self, sock: socket.socket, workers: int, drain_seconds: float, graceful_timeout: int):
+        self.sock = sock
+        self.workers = workers
+        self.drain_seconds = drain_seconds
+        self.graceful_timeout = graceful_timeout
+        self.children: Dict[int, float] = {}
+        self.stopping = False
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                _run_worker(self.sock, self.drain_seconds, self.graceful_timeout)
+            except BaseException:
+                logger.exception("Worker crashed")
+                code = 1
+            finally:
+                shutdown_logging()
+                logging.shutdown()
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}")
+
+    def _on_signal(self, sig, frame) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info(f"Received {signal.Signals(sig).name}, stopping {len(self.children)} workers")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        for _ in range(self.workers):
+            self.spawn()
+        deadline: Optional[float] = None
+        while self.children:
+            if self.stopping and deadline is None:
+                deadline = time.monotonic() + self.drain_seconds + self.graceful_timeout + 5
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                if deadline is not None and time.monotonic() > deadline:
+                    for child in list(self.children):
+                        logger.warning(f"Worker {child} did not stop in time, killing it")
+                        os.kill(child, signal.SIGKILL)
+                    deadline = time.monotonic() + 5
+                time.sleep(0.1)
+                continue
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            logger.warning(f"Worker {pid} exited unexpectedly (status {status}), restarting")
+            if time.monotonic() - started < SERVER_RESTART_BACKOFF_SECONDS:
+                time.sleep(SERVER_RESTART_BACKOFF_SECONDS)
+            self.spawn()
+        self.sock.close()
+        logger.info("All workers stopped")
+        return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the API with pre-forked uvicorn workers.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--backlog", type=int, default=SERVER_BACKLOG)
+    parser.add_argument("--no-preload", dest="preload", action="store_false", default=SERVER_PRELOAD)
+    parser.add_argument("--drain-seconds", type=float, default=SERVER_DRAIN_SECONDS)
+    parser.add_argument("--graceful-timeout", type=int, default=SERVER_GRACEFUL_TIMEOUT)
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    configure_logging()
+    sock = _bind_socket(args.host, args.port, args.backlog)
+    if args.preload:
+        timings = preload()
+        logger.info(f"Preloaded application: {timings}")
+    logger.info(f"Listening on {args.host}:{args.port} with {args.workers} workers")
+    return Supervisor(sock, args.workers, args.drain_seconds, args.graceful_timeout).run()
+
+
+# Exported symbols
+__all__ = [
+    "preload",
+    "Supervisor",
+    "main",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""
+Structured, non-blocking logging with sampled error logs.
+
+Records are handed to a bounded queue and written by a background listener thread, so
+a request never waits on stderr; when the queue is full the record is dropped and
+counted instead. LOG_FORMAT=json (the default) renders one JSON object per line with
+the record's structured fields; LOG_FORMAT=text keeps the classic format.
+
+Error logs from the exception handlers go through a per-error-class sampler: each class
+(e.g. `http_401`, `validation_error`) logs at most LOG_SAMPLE_BURST lines per
+LOG_SAMPLE_WINDOW_SECONDS, and the next line logged for a class reports how many were
+suppressed. The `errors_total` counter is incremented for every error regardless.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .metrics import CallbackMetric, Counter
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Lines logged per error class and window before further ones are only counted
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "10"))
+LOG_SAMPLE_WINDOW_SECONDS = float(os.getenv("LOG_SAMPLE_WINDOW_SECONDS", "10"))
+# Error classes tracked by the sampler before its state is reset
+LOG_SAMPLE_MAX_CLASSES = 1024
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+errors_total = Counter("errors_total", "Errors answered by the global exception handlers", ["error_class"])
+log_suppressed_total = Counter(
+    "log_records_suppressed_total", "Error log lines skipped by sampling", ["error_class"],
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: timestamp, level, logger, message, the record's
+    `fields` extra (if any) and the formatted exception.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    The classic text format with the record's `fields` appended as key=value pairs.
+    """
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if not fields:
+            return line
+        first, newline, rest = line.partition("\n")
+        pairs = " ".join(f"{name}={value}" for name, value in fields.items())
+        return f"{first} [{pairs}]{newline}{rest}"
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler that drops (and counts) records instead of blocking or printing an
+    error when the queue is full.
+    """
+
+    def __init__(self, log_queue: "queue.Queue"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and exception text here, the listener formats the rest
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _LoggingState:
+    def __init__(self):
+        self.handler: Optional[DroppingQueueHandler] = None
+        self.listener: Optional[QueueListener] = None
+        self.lock = threading.Lock()
+
+
+_state = _LoggingState()
+
+
+def _output_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    return handler
+
+
+def _start_listener() -> None:
+    _state.listener = QueueListener(_state.handler.queue, _output_handler(), respect_handler_level=False)
+    _state.listener.start()
+
+
+def _restart_after_fork() -> None:
+    # The listener thread does not survive fork(); workers start their own
+    if _state.handler is not None:
+        _state.handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+        _start_listener()
+
+
+def configure_logging(level: str = LOG_LEVEL) -> None:
+    """
+    Routes the root logger through the bounded queue. Idempotent.
+    """
+    with _state.lock:
+        if _state.handler is not None:
+            return
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        _state.handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        root.addHandler(_state.handler)
+        root.setLevel(level)
+        _start_listener()
+        os.register_at_fork(after_in_child=_restart_after_fork)
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """
+    Flushes queued records and stops the listener thread.
+    """
+    with _state.lock:
+        if _state.listener is not None:
+            _state.listener.stop()
+            _state.listener = None
+
+
+CallbackMetric(
+    "log_records_dropped_total",
+    "Log records dropped because the log queue was full",
+    lambda: _state.handler.dropped if _state.handler else 0,
+    "counter",
+)
+
+
+class LogSampler:
+    """
+    Fixed-window sampler: allows `burst` log lines per key and window and counts the
+    rest, reporting the count with the next line allowed for that key.
+    """
+
+    def __init__(self, burst: int = LOG_SAMPLE_BURST, window: float = LOG_SAMPLE_WINDOW_SECONDS):
+        self.burst = burst
+        self.window = window
+        # key -> [window start, lines logged in window, suppressed since last logged line]
+        self._windows: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key: str) -> Tuple[bool, int]:
+        """
+        Returns (log this one?, lines suppressed for `key` since the last one logged).
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None:
+                if len(self._windows) >= LOG_SAMPLE_MAX_CLASSES:
+                    self._windows.clear()
+                state = self._windows[key] = [now, 0, 0]
+            elif now - state[0] >= self.window:
+                state[0], state[1] = now, 0
+            if state[1] < self.burst:
+                state[1] += 1
+                suppressed, state[2] = int(state[2]), 0
+                return True, suppressed
+            state[2] += 1
+            return False, 0
+
+
+error_log_sampler = LogSampler()
+
+
+def log_error(
+    logger: logging.Logger,
+    level: int,
+    error_class: str,
+    message: str,
+    fields: Optional[Callable[[], dict]] = None,
+    exc_info=None,
+) -> None:
+    """
+    Counts an error under `error_class` and logs it if the sampler allows. `fields`
+    is a callable so the structured fields are only built for lines actually written.
+    """
+    errors_total.inc(error_class=error_class)
+    if not logger.isEnabledFor(level):
+        return
+    allowed, suppressed = error_log_sampler.allow(error_class)
+    if not allowed:
+        log_suppressed_total.inc(error_class=error_class)
+        return
+    extra = {"error_class": error_class, **(fields() if fields else {})}
+    if suppressed:
+        extra["suppressed"] = suppressed
+    logger.log(level, message, extra={"fields": extra}, exc_info=exc_info)
+
+
+# Exported symbols
+__all__ = [
+    "LOG_FORMAT",
+    "JsonFormatter",
+    "TextFormatter",
+    "DroppingQueueHandler",
+    "configure_logging",
+    "shutdown_logging",
+    "LogSampler",
+    "error_log_sampler",
+    "log_error",
+]
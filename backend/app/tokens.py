@@ -0,0 +1,222 @@
+"""
+Access token issuing, verification and revocation.
+
+Revoking a user's tokens bumps `users.token_generation`; tokens carry the generation
+they were issued with (`gen`) and are rejected once it is lower than the user's.
+
+Upgrading a database created before `token_generation` existed (`create_all` does not
+alter existing tables, and every users query selects the column):
+
+    python -m app.tokens migrate   (adds the column with default 0; safe to re-run)
+
+Run it before deploying the version that reads the column.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Sequence
+
+from jose import JWTError, jwt
+
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+# Signing keys as "kid:secret,kid:secret"; the first one (or AUTH_ACTIVE_KEY_ID) signs new tokens
+# and the others are still accepted, so a key can be retired once its tokens have expired
+AUTH_SIGNING_KEYS = os.getenv("AUTH_SIGNING_KEYS", "")
+AUTH_ACTIVE_KEY_ID = os.getenv("AUTH_ACTIVE_KEY_ID", "")
+# Single-key fallback used when AUTH_SIGNING_KEYS is not set
+SECRET_KEY = os.getenv("AUTH_SECRET_KEY", "supersecretkey")
+DEFAULT_KEY_ID = "default"
+
+
+class InvalidToken(Exception):
+    """
+    Raised when a token is malformed, expired, signed with an unknown key or revoked.
+    """
+
+
+def parse_signing_keys(spec: str) -> Dict[str, str]:
+    keys: Dict[str, str] = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        kid, sep, secret = item.partition(":")
+        if not sep or not kid or not secret:
+            raise ValueError(f"Invalid AUTH_SIGNING_KEYS entry for key {kid or '?'!r}; expected kid:secret")
+        keys[kid] = secret
+    return keys
+
+
+class KeyRing:
+    """
+    Signing keys indexed by key id. Tokens carry their key id in the `kid` header, so
+    verification picks the right secret without trying every key.
+    """
+
+    def __init__(self, keys: Dict[str, str], active_kid: Optional[str] = None):
+        if not keys:
+            raise ValueError("At least one signing key is required")
+        self.keys = dict(keys)
+        self.active_kid = active_kid or next(iter(self.keys))
+        if self.active_kid not in self.keys:
+            raise ValueError(f"Active signing key {self.active_kid!r} is not configured")
+
+    @classmethod
+    def from_env(cls) -> "KeyRing":
+        keys = parse_signing_keys(AUTH_SIGNING_KEYS)
+        if not keys:
+            keys = {DEFAULT_KEY_ID: SECRET_KEY}
+        return cls(keys, AUTH_ACTIVE_KEY_ID or None)
+
+    def sign(self, claims: dict) -> str:
+        return jwt.encode(
+            claims, self.keys[self.active_kid], algorithm=ALGORITHM, headers={"kid": self.active_kid}
+        )
+
+    def verify(self, token: str) -> dict:
+        try:
+            kid = jwt.get_unverified_header(token).get("kid") or DEFAULT_KEY_ID
+            secret = self.keys.get(kid)
+            if secret is None:
+                raise InvalidToken(f"Unknown signing key {kid!r}")
+            return jwt.decode(token, secret, algorithms=[ALGORITHM])
+        except JWTError as exc:
+            raise InvalidToken(str(exc)) from exc
+
+
+class RevocationList:
+    """
+    In-memory revocation state checked on every token verification: per user, the
+    lowest token generation still accepted, as last seen by this process.
+    """
+
+    def __init__(self):
+        self._min_generation: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def revoke_user(self, user_id: int, generation: int) -> None:
+        """
+        Rejects every token of `user_id` issued with a generation below `generation`.
+        """
+        with self._lock:
+            if generation > self._min_generation.get(user_id, 0):
+                self._min_generation[user_id] = generation
+
+    def is_revoked(self, claims: dict) -> bool:
+        user_id = claims.get("uid")
+        if user_id is None:
+            return False
+        return claims.get("gen", 0) < self._min_generation.get(user_id, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._min_generation.clear()
+
+
+class TokenService:
+    """
+    Issues and verifies access tokens with self-contained claims:
+    `sub` (email), `uid`, `loc` (locale), `gen` (the user's token generation),
+    `jti`, `iat` and `exp`.
+    """
+
+    def __init__(self, key_ring: KeyRing, revocations: RevocationList, expire_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES):
+        self.key_ring = key_ring
+        self.revocations = revocations
+        self.expire_minutes = expire_minutes
+
+    def issue(self, user_id: int, email: str, locale: str, generation: int, expires_delta: Optional[timedelta] = None) -> str:
+        now = datetime.utcnow()
+        claims = {
+            "sub": email,
+            "uid": user_id,
+            "loc": locale,
+            "gen": generation,
+            "jti": uuid.uuid4().hex,
+            "iat": now,
+            "exp": now + (expires_delta or timedelta(minutes=self.expire_minutes)),
+        }
+        return self.key_ring.sign(claims)
+
+    def verify(self, token: str) -> dict:
+        claims = self.key_ring.verify(token)
+        if not claims.get("sub"):
+            raise InvalidToken("Token has no subject")
+        if self.revocations.is_revoked(claims):
+            raise InvalidToken("Token has been revoked")
+        return claims
+
+
+def is_stateless(claims: dict) -> bool:
+    """
+    True when the claims carry everything needed to build a principal without the
+    users table (tokens issued before the richer claims only have `sub`).
+    """
+    return all(name in claims for name in ("uid", "loc", "gen"))
+
+
+# Process-wide revocation state and token service used by the auth router
+token_revocations = RevocationList()
+token_service = TokenService(KeyRing.from_env(), token_revocations)
+
+TOKEN_GENERATION_DDL = "ALTER TABLE users ADD COLUMN token_generation INTEGER NOT NULL DEFAULT 0"
+
+
+def add_token_generation_column(conn) -> bool:
+    """
+    Adds users.token_generation on a synchronous connection unless it already exists
+    (or the users table does not, in which case create_all builds it complete).
+    Returns whether the column was added.
+    """
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(conn)
+    if not inspector.has_table("users"):
+        return False
+    if any(column["name"] == "token_generation" for column in inspector.get_columns("users")):
+        return False
+    conn.execute(text(TOKEN_GENERATION_DDL))
+    return True
+
+
+async def _run_migrate() -> int:
+    from .database import engine
+
+    async with engine.begin() as conn:
+        added = await conn.run_sync(add_token_generation_column)
+    await engine.dispose()
+    print("Added users.token_generation" if added else "users.token_generation: nothing to do", file=sys.stderr)
+    return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage access token storage.")
+    parser.add_argument("command", choices=("migrate",))
+    parser.parse_args(argv)
+    return asyncio.run(_run_migrate())
+
+
+# Exported symbols
+__all__ = [
+    "ALGORITHM",
+    "ACCESS_TOKEN_EXPIRE_MINUTES",
+    "InvalidToken",
+    "parse_signing_keys",
+    "KeyRing",
+    "RevocationList",
+    "TokenService",
+    "is_stateless",
+    "token_revocations",
+    "token_service",
+    "add_token_generation_column",
+    "main",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
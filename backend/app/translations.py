@@ -0,0 +1,171 @@
+"""
+Normalized storage of notification type translations.
+
+`notification_type_translations` holds one row per (type, field, locale). With
+I18N_TRANSLATIONS_TABLE=true the catalog and preferences queries read only the requested
+locale from it, resolving the fallback (requested locale, then DEFAULT_LOCALE, then any
+locale) in SQL instead of shipping every language to Python.
+
+Migration path from the JSON columns, which stay in place and remain the source the
+table is built from:
+
+    1. deploy this version (the JSON columns keep being read);
+    2. python -m app.translations migrate   (creates the table if needed and backfills it;
+       safe to re-run after catalog edits);
+    3. set I18N_TRANSLATIONS_TABLE=true and restart.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, delete, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import AsyncSessionLocal, dialect_insert, engine
+from .i18n import DEFAULT_LOCALE, parse_i18n_text
+from .models import NotificationType, NotificationTypeTranslation
+
+logger = logging.getLogger("notification_preferences_app.translations")
+
+# Read localized strings from notification_type_translations instead of the JSON columns
+I18N_TRANSLATIONS_TABLE = os.getenv("I18N_TRANSLATIONS_TABLE", "false").lower() == "true"
+DESCRIPTION_FIELD = "description"
+DEPRECATED_REASON_FIELD = "deprecated_reason"
+MIGRATION_BATCH_SIZE = 1000
+
+
+def localized_text(field: str, locale: str):
+    """
+    Correlated scalar subquery returning `field` of the enclosing NotificationType row in
+    `locale`, falling back to DEFAULT_LOCALE and then to the first locale available.
+    """
+    translation = NotificationTypeTranslation
+    return (
+        select(translation.text)
+        .where(
+            translation.notification_type_id == NotificationType.id,
+            translation.field == field,
+        )
+        .order_by(
+            case((translation.locale == locale, 0), (translation.locale == DEFAULT_LOCALE, 1), else_=2),
+            translation.locale,
+        )
+        .limit(1)
+        .correlate(NotificationType)
+        .scalar_subquery()
+    )
+
+
+def catalog_columns(locale: str, use_table: bool = I18N_TRANSLATIONS_TABLE) -> list:
+    """
+    (key, description, is_active, is_deprecated, deprecated_reason) columns in the shape
+    serialization.catalog_items expects: raw i18n values, or strings already localized
+    to `locale` when the translations table is in use.
+    """
+    if use_table:
+        description = localized_text(DESCRIPTION_FIELD, locale)
+        deprecated_reason = localized_text(DEPRECATED_REASON_FIELD, locale)
+    else:
+        description = NotificationType.descriptions
+        deprecated_reason = NotificationType.deprecated_reason
+    return [
+        NotificationType.key,
+        description,
+        NotificationType.is_active,
+        NotificationType.is_deprecated,
+        deprecated_reason,
+    ]
+
+
+async def translation_locales(db: AsyncSession) -> List[str]:
+    result = await db.execute(select(NotificationTypeTranslation.locale).distinct())
+    return sorted({DEFAULT_LOCALE, *result.scalars().all()})
+
+
+def translation_rows(notification_type: NotificationType, now: Optional[datetime] = None) -> List[dict]:
+    """
+    Flattens the JSON descriptions and deprecated_reason of a type into translation rows.
+    """
+    now = now or datetime.utcnow()
+    rows = []
+    for field, values in (
+        (DESCRIPTION_FIELD, notification_type.descriptions),
+        (DEPRECATED_REASON_FIELD, parse_i18n_text(notification_type.deprecated_reason)),
+    ):
+        for locale, text in (values or {}).items():
+            if text:
+                rows.append({
+                    "notification_type_id": notification_type.id,
+                    "field": field,
+                    "locale": locale,
+                    "text": text,
+                    "updated_at": now,
+                })
+    return rows
+
+
+async def migrate_translations(session: AsyncSession) -> Tuple[int, int]:
+    """
+    Makes the translation rows of every notification type match its JSON columns:
+    upserts the rows parsed from them and deletes the ones no longer present (e.g. a
+    locale removed from `descriptions`), in one transaction. Returns the number of
+    rows written and deleted.
+    """
+    result = await session.execute(select(NotificationType))
+    now = datetime.utcnow()
+    rows = [row for notification_type in result.scalars() for row in translation_rows(notification_type, now)]
+    table = NotificationTypeTranslation.__table__
+    key_columns = (table.c.notification_type_id, table.c.field, table.c.locale)
+    parsed = {(row["notification_type_id"], row["field"], row["locale"]) for row in rows}
+    existing = await session.execute(select(*key_columns))
+    stale = [tuple(key) for key in existing if tuple(key) not in parsed]
+    for start in range(0, len(stale), MIGRATION_BATCH_SIZE):
+        await session.execute(delete(table).where(tuple_(*key_columns).in_(stale[start:start + MIGRATION_BATCH_SIZE])))
+    for start in range(0, len(rows), MIGRATION_BATCH_SIZE):
+        stmt = dialect_insert(session, table).values(rows[start:start + MIGRATION_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={"text": stmt.excluded.text, "updated_at": stmt.excluded.updated_at},
+        )
+        await session.execute(stmt)
+    await session.commit()
+    return len(rows), len(stale)
+
+
+async def _run_migrate() -> int:
+    async with engine.begin() as conn:
+        await conn.run_sync(NotificationTypeTranslation.__table__.create, checkfirst=True)
+    async with AsyncSessionLocal() as session:
+        written, deleted = await migrate_translations(session)
+    await engine.dispose()
+    print(f"Backfilled {written} notification type translations, deleted {deleted} stale ones", file=sys.stderr)
+    return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage notification type translations.")
+    parser.add_argument("command", choices=("migrate",))
+    parser.parse_args(argv)
+    return asyncio.run(_run_migrate())
+
+
+# Exported symbols
+__all__ = [
+    "I18N_TRANSLATIONS_TABLE",
+    "DESCRIPTION_FIELD",
+    "DEPRECATED_REASON_FIELD",
+    "localized_text",
+    "catalog_columns",
+    "translation_locales",
+    "translation_rows",
+    "migrate_translations",
+    "main",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Bulk import of user accounts from CSV or NDJSON.
+
+Each record needs an `email` and either a `hashed_password` (an existing bcrypt hash,
+stored as is once pwd_context recognizes it) or a plaintext `password` (hashed on the
+password worker pool); `locale` and `is_active` are optional. Accounts are written in batches with one multi-row
+INSERT ... ON CONFLICT (email) DO NOTHING per batch, each batch committed on its own,
+so existing emails are skipped and an interrupted import can simply be run again.
+
+Command line usage (from the backend directory):
+
+    python -m app.user_import users.csv
+    python -m app.user_import --format ndjson --batch-size 5000 users.ndjson
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+from typing import IO, Iterator, List, Optional, Sequence, Tuple
+
+from pydantic import ValidationError
+
+from .database import AsyncSessionLocal, dialect_insert
+from .i18n import DEFAULT_LOCALE
+from .models import User
+from .password_hashing import password_hasher, pwd_context
+from .schemas import UserBase
+
+logger = logging.getLogger("notification_preferences_app.user_import")
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_FORMATS = ("csv", "ndjson")
+PASSWORD_MIN_LENGTH = 8
+# asyncpg caps a statement at 32767 bind parameters
+MAX_BIND_PARAMS = 32767
+_TRUE_VALUES = ("1", "true", "yes", "y", "t")
+
+
+class ImportSummary:
+    """
+    Running totals of an import.
+    """
+
+    def __init__(self):
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+
+    def as_dict(self) -> dict:
+        return {"inserted": self.inserted, "duplicates": self.duplicates, "invalid": self.invalid}
+
+
+def iter_records(stream: IO[str], fmt: str) -> Iterator[Tuple[int, dict]]:
+    """
+    Yields (line number, record) pairs; unparsable NDJSON lines yield an empty record.
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format: {fmt}")
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            record = {}
+        yield line_no, record if isinstance(record, dict) else {}
+
+
+def _parse_bool(value, default: bool = True) -> bool:
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in _TRUE_VALUES
+
+
+def _check_hash(hashed_password) -> None:
+    # An unusable hash would be stored as is and make every login for the account fail
+    handler = pwd_context.identify(hashed_password, resolve=True) if isinstance(hashed_password, str) else None
+    if handler is None:
+        raise ValueError("hashed_password is not a supported password hash")
+    try:
+        handler.from_string(hashed_password)
+    except ValueError as exc:
+        raise ValueError(f"malformed hashed_password ({exc})")
+
+
+def prepare_row(record: dict) -> Tuple[dict, Optional[str]]:
+    """
+    Validates a record and returns (users row, plaintext password to hash or None).
+    Raises ValueError with a reason for invalid records.
+    """
+    try:
+        user = UserBase(email=(record.get("email") or "").strip(), locale=record.get("locale") or DEFAULT_LOCALE)
+    except ValidationError as exc:
+        raise ValueError(f"invalid email or locale ({exc.errors()[0]['msg']})")
+    hashed_password = record.get("hashed_password") or None
+    password = record.get("password") or None
+    if hashed_password is not None:
+        _check_hash(hashed_password)
+    else:
+        if password is None:
+            raise ValueError("either password or hashed_password is required")
+        if len(password) < PASSWORD_MIN_LENGTH:
+            raise ValueError(f"password shorter than {PASSWORD_MIN_LENGTH} characters")
+    row = {
+        "email": user.email,
+        "hashed_password": hashed_password,
+        "locale": user.locale,
+        "is_active": _parse_bool(record.get("is_active")),
+        "token_generation": 0,
+    }
+    return row, None if hashed_password else password
+
+
+async def _hash_pending(rows: List[dict], passwords: List[Optional[str]]) -> None:
+    # Stay under the hasher's backpressure limit instead of submitting the whole batch
+    pending = [(row, password) for row, password in zip(rows, passwords) if password is not None]
+    step = max(1, password_hasher.max_pending)
+    for start in range(0, len(pending), step):
+        chunk = pending[start:start + step]
+        hashes = await asyncio.gather(*(password_hasher.hash(password) for _, password in chunk))
+        for (row, _), hashed in zip(chunk, hashes):
+            row["hashed_password"] = hashed
+
+
+async def _insert_batch(rows: List[dict]) -> int:
+    now = datetime.utcnow()
+    for row in rows:
+        row["created_at"] = row["updated_at"] = now
+    table = User.__table__
+    step = MAX_BIND_PARAMS // len(rows[0])
+    inserted = 0
+    async with AsyncSessionLocal() as session:
+        for start in range(0, len(rows), step):
+            stmt = (
+                dialect_insert(session, table)
+                .values(rows[start:start + step])
+                .on_conflict_do_nothing(index_elements=[table.c.email])
+                .returning(table.c.id)
+            )
+            inserted += len((await session.execute(stmt)).all())
+        await session.commit()
+    return inserted
+
+
+async def import_users(records: Iterator[Tuple[int, dict]], batch_size: int = IMPORT_BATCH_SIZE) -> ImportSummary:
+    summary = ImportSummary()
+    rows: List[dict] = []
+    passwords: List[Optional[str]] = []
+
+    async def flush() -> None:
+        await _hash_pending(rows, passwords)
+        inserted = await _insert_batch(rows)
+        summary.inserted += inserted
+        summary.duplicates += len(rows) - inserted
+        logger.info(f"Imported batch of {len(rows)} users ({inserted} new)")
+        rows.clear()
+        passwords.clear()
+
+    for line_no, record in records:
+        try:
+            row, password = prepare_row(record)
+        except ValueError as exc:
+            summary.invalid += 1
+            logger.warning(f"Skipping line {line_no}: {exc}")
+            continue
+        rows.append(row)
+        passwords.append(password)
+        if len(rows) >= batch_size:
+            await flush()
+    if rows:
+        await flush()
+    return summary
+
+
+async def _run_cli(path: str, fmt: str, batch_size: int) -> int:
+    try:
+        with open(path, newline="", encoding="utf-8") as stream:
+            summary = await import_users(iter_records(stream, fmt), batch_size)
+    finally:
+        password_hasher.shutdown()
+    print(json.dumps(summary.as_dict()), file=sys.stderr)
+    return 1 if summary.invalid else 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import user accounts from CSV or NDJSON.")
+    parser.add_argument("path", help="File to import")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, default=None, help="Defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be positive")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    return asyncio.run(_run_cli(args.path, fmt, args.batch_size))
+
+
+# Exported symbols
+__all__ = [
+    "IMPORT_FORMATS",
+    "ImportSummary",
+    "iter_records",
+    "prepare_row",
+    "import_users",
+    "main",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Compares the pure ASGI I18nMiddleware with the previous BaseHTTPMiddleware-based
+i18n middleware, both behind the production middleware stack (CORS, HTTPSRedirect,
+GZip), on a trivial endpoint so the middleware cost dominates.
+
+    python -m benchmarks.bench_i18n_middleware --requests 20000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+from typing import Dict
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
+
+from app.i18n import I18nMiddleware, get_locale_from_request, set_locale
+
+from .common import build_scope, run_load
+
+
+def build_app(i18n: str) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(HTTPSRedirectMiddleware)
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+    if i18n == "asgi":
+        app.add_middleware(I18nMiddleware)
+    elif i18n == "base_http":
+        @app.middleware("http")
+        async def i18n_middleware(request: Request, call_next):
+            locale = get_locale_from_request(request)
+            set_locale(locale)
+            response = await call_next(request)
+            response.headers["Content-Language"] = locale
+            return response
+
+    @app.get("/ping")
+    async def ping() -> dict:
+        return {"status": "ok"}
+
+    return app
+
+
+async def run(requests: int, concurrency: int) -> Dict[str, Dict[str, float]]:
+    scope = build_scope(
+        "/ping",
+        headers=[("accept-language", "fr-CA,fr;q=0.9,en;q=0.8"), ("origin", "https://example.com")],
+    )
+    results = {}
+    for variant in ("none", "base_http", "asgi"):
+        app = build_app(variant)
+        await run_load(app, scope, min(requests, 500), concurrency)  # warm-up
+        results[variant] = await run_load(app, scope, requests, concurrency)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests, args.concurrency)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
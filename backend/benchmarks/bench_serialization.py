@@ -0,0 +1,78 @@
+"""
+Per-request CPU cost of encoding the catalog: the Pydantic path (one NotificationTypeOut
+per row, response_model re-validation, jsonable_encoder, stdlib json) versus the
+FAST_JSON_RESPONSES path (row tuples straight to bytes).
+
+    python -m benchmarks.bench_serialization --sizes 10 1000 10000
+"""
+import argparse
+import json
+import timeit
+from typing import Dict, List, Sequence, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from app.schemas import NotificationTypeListResponse, NotificationTypeOut
+from app.serialization import catalog_items, orjson, serialize_catalog
+
+
+def make_rows(size: int) -> List[Tuple]:
+    rows = []
+    for i in range(size):
+        deprecated = i % 10 == 0
+        rows.append((
+            f"notification_type_{i:05d}",
+            {"en": f"Description of notification type {i}", "fr": f"Description du type de notification {i}"},
+            True,
+            deprecated,
+            {"en": "Replaced by a newer type", "fr": "Remplacé par un type plus récent"} if deprecated else None,
+            i + 1,
+        ))
+    return rows
+
+
+def pydantic_path(rows: Sequence[Tuple], locale: str) -> bytes:
+    response = NotificationTypeListResponse(
+        notification_types=[NotificationTypeOut(**item) for item in catalog_items(rows, locale)]
+    )
+    validated = NotificationTypeListResponse(**response.model_dump())
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(rows: Sequence[Tuple], locale: str) -> bytes:
+    return serialize_catalog(rows, locale)
+
+
+def measure(func, rows: Sequence[Tuple], locale: str) -> float:
+    timer = timeit.Timer(lambda: func(rows, locale))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def run(sizes: Sequence[int], locale: str = "fr") -> Dict[str, Dict[str, float]]:
+    results = {}
+    for size in sizes:
+        rows = make_rows(size)
+        if json.loads(pydantic_path(rows, locale)) != json.loads(fast_path(rows, locale)):
+            raise RuntimeError("Fast serializer output differs from the Pydantic path")
+        slow = measure(pydantic_path, rows, locale)
+        fast = measure(fast_path, rows, locale)
+        results[str(size)] = {
+            "pydantic_us": slow * 1e6,
+            "fast_us": fast * 1e6,
+            "saved_us_per_request": (slow - fast) * 1e6,
+            "speedup": slow / fast if fast else 0.0,
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    args = parser.parse_args()
+    output = {"orjson": orjson is not None, "results": run(args.sizes)}
+    print(json.dumps(output, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Shared helpers for the backend benchmarks: an in-process ASGI request driver and
+latency summaries. Run benchmarks from the backend directory, e.g.
+
+    python -m benchmarks.bench_i18n_middleware
+"""
+import asyncio
+import statistics
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp
+
+
+def build_scope(
+    path: str,
+    method: str = "GET",
+    headers: Optional[Iterable[Tuple[str, str]]] = None,
+    query_string: str = "",
+    scheme: str = "https",
+) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": scheme,
+        "path": path,
+        "raw_path": path.encode("latin-1"),
+        "query_string": query_string.encode("latin-1"),
+        "root_path": "",
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in (headers or ())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 443),
+    }
+
+
+async def call_asgi(app: ASGIApp, scope: dict, body: bytes = b"") -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    """
+    Sends one request through `app` without any network or HTTP client in between.
+    """
+    request_sent = False
+    status = 0
+    response_headers: List[Tuple[bytes, bytes]] = []
+    chunks: List[bytes] = []
+
+    async def receive() -> dict:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.sleep(3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        nonlocal status, response_headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers = list(message.get("headers", ()))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(dict(scope), receive, send)
+    return status, response_headers, b"".join(chunks)
+
+
+def summarize(latencies: Sequence[float], elapsed: float) -> Dict[str, float]:
+    """
+    Throughput and latency percentiles (milliseconds) for one benchmark run.
+    """
+    ordered = sorted(latencies)
+
+    def percentile(fraction: float) -> float:
+        if not ordered:
+            return 0.0
+        index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+        return ordered[index] * 1000
+
+    return {
+        "requests": len(ordered),
+        "requests_per_second": (len(ordered) / elapsed) if elapsed else 0.0,
+        "mean_ms": (statistics.fmean(ordered) * 1000) if ordered else 0.0,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+async def run_load(
+    app: ASGIApp,
+    scope: dict,
+    requests: int,
+    concurrency: int,
+    body: bytes = b"",
+    expected_status: Optional[int] = 200,
+    before_each: Optional[Callable[[], None]] = None,
+) -> Dict[str, float]:
+    """
+    Issues `requests` calls with at most `concurrency` in flight and summarizes them.
+    `before_each` runs untimed before every request (e.g. to drop a cache).
+    """
+    latencies: List[float] = []
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            if before_each is not None:
+                before_each()
+            start = time.perf_counter()
+            status, _, _ = await call_asgi(app, scope, body)
+            latencies.append(time.perf_counter() - start)
+            if expected_status is not None and status != expected_status:
+                raise RuntimeError(f"Unexpected status {status} for {scope['path']}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
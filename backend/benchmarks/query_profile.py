@@ -0,0 +1,548 @@
+"""
+Query profiler and index advisor.
+
+Fills a throwaway database (a temporary SQLite file, or any URL passed with
+--database-url, e.g. a scratch PostgreSQL) with synthetic users, notification types and
+preferences, runs the query shapes the application issues and reports:
+
+- per query: timing and plan (EXPLAIN ANALYZE on PostgreSQL, EXPLAIN QUERY PLAN on
+  SQLite), the indexes it used and the large tables it scanned in full;
+- indexes that duplicate, or are a non-unique prefix of, another index on the table;
+- indexes none of the profiled queries used;
+- write amplification: index entries maintained per inserted row, and the time to
+  insert the same users and preferences with and without the redundant indexes.
+
+    python -m benchmarks.query_profile --users 20000 --types 50 --preference-ratio 0.2
+    python -m benchmarks.query_profile --database-url postgresql+asyncpg://... --recreate-schema
+
+Seeding drops and recreates every table, so a --database-url also needs
+--recreate-schema. Everything the profiler writes after seeding is rolled back.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from .run import git_revision
+
+LOCALES = ("en", "fr", "de", "es", "ja")
+SEED_BATCH_SIZE = 5000
+# Full scans of tables at least this large are reported as missing-index candidates
+MIN_SCAN_ROWS = 1000
+# Placeholder bcrypt hash; the profiler never verifies passwords
+FAKE_PASSWORD_HASH = "$2b$12$" + "x" * 53
+
+
+class IndexInfo(NamedTuple):
+    """
+    One index structure of a table: an index, a unique constraint or the primary key.
+    """
+    table: str
+    name: str
+    columns: Tuple[str, ...]
+    unique: bool
+    kind: str  # "primary_key", "unique_constraint" or "index"
+
+
+# Which of two identical structures to keep: unique first, then constraints over indexes
+_KIND_RANK = {"primary_key": 0, "unique_constraint": 1, "index": 2}
+
+
+async def seed(users: int, types: int, preference_ratio: float, seed_value: int) -> Dict[str, int]:
+    """
+    Creates the schema and bulk-inserts the synthetic data; returns row counts.
+    """
+    from sqlalchemy import insert
+
+    from app.database import engine
+    from app.models import Base, NotificationType, NotificationTypeTranslation, User, UserNotificationPreference
+
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    type_rows, translation_rows = [], []
+    for type_id in range(1, types + 1):
+        locales = LOCALES[:rng.randint(1, len(LOCALES))]
+        deprecated = rng.random() < 0.05
+        type_rows.append({
+            "id": type_id,
+            "key": f"type_{type_id:05d}",
+            "descriptions": {locale: f"Notification {type_id} ({locale})" for locale in locales},
+            "is_active": rng.random() >= 0.05,
+            "is_deprecated": deprecated,
+            "deprecated_reason": json.dumps({"en": "Replaced"}) if deprecated else None,
+            "created_at": now,
+            "updated_at": now,
+        })
+        translation_rows.extend(
+            {
+                "notification_type_id": type_id,
+                "field": "description",
+                "locale": locale,
+                "text": f"Notification {type_id} ({locale})",
+                "updated_at": now,
+            }
+            for locale in locales
+        )
+    counts = {"notification_types": len(type_rows), "notification_type_translations": len(translation_rows)}
+    per_user = max(0, min(types, round(types * preference_ratio)))
+
+    async with engine.begin() as conn:
+        await conn.execute(insert(NotificationType), type_rows)
+        await conn.execute(insert(NotificationTypeTranslation), translation_rows)
+        user_batch: List[dict] = []
+        preference_batch: List[dict] = []
+        counts["users"] = counts["user_notification_preferences"] = 0
+        for user_id in range(1, users + 1):
+            user_batch.append({
+                "id": user_id,
+                "email": f"user{user_id}@example.com",
+                "hashed_password": FAKE_PASSWORD_HASH,
+                "is_active": rng.random() >= 0.02,
+                "locale": rng.choice(LOCALES),
+                "token_generation": 0,
+                "created_at": now,
+                "updated_at": now,
+            })
+            for type_id in rng.sample(range(1, types + 1), per_user):
+                preference_batch.append({
+                    "user_id": user_id,
+                    "notification_type_id": type_id,
+                    "enabled": rng.random() >= 0.3,
+                    "created_at": now,
+                    "updated_at": now,
+                })
+            if len(user_batch) >= SEED_BATCH_SIZE or len(preference_batch) >= SEED_BATCH_SIZE:
+                await conn.execute(insert(User), user_batch)
+                counts["users"] += len(user_batch)
+                user_batch.clear()
+                if preference_batch:
+                    await conn.execute(insert(UserNotificationPreference), preference_batch)
+                    counts["user_notification_preferences"] += len(preference_batch)
+                    preference_batch.clear()
+        if user_batch:
+            await conn.execute(insert(User), user_batch)
+            counts["users"] += len(user_batch)
+        if preference_batch:
+            await conn.execute(insert(UserNotificationPreference), preference_batch)
+            counts["user_notification_preferences"] += len(preference_batch)
+    return counts
+
+
+def query_shapes(dialect_name: str, params: dict) -> List[Tuple[str, object]]:
+    """
+    The statements the application issues (catalog, preferences, auth, dispatch,
+    export), built the same way as in the routes, with sample parameters.
+    """
+    from sqlalchemy import and_, exists, func, select
+    from sqlalchemy.dialects import postgresql, sqlite
+
+    from app.models import NotificationType, User, UserNotificationPreference
+    from app.translations import catalog_columns
+
+    preference = UserNotificationPreference
+    type_id, user_id, locale = params["type_id"], params["user_id"], params["locale"]
+
+    def preferences_query(use_table: bool):
+        return (
+            select(*catalog_columns(locale, use_table=use_table), preference.enabled)
+            .outerjoin(preference, and_(preference.notification_type_id == NotificationType.id, preference.user_id == user_id))
+            .where(NotificationType.is_active == True)
+            .order_by(NotificationType.key.asc())
+        )
+
+    def catalog_query(use_table: bool):
+        return (
+            select(*catalog_columns(locale, use_table=use_table), NotificationType.id)
+            .where(NotificationType.is_active == True)
+            .order_by(NotificationType.key.asc())
+        )
+
+    table = preference.__table__
+    upsert = (sqlite if dialect_name == "sqlite" else postgresql).insert(table).values([
+        {"user_id": user_id, "notification_type_id": type_key, "enabled": False,
+         "created_at": params["now"], "updated_at": params["now"]}
+        for type_key in params["upsert_type_ids"]
+    ])
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.notification_type_id],
+        set_={"enabled": upsert.excluded.enabled, "updated_at": upsert.excluded.updated_at},
+    ).returning(table.c.id, table.c.notification_type_id, table.c.enabled)
+
+    disabled = exists().where(
+        preference.notification_type_id == type_id,
+        preference.enabled == False,
+        preference.user_id == User.id,
+    )
+    return [
+        ("catalog", catalog_query(False)),
+        ("catalog_translations_table", catalog_query(True)),
+        ("catalog_version", select(func.count(), func.max(NotificationType.updated_at)).select_from(NotificationType)),
+        ("preferences", preferences_query(False)),
+        ("preferences_translations_table", preferences_query(True)),
+        ("login_by_email", select(User).where(User.email == params["email"]).limit(1)),
+        ("principal_by_id", select(User).where(User.id == user_id).limit(1)),
+        ("dispatch_resolve", select(User.id, User.is_active, preference.enabled)
+            .outerjoin(preference, and_(preference.user_id == User.id, preference.notification_type_id == type_id))
+            .where(User.id.in_(params["user_ids"]))),
+        ("dispatch_stream_default_enabled", select(User.id)
+            .where(User.is_active == True, User.id > 0, ~disabled)
+            .order_by(User.id)
+            .limit(1000)),
+        ("dispatch_stream_opt_in", select(preference.user_id)
+            .join(User, User.id == preference.user_id)
+            .where(preference.notification_type_id == type_id, preference.enabled == True,
+                   preference.user_id > 0, User.is_active == True)
+            .order_by(preference.user_id)
+            .limit(1000)),
+        ("export_page", select(preference.id, preference.user_id, preference.notification_type_id,
+                               NotificationType.key, preference.enabled, preference.updated_at)
+            .join(NotificationType, NotificationType.id == preference.notification_type_id)
+            .where(preference.id > params["export_after_id"])
+            .order_by(preference.id)
+            .limit(1000)),
+        ("preferences_upsert", upsert),
+    ]
+
+
+def _walk_pg_plan(node: dict, used: Set[str], scans: List[dict]) -> None:
+    if node.get("Index Name"):
+        used.add(node["Index Name"])
+    if node.get("Node Type") == "Seq Scan":
+        scans.append({"table": node.get("Relation Name"), "filter": node.get("Filter")})
+    for child in node.get("Plans", ()):
+        _walk_pg_plan(child, used, scans)
+
+
+_SQLITE_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\S+)")
+_SQLITE_SCAN = re.compile(r"^SCAN (\S+)")
+
+
+async def explain(conn, sql: str) -> dict:
+    """
+    Runs the dialect's EXPLAIN for `sql`; returns the plan, indexes used and full scans.
+    """
+    used: Set[str] = set()
+    scans: List[dict] = []
+    if conn.dialect.name == "postgresql":
+        raw = (await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")).scalar()
+        document = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+        _walk_pg_plan(document["Plan"], used, scans)
+        return {
+            "plan": document["Plan"],
+            "execution_ms": document.get("Execution Time"),
+            "indexes": sorted(used),
+            "full_scans": scans,
+        }
+    rows = (await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")).all()
+    plan = [row[-1] for row in rows]
+    for detail in plan:
+        index = _SQLITE_INDEX.search(detail)
+        if index:
+            used.add(index.group(1))
+        elif "INTEGER PRIMARY KEY" in detail:
+            used.add(f"pk:{detail.split()[1]}")
+        scan = _SQLITE_SCAN.match(detail)
+        if scan and "USING" not in detail:
+            scans.append({"table": scan.group(1), "filter": None})
+    return {"plan": plan, "execution_ms": None, "indexes": sorted(used), "full_scans": scans}
+
+
+async def time_statement(conn, stmt, repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        (await conn.execute(stmt)).all()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": statistics.median(samples), "max_ms": max(samples)}
+
+
+def _inventory(sync_conn) -> List[IndexInfo]:
+    from sqlalchemy import inspect
+
+    inspector = inspect(sync_conn)
+    indexes: List[IndexInfo] = []
+    for table in inspector.get_table_names():
+        pk = inspector.get_pk_constraint(table)
+        if pk.get("constrained_columns"):
+            indexes.append(IndexInfo(table, pk.get("name") or f"pk:{table}", tuple(pk["constrained_columns"]), True, "primary_key"))
+        for constraint in inspector.get_unique_constraints(table):
+            indexes.append(IndexInfo(table, constraint["name"], tuple(constraint["column_names"]), True, "unique_constraint"))
+        for index in inspector.get_indexes(table):
+            # PostgreSQL also lists the indexes backing unique constraints
+            if index.get("duplicates_constraint"):
+                continue
+            indexes.append(IndexInfo(table, index["name"], tuple(index["column_names"]), bool(index["unique"]), "index"))
+    return indexes
+
+
+async def sqlite_index_aliases(conn, indexes: List[IndexInfo]) -> Dict[str, str]:
+    """
+    Maps SQLite's sqlite_autoindex_* names (what plans mention) to the unique
+    constraints or composite primary keys they implement.
+    """
+    kinds = {"u": "unique_constraint", "pk": "primary_key"}
+    aliases = {}
+    for table in {index.table for index in indexes}:
+        for row in (await conn.exec_driver_sql(f"PRAGMA index_list('{table}')")).all():
+            name, origin = row[1], row[3]
+            if origin not in kinds or not name.startswith("sqlite_autoindex"):
+                continue
+            columns = tuple(info[2] for info in (await conn.exec_driver_sql(f"PRAGMA index_info('{name}')")).all())
+            for index in indexes:
+                if index.table == table and index.kind == kinds[origin] and index.columns == columns:
+                    aliases[name] = index.name
+    return aliases
+
+
+def find_redundant(indexes: Sequence[IndexInfo]) -> List[dict]:
+    """
+    An index is redundant when another index on the same table has the same columns
+    (the lower-ranked of the two is reported), or starts with its columns while the
+    index itself does not enforce uniqueness.
+    """
+    findings = []
+    for index in indexes:
+        for other in indexes:
+            if other is index or other.table != index.table:
+                continue
+            if index.columns == other.columns:
+                keep = min((index, other), key=lambda item: (not item.unique, _KIND_RANK[item.kind], item.name))
+                if keep is other:
+                    findings.append({"table": index.table, "index": index.name, "columns": list(index.columns),
+                                     "covered_by": other.name, "reason": "duplicate"})
+                    break
+            elif other.columns[:len(index.columns)] == index.columns and not index.unique:
+                findings.append({"table": index.table, "index": index.name, "columns": list(index.columns),
+                                 "covered_by": other.name, "reason": "prefix"})
+                break
+    return findings
+
+
+async def measure_write_amplification(conn, indexes: Sequence[IndexInfo], redundant: Sequence[dict],
+                                      counts: Dict[str, int], rows: int, types: int) -> dict:
+    """
+    Inserts `rows` users (each with a preference per sampled type) with every index in
+    place, then drops the redundant plain indexes and inserts as many again. Runs
+    inside the caller's transaction, which is rolled back.
+    """
+    from sqlalchemy import insert
+
+    from app.models import User, UserNotificationPreference
+
+    now = datetime.utcnow()
+    per_user = min(types, 5)
+
+    async def insert_batch(first_id: int) -> float:
+        users = [{
+            "id": user_id, "email": f"amplification{user_id}@example.com", "hashed_password": FAKE_PASSWORD_HASH,
+            "is_active": True, "locale": "en", "token_generation": 0, "created_at": now, "updated_at": now,
+        } for user_id in range(first_id, first_id + rows)]
+        preferences = [{
+            "user_id": user["id"], "notification_type_id": type_id, "enabled": True,
+            "created_at": now, "updated_at": now,
+        } for user in users for type_id in range(1, per_user + 1)]
+        started = time.perf_counter()
+        await conn.execute(insert(User), users)
+        if preferences:
+            await conn.execute(insert(UserNotificationPreference), preferences)
+        return (time.perf_counter() - started) * 1000
+
+    per_table = {}
+    for table in ("users", "user_notification_preferences"):
+        table_indexes = [index for index in indexes if index.table == table]
+        per_table[table] = {
+            "index_entries_per_row": len(table_indexes),
+            "redundant": [finding["index"] for finding in redundant if finding["table"] == table],
+        }
+    first_id = counts["users"] + 1
+    with_all_ms = await insert_batch(first_id)
+    droppable = [finding["index"] for finding in redundant
+                 if any(index.name == finding["index"] and index.kind == "index" for index in indexes)]
+    for name in droppable:
+        await conn.exec_driver_sql(f'DROP INDEX "{name}"')
+    without_redundant_ms = await insert_batch(first_id + rows)
+    return {
+        "rows": rows,
+        "preferences_per_row": per_user,
+        "tables": per_table,
+        "dropped": droppable,
+        "insert_ms_with_all_indexes": round(with_all_ms, 3),
+        "insert_ms_without_redundant": round(without_redundant_ms, 3),
+        "saving_pct": round(100 * (with_all_ms - without_redundant_ms) / with_all_ms, 1) if with_all_ms else None,
+    }
+
+
+async def index_sizes(conn) -> Dict[str, int]:
+    if conn.dialect.name != "postgresql":
+        return {}
+    result = await conn.exec_driver_sql(
+        "SELECT indexrelname, pg_relation_size(indexrelid) FROM pg_stat_user_indexes"
+    )
+    return {name: size for name, size in result.all()}
+
+
+async def profile(args) -> dict:
+    from sqlalchemy import func, select
+
+    from app.database import engine
+    from app.models import UserNotificationPreference
+
+    counts = await seed(args.users, args.types, args.preference_ratio, args.seed)
+    rng = random.Random(args.seed + 1)
+    try:
+        # Planner statistics, as a long-running database would have them
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql("ANALYZE")
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            try:
+                max_pref_id = (await conn.execute(select(func.max(UserNotificationPreference.id)))).scalar() or 0
+                params = {
+                    "type_id": rng.randint(1, args.types),
+                    "user_id": rng.randint(1, args.users),
+                    "email": f"user{rng.randint(1, args.users)}@example.com",
+                    "locale": "fr",
+                    "user_ids": rng.sample(range(1, args.users + 1), min(args.users, 500)),
+                    "upsert_type_ids": rng.sample(range(1, args.types + 1), min(args.types, 5)),
+                    "export_after_id": max_pref_id // 2,
+                    "now": datetime.utcnow(),
+                }
+                indexes = await conn.run_sync(_inventory)
+                aliases = await sqlite_index_aliases(conn, indexes) if conn.dialect.name == "sqlite" else {}
+                queries = {}
+                used: Set[str] = set()
+                for name, stmt in query_shapes(conn.dialect.name, params):
+                    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+                    result = await explain(conn, sql)
+                    result["indexes"] = sorted(aliases.get(index, index) for index in result["indexes"])
+                    result["full_scans"] = [scan for scan in result["full_scans"]
+                                            if counts.get(scan["table"], 0) >= MIN_SCAN_ROWS]
+                    result.update(await time_statement(conn, stmt, args.repeat))
+                    used.update(result["indexes"])
+                    queries[name] = result
+                redundant = find_redundant(indexes)
+                sizes = await index_sizes(conn)
+                for finding in redundant:
+                    finding["size_bytes"] = sizes.get(finding["index"])
+                unused = [
+                    {"table": index.table, "index": index.name, "columns": list(index.columns), "kind": index.kind}
+                    for index in indexes
+                    if index.name not in used and index.kind != "primary_key"
+                ]
+                missing = [
+                    {"query": name, **scan}
+                    for name, result in queries.items() for scan in result["full_scans"]
+                ]
+                amplification = await measure_write_amplification(
+                    conn, indexes, redundant, counts, args.write_rows, args.types
+                )
+            finally:
+                await transaction.rollback()
+    finally:
+        await engine.dispose()
+    return {
+        "rows": counts,
+        "queries": queries,
+        "indexes": [index._asdict() for index in indexes],
+        "redundant_indexes": redundant,
+        "unused_indexes": unused,
+        "full_scans": missing,
+        "write_amplification": amplification,
+    }
+
+
+def summarize(report: dict) -> str:
+    lines = [f"Rows: {report['rows']}", "", "Queries (median ms / indexes used / full scans):"]
+    for name, result in report["queries"].items():
+        scans = ", ".join(scan["table"] for scan in result["full_scans"]) or "-"
+        lines.append(f"  {name:34} {result['median_ms']:9.3f}  {', '.join(result['indexes']) or '-'}  [{scans}]")
+    lines.append("")
+    lines.append("Redundant indexes:")
+    for finding in report["redundant_indexes"] or [{"index": "none"}]:
+        detail = f" ({finding['reason']} of {finding['covered_by']})" if "covered_by" in finding else ""
+        lines.append(f"  {finding['index']}{detail}")
+    lines.append("Indexes unused by the profiled queries:")
+    for index in report["unused_indexes"] or [{"index": "none", "kind": ""}]:
+        lines.append(f"  {index['index']} {index['kind']}".rstrip())
+    lines.append("Full scans of large tables (missing index candidates):")
+    for scan in report["full_scans"] or [{"query": "none", "table": ""}]:
+        lines.append(f"  {scan['query']} {scan['table']}".rstrip())
+    amplification = report["write_amplification"]
+    lines.append(
+        f"Write amplification: {amplification['rows']} users + preferences inserted in "
+        f"{amplification['insert_ms_with_all_indexes']} ms with all indexes, "
+        f"{amplification['insert_ms_without_redundant']} ms without {amplification['dropped'] or 'none'}"
+    )
+    for table, info in amplification["tables"].items():
+        lines.append(f"  {table}: {info['index_entries_per_row']} index entries per row, redundant: {info['redundant'] or '-'}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Profile the application's queries and report index problems.")
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file; the schema is recreated")
+    parser.add_argument(
+        "--recreate-schema", action="store_true",
+        help="Confirm that every table of --database-url may be dropped and recreated",
+    )
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--types", type=int, default=50)
+    parser.add_argument("--preference-ratio", type=float, default=0.2, help="Fraction of types each user has a row for")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed executions per query")
+    parser.add_argument("--write-rows", type=int, default=2000, help="Users inserted per write amplification run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Write the JSON report here (stdout otherwise)")
+    args = parser.parse_args(argv)
+    if args.users < 1 or args.types < 1:
+        parser.error("--users and --types must be positive")
+    if args.database_url is not None and not args.recreate_schema:
+        parser.error("seeding drops every table of --database-url; pass --recreate-schema to confirm")
+
+    tmpdir = None
+    if args.database_url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        args.database_url = f"sqlite+aiosqlite:///{os.path.join(tmpdir.name, 'profile.db')}"
+    # Must be set before the app (and its engine) is imported
+    os.environ["DATABASE_URL"] = args.database_url
+
+    started = time.time()
+    report = {
+        "revision": git_revision(),
+        "timestamp": started,
+        "database": args.database_url.split(":", 1)[0],
+        "parameters": {
+            "users": args.users,
+            "types": args.types,
+            "preference_ratio": args.preference_ratio,
+            "repeat": args.repeat,
+            "write_rows": args.write_rows,
+            "seed": args.seed,
+        },
+        **asyncio.run(profile(args)),
+    }
+    print(summarize(report), file=sys.stderr)
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+    else:
+        print(output)
+    if tmpdir is not None:
+        tmpdir.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
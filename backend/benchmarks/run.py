@@ -0,0 +1,284 @@
+"""
+Benchmark suite for the backend hot paths. Everything runs in-process against a
+throwaway SQLite database (or any URL passed with --database-url) and the results are
+written as JSON so runs from different commits can be compared. Seeding drops and
+recreates every table, so a --database-url also needs --recreate-schema.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --baseline bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+from urllib.error import URLError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from .common import build_scope, call_asgi, run_load
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def seed(catalog_size: int, email: str, password: str) -> str:
+    """
+    Creates the schema, a catalog of `catalog_size` types and one user; returns a token.
+    """
+    from app.database import AsyncSessionLocal, engine
+    from app.models import Base, NotificationType
+    from app.main import app
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as session:
+        session.add_all(
+            NotificationType(
+                key=f"notification_type_{i:05d}",
+                descriptions={"en": f"Notification type {i}", "fr": f"Type de notification {i}"},
+                is_active=True,
+                is_deprecated=i % 10 == 0,
+            )
+            for i in range(catalog_size)
+        )
+        await session.commit()
+
+    register = json.dumps({"email": email, "password": password, "locale": "en"}).encode()
+    status, _, body = await call_asgi(
+        app,
+        build_scope("/auth/register", method="POST", headers=[("content-type", "application/json")]),
+        register,
+    )
+    if status != 200:
+        raise RuntimeError(f"Seeding user failed: {status} {body!r}")
+    status, _, body = await call_asgi(app, login_scope(), login_body(email, password))
+    if status != 200:
+        raise RuntimeError(f"Seeding login failed: {status} {body!r}")
+    return json.loads(body)["access_token"]
+
+
+def login_scope() -> dict:
+    return build_scope("/auth/login", method="POST", headers=[("content-type", "application/x-www-form-urlencoded")])
+
+
+def login_body(email: str, password: str) -> bytes:
+    return urlencode({"username": email, "password": password}).encode()
+
+
+async def run_suite(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    from app.auth_cache import principal_cache
+    from app.catalog_cache import catalog_cache
+    from app.main import app
+    from . import bench_i18n_middleware
+
+    email, password = "bench@example.com", "benchmark-password"
+    token = await seed(args.catalog_size, email, password)
+    auth = ("authorization", f"Bearer {token}")
+    catalog_scope = build_scope("/notifications/", headers=[auth, ("accept-language", "fr-CA,fr;q=0.9")])
+    requests, concurrency = args.requests, args.concurrency
+
+    results: Dict[str, Dict[str, float]] = {}
+    results["catalog_cold"] = await run_load(
+        app, catalog_scope, max(1, requests // 10), 1, before_each=catalog_cache.invalidate
+    )
+    await call_asgi(app, catalog_scope)
+    results["catalog_cached"] = await run_load(app, catalog_scope, requests, concurrency)
+
+    _, headers, _ = await call_asgi(app, catalog_scope)
+    etag = dict(headers)[b"etag"].decode()
+    not_modified_scope = build_scope(
+        "/notifications/", headers=[auth, ("accept-language", "fr-CA,fr;q=0.9"), ("if-none-match", etag)]
+    )
+    results["catalog_not_modified"] = await run_load(
+        app, not_modified_scope, requests, concurrency, expected_status=304
+    )
+
+    me_scope = build_scope("/auth/me", headers=[auth])
+    results["auth_me_uncached"] = await run_load(
+        app, me_scope, max(1, requests // 10), 1, before_each=principal_cache.clear
+    )
+    results["auth_me_cached"] = await run_load(app, me_scope, requests, concurrency)
+
+    results["auth_login"] = await run_load(
+        app, login_scope(), args.login_requests, args.login_concurrency, body=login_body(email, password)
+    )
+
+    middleware = await bench_i18n_middleware.run(requests, concurrency)
+    for variant, summary in middleware.items():
+        results[f"i18n_middleware_{variant}"] = summary
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_kib(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _child_pids(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as fh:
+            return [int(child) for child in fh.read().split()]
+    except OSError:
+        return []
+
+
+def measure_server(workers: int, timeout: float = 60.0) -> Dict[str, object]:
+    """
+    Starts the production launcher against the seeded database and records time until
+    /health answers, per-worker RSS (Linux /proc) and the time a SIGTERM takes to stop it.
+    """
+    port = _free_port()
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--drain-seconds", "0"],
+        cwd=backend_dir,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    ready_seconds = None
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited during startup with status {process.returncode}")
+            try:
+                with urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        ready_seconds = time.perf_counter() - started
+                        break
+            except (URLError, OSError):
+                time.sleep(0.05)
+        children = _child_pids(process.pid)
+        # Let every worker finish booting before sampling memory
+        deadline = time.perf_counter() + 5
+        while len(children) < workers and time.perf_counter() < deadline:
+            time.sleep(0.1)
+            children = _child_pids(process.pid)
+        rss = {str(pid): _rss_kib(pid) for pid in children}
+        parent_rss = _rss_kib(process.pid)
+    finally:
+        stop_started = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        stop_seconds = time.perf_counter() - stop_started
+    return {
+        "workers": workers,
+        "ready_seconds": ready_seconds,
+        "stop_seconds": stop_seconds,
+        "supervisor_rss_kib": parent_rss,
+        "worker_rss_kib": rss,
+    }
+
+
+def compare(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """
+    Relative change per scenario (positive = higher than baseline).
+    """
+    deltas = {}
+    for name, summary in current.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        deltas[name] = {
+            metric: (summary[metric] - previous[metric]) / previous[metric] * 100
+            for metric in ("requests_per_second", "p50_ms", "p95_ms", "p99_ms")
+            if previous.get(metric)
+        }
+    return deltas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the backend benchmark suite.")
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file")
+    parser.add_argument(
+        "--recreate-schema", action="store_true",
+        help="Confirm that every table of --database-url may be dropped and recreated",
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--login-requests", type=int, default=40)
+    parser.add_argument("--login-concurrency", type=int, default=8)
+    parser.add_argument("--catalog-size", type=int, default=50)
+    parser.add_argument("--output", default=None, help="Write results JSON here (stdout otherwise)")
+    parser.add_argument("--baseline", default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--server-workers", type=int, default=2, help="Workers for the startup/RSS measurement; 0 skips it")
+    args = parser.parse_args()
+    if args.database_url is not None and not args.recreate_schema:
+        parser.error("seeding drops every table of --database-url; pass --recreate-schema to confirm")
+
+    tmpdir = None
+    if args.database_url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        args.database_url = f"sqlite+aiosqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+    # Must be set before the app (and its engine) is imported
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("FORCE_HTTPS", "false")
+    # The login scenario measures bcrypt throughput, not the auth rate limiter
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    started = time.time()
+    results = asyncio.run(run_suite(args))
+    report = {
+        "revision": git_revision(),
+        "timestamp": started,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "database": args.database_url.split(":", 1)[0],
+        "parameters": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "login_requests": args.login_requests,
+            "login_concurrency": args.login_concurrency,
+            "catalog_size": args.catalog_size,
+        },
+        "results": results,
+    }
+    if args.server_workers > 0:
+        report["server"] = measure_server(args.server_workers)
+    if args.baseline:
+        with open(args.baseline) as fh:
+            report["change_pct"] = compare(results, json.load(fh)["results"])
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+    else:
+        print(output)
+    if tmpdir is not None:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
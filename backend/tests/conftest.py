@@ -0,0 +1,86 @@
+"""
+Test fixtures: the application runs against a throwaway SQLite database, with HTTPS
+redirects and rate limiting off. The environment is set before `app` is imported,
+since its modules read their settings at import time.
+"""
+import os
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix="notification-prefs-tests-")
+TEST_DATABASE_URL = "sqlite:///" + os.path.join(TEST_DIR, "test.db")
+SERVICE_KEY = "test-service-key"
+
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ["FORCE_HTTPS"] = "false"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["CHANGE_FEED_BACKEND"] = "memory"
+os.environ["DISPATCH_API_KEY"] = SERVICE_KEY
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.auth_cache import generation_cache, principal_cache
+from app.catalog_cache import catalog_cache
+from app.main import app
+from app.models import Base
+from app.tokens import token_revocations
+
+sync_engine = create_engine(TEST_DATABASE_URL)
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """
+    Fresh schema and empty in-process caches for every test.
+    """
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+    catalog_cache.invalidate()
+    catalog_cache._history.clear()
+    principal_cache.clear()
+    generation_cache.clear()
+    token_revocations.clear()
+    yield sync_engine
+
+
+@pytest.fixture
+def db(database):
+    """
+    Synchronous session for seeding and inspecting the test database.
+    """
+    with Session(database) as session:
+        yield session
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def auth_headers(client):
+    """
+    Registers a user and returns the Authorization header of a fresh login.
+    """
+    credentials = {"email": "user@example.com", "password": "password123"}
+    response = client.post("/auth/register", json={**credentials, "locale": "en"})
+    assert response.status_code == 200, response.text
+    response = client.post(
+        "/auth/login", data={"username": credentials["email"], "password": credentials["password"]}
+    )
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def service_headers():
+    return {"X-Service-Key": SERVICE_KEY}
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
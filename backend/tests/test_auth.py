@@ -0,0 +1,63 @@
+def _register(client, email="user@example.com", password="password123"):
+    return client.post("/auth/register", json={"email": email, "password": password, "locale": "en"})
+
+
+def test_register_returns_the_new_user(client):
+    response = _register(client)
+
+    assert response.status_code == 200
+    assert response.json()["email"] == "user@example.com"
+    assert "hashed_password" not in response.json()
+
+
+def test_register_existing_email_is_409(client):
+    assert _register(client).status_code == 200
+
+    response = _register(client, password="another-password")
+
+    assert response.status_code == 409
+    login = client.post("/auth/login", data={"username": "user@example.com", "password": "password123"})
+    assert login.status_code == 200
+
+
+
+def test_logout_revokes_every_session(client, auth_headers):
+    other = client.post("/auth/login", data={"username": "user@example.com", "password": "password123"})
+    other_headers = {"Authorization": f"Bearer {other.json()['access_token']}"}
+
+    assert client.post("/auth/logout", headers=auth_headers).status_code == 204
+
+    assert client.get("/auth/me", headers=auth_headers).status_code == 401
+    assert client.get("/auth/me", headers=other_headers).status_code == 401
+
+
+def test_logout_reaches_stateless_reads_on_other_workers(client, auth_headers, monkeypatch):
+    from app.auth_cache import generation_cache
+    from app.routes import auth
+    from app.tokens import token_revocations
+
+    monkeypatch.setattr(auth, "AUTH_STATELESS_READS", True)
+    other = client.post("/auth/login", data={"username": "user@example.com", "password": "password123"})
+    other_headers = {"Authorization": f"Bearer {other.json()['access_token']}"}
+    assert client.get("/auth/me", headers=other_headers).status_code == 200
+    user_id = client.get("/auth/me", headers=other_headers).json()["id"]
+
+    assert client.post("/auth/logout", headers=auth_headers).status_code == 204
+    assert client.get("/auth/me", headers=other_headers).status_code == 401
+
+    # A worker that did not handle the logout: no local revocation, generation cached before it
+    token_revocations.clear()
+    generation_cache.put(user_id, 0)
+    assert client.get("/auth/me", headers=other_headers).status_code == 200
+    generation_cache.clear()
+    assert client.get("/auth/me", headers=other_headers).status_code == 401
+
+
+def test_metrics_report_auth_latency_saved_by_the_principal_cache(client, auth_headers):
+    for _ in range(3):
+        assert client.get("/auth/me", headers=auth_headers).status_code == 200
+
+    metrics = client.get("/metrics").text
+    saved = [line for line in metrics.splitlines() if line.startswith("auth_cache_seconds_saved_total ")]
+    assert len(saved) == 1
+    assert float(saved[0].split()[1]) > 0
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from sqlalchemy import update
+
+from app.catalog_cache import CatalogCache, catalog_cache
+from app.change_feed import start_change_feed, stop_change_feed
+from app.database import AsyncSessionLocal, dispose_engine
+from app.models import NotificationType
+
+
+@pytest.fixture
+def catalog(db):
+    db.add_all([
+        NotificationType(key="billing", descriptions={"en": "Billing", "fr": "Facturation"}),
+        NotificationType(key="news", descriptions={"en": "News"}),
+    ])
+    db.commit()
+
+
+@pytest.fixture
+async def async_db():
+    try:
+        async with AsyncSessionLocal() as session:
+            yield session
+    finally:
+        await dispose_engine()
+
+
+def test_matching_etag_answers_304(client, auth_headers, catalog):
+    response = client.get("/notifications/", headers=auth_headers)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}'):
+        response = client.get("/notifications/", headers={**auth_headers, "If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        assert response.content == b""
+
+    response = client.get("/notifications/", headers={**auth_headers, "Accept-Language": "fr"})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+
+def test_each_catalog_request_counts_one_lookup(client, auth_headers, catalog):
+    for _ in range(3):
+        before = catalog_cache.hits + catalog_cache.misses
+        response = client.get("/notifications/", headers=auth_headers)
+        assert response.status_code == 200
+        assert catalog_cache.hits + catalog_cache.misses == before + 1
+
+@pytest.mark.anyio
+async def test_revalidation_reloads_only_when_the_version_changes(catalog, async_db):
+    cache = CatalogCache(ttl_seconds=0)
+
+    first = await cache.get(async_db, "en")
+    second = await cache.get(async_db, "en")
+    assert second is first
+    assert (cache.misses, cache.refreshes) == (1, 1)
+
+    await async_db.execute(
+        update(NotificationType).where(NotificationType.key == "news").values(descriptions={"en": "Newsletter"})
+    )
+    await async_db.commit()
+    third = await cache.get(async_db, "en")
+
+    assert third.version != first.version
+    assert third.etag != first.etag
+    assert b"Newsletter" in third.body
+    assert (cache.misses, cache.refreshes) == (2, 2)
+
+
+@pytest.mark.anyio
+async def test_committed_change_invalidates_the_shared_cache(catalog, async_db):
+    await start_change_feed()
+    try:
+        entry = await catalog_cache.get(async_db, "en")
+        assert catalog_cache.version == entry.version
+
+        news = await async_db.get(NotificationType, 2)
+        news.descriptions = {"en": "Newsletter"}
+        await async_db.commit()
+        for _ in range(100):
+            if catalog_cache.version is None:
+                break
+            await asyncio.sleep(0.01)
+
+        assert catalog_cache.version is None
+        assert b"Newsletter" in (await catalog_cache.get(async_db, "en")).body
+    finally:
+        await stop_change_feed()
@@ -0,0 +1,84 @@
+import pytest
+from sqlalchemy import select
+
+from app.catalog_cache import catalog_cache
+from app.models import NotificationType
+from app.serialization import COMPACT_JSON_MEDIA_TYPE
+
+
+@pytest.fixture
+def catalog(db):
+    db.add_all([
+        NotificationType(key="billing", descriptions={"en": "Billing"}),
+        NotificationType(key="news", descriptions={"en": "News"}),
+        NotificationType(key="security", descriptions={"en": "Security"}),
+    ])
+    db.commit()
+
+
+def _get(client, headers, **params):
+    return client.get("/notifications/", params=params, headers=headers)
+
+
+def test_fields_restrict_the_attributes_sent(client, auth_headers, catalog):
+    response = _get(client, auth_headers, fields="description")
+
+    assert response.status_code == 200
+    assert response.json()["notification_types"][0] == {"key": "billing", "description": "Billing"}
+
+
+def test_unknown_field_is_422(client, auth_headers, catalog):
+    response = _get(client, auth_headers, fields="description,colour")
+
+    assert response.status_code == 422
+    assert "colour" in response.json()["message"]
+
+
+def test_unsupported_accept_is_406(client, auth_headers, catalog):
+    response = client.get("/notifications/", headers={**auth_headers, "Accept": "text/html"})
+
+    assert response.status_code == 406
+
+
+def test_compact_encoding_sends_rows(client, auth_headers, catalog):
+    response = client.get(
+        "/notifications/", params={"fields": "key"}, headers={**auth_headers, "Accept": COMPACT_JSON_MEDIA_TYPE},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(COMPACT_JSON_MEDIA_TYPE)
+    assert response.json()["fields"] == ["key"]
+    assert response.json()["rows"] == [["billing"], ["news"], ["security"]]
+
+
+def test_since_returns_changed_and_removed_types(client, auth_headers, catalog, db):
+    version = _get(client, auth_headers).headers["x-catalog-version"]
+    news = db.scalars(select(NotificationType).where(NotificationType.key == "news")).one()
+    news.descriptions = {"en": "Newsletter"}
+    db.delete(db.scalars(select(NotificationType).where(NotificationType.key == "billing")).one())
+    db.commit()
+    catalog_cache.invalidate()
+
+    body = _get(client, auth_headers, since=version).json()
+
+    assert body["since"] == version
+    assert body["full"] is False
+    assert body["removed"] == ["billing"]
+    assert [item["key"] for item in body["notification_types"]] == ["news"]
+    assert body["version"] != version
+
+    unchanged = _get(client, auth_headers, since=body["version"]).json()
+    assert (unchanged["full"], unchanged["removed"], unchanged["notification_types"]) == (False, [], [])
+
+
+def test_unknown_since_values_share_one_full_response(client, auth_headers, catalog):
+    first = _get(client, auth_headers, since="no-such-version")
+    variants = len(catalog_cache._snapshot.variants)
+    second = _get(client, auth_headers, since="another-made-up-version")
+
+    assert first.json()["full"] is True
+    assert first.json()["since"] is None
+    assert len(first.json()["notification_types"]) == 3
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+    assert len(catalog_cache._snapshot.variants) == variants
@@ -0,0 +1,54 @@
+import pytest
+
+from app.models import NotificationType, User, UserNotificationPreference
+
+
+@pytest.fixture
+def users(db):
+    """
+    Users 1-4: no preference (1), disabled (2), enabled (3), enabled but deactivated (4).
+    """
+    news = NotificationType(key="news", descriptions={"en": "News"})
+    accounts = [
+        User(email="default@example.com", hashed_password="x"),
+        User(email="disabled@example.com", hashed_password="x"),
+        User(email="enabled@example.com", hashed_password="x"),
+        User(email="deactivated@example.com", hashed_password="x", is_active=False),
+    ]
+    db.add_all([news, *accounts])
+    db.flush()
+    assert [user.id for user in accounts] == [1, 2, 3, 4]
+    db.add_all([
+        UserNotificationPreference(user_id=2, notification_type_id=news.id, enabled=False),
+        UserNotificationPreference(user_id=3, notification_type_id=news.id, enabled=True),
+        UserNotificationPreference(user_id=4, notification_type_id=news.id, enabled=True),
+    ])
+    db.commit()
+
+
+def _resolve(client, headers, **body):
+    return client.post("/internal/dispatch/resolve", json={"notification_type_key": "news", **body}, headers=headers)
+
+
+def test_resolve_requires_service_key(client, users):
+    assert _resolve(client, {}, user_ids=[1]).status_code == 401
+
+
+@pytest.mark.parametrize("default_enabled, enabled", [(True, [1, 3]), (False, [3])])
+def test_resolve_reports_inactive_and_unknown_users_separately(client, service_headers, users, default_enabled, enabled):
+    response = _resolve(client, service_headers, user_ids=[4, 1, 99, 2, 3, 1], default_enabled=default_enabled)
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "notification_type_key": "news",
+        "enabled_user_ids": enabled,
+        "inactive_user_ids": [4],
+        "unknown_user_ids": [99],
+    }
+
+
+def test_resolve_unknown_type_is_404(client, service_headers, users):
+    response = client.post(
+        "/internal/dispatch/resolve", json={"notification_type_key": "nope", "user_ids": [1]}, headers=service_headers,
+    )
+    assert response.status_code == 404
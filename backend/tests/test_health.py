@@ -0,0 +1,33 @@
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.health import HealthExemptHTTPSRedirectMiddleware
+
+
+def _redirecting_app() -> Starlette:
+    async def ok(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route(path, ok) for path in ("/health", "/health/ready", "/healthz", "/auth/me")])
+    app.add_middleware(HealthExemptHTTPSRedirectMiddleware)
+    return app
+
+
+def test_health_paths_are_not_redirected_to_https():
+    client = TestClient(_redirecting_app(), base_url="http://localhost:8000")
+
+    for path in ("/health", "/health/ready"):
+        assert client.get(path, follow_redirects=False).status_code == 200
+    for path in ("/healthz", "/auth/me"):
+        response = client.get(path, follow_redirects=False)
+        assert response.status_code == 307
+        assert response.headers["location"].startswith("https://")
+
+
+def test_readiness_reports_ready(client):
+    response = client.get("/health/ready")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
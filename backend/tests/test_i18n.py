@@ -0,0 +1,26 @@
+from app.i18n import LocaleNegotiator, parse_accept_language
+from app.models import NotificationType
+
+
+def test_parse_accept_language_orders_by_quality():
+    assert parse_accept_language("fr;q=0.5, en-US, de;q=0") == ["en-us", "fr"]
+
+
+def test_negotiator_returns_locale_as_spelled_in_catalog():
+    negotiator = LocaleNegotiator(["en", "pt-BR", "fr"])
+    assert negotiator.negotiate("pt-BR") == "pt-BR"
+    assert negotiator.negotiate("pt-br") == "pt-BR"
+    assert negotiator.negotiate("pt") == "pt-BR"
+    assert negotiator.negotiate("fr-CA,en;q=0.5") == "fr"
+    assert negotiator.negotiate("de") == "en"
+
+
+def test_catalog_served_in_region_tagged_locale(client, auth_headers, db):
+    db.add(NotificationType(key="a", descriptions={"en": "A", "pt-BR": "A-br"}))
+    db.commit()
+
+    response = client.get("/notifications/", headers={**auth_headers, "Accept-Language": "pt-BR"})
+
+    assert response.status_code == 200
+    assert response.headers["content-language"] == "pt-BR"
+    assert [item["description"] for item in response.json()["notification_types"]] == ["A-br"]
@@ -0,0 +1,76 @@
+import pytest
+
+from app.models import NotificationType
+
+
+@pytest.fixture
+def catalog(db):
+    db.add_all([
+        NotificationType(key="billing", descriptions={"en": "Billing"}),
+        NotificationType(key="news", descriptions={"en": "News"}),
+        NotificationType(key="security", descriptions={"en": "Security"}),
+    ])
+    db.commit()
+
+
+def _toggles(*pairs):
+    return {"preferences": [{"notification_type_key": key, "enabled": enabled} for key, enabled in pairs]}
+
+
+def _enabled(client, headers):
+    response = client.get("/notifications/preferences", headers=headers)
+    assert response.status_code == 200
+    return {item["key"]: item["enabled"] for item in response.json()["preferences"]}
+
+
+def test_unset_preferences_default_to_enabled(client, auth_headers, catalog):
+    assert _enabled(client, auth_headers) == {"billing": True, "news": True, "security": True}
+
+
+def test_patch_keeps_unlisted_types(client, auth_headers, catalog):
+    assert client.patch("/notifications/preferences", json=_toggles(("news", False)), headers=auth_headers).status_code == 200
+    response = client.patch("/notifications/preferences", json=_toggles(("billing", False)), headers=auth_headers)
+
+    assert response.status_code == 200
+    assert [item["notification_type_key"] for item in response.json()["preferences"]] == ["billing"]
+    assert _enabled(client, auth_headers) == {"billing": False, "news": False, "security": True}
+
+
+def test_put_replaces_the_whole_set(client, auth_headers, catalog):
+    client.patch("/notifications/preferences", json=_toggles(("news", False), ("billing", False)), headers=auth_headers)
+
+    response = client.put("/notifications/preferences", json=_toggles(("security", False)), headers=auth_headers)
+
+    assert response.status_code == 200
+    assert _enabled(client, auth_headers) == {"billing": True, "news": True, "security": False}
+
+
+def test_put_with_no_preferences_resets_everything(client, auth_headers, catalog):
+    client.patch("/notifications/preferences", json=_toggles(("news", False)), headers=auth_headers)
+
+    response = client.put("/notifications/preferences", json=_toggles(), headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()["preferences"] == []
+    assert _enabled(client, auth_headers) == {"billing": True, "news": True, "security": True}
+
+
+def test_upsert_updates_existing_rows(client, auth_headers, catalog):
+    first = client.put("/notifications/preferences", json=_toggles(("news", False)), headers=auth_headers).json()
+    second = client.put("/notifications/preferences", json=_toggles(("news", True)), headers=auth_headers).json()
+
+    assert first["preferences"][0]["id"] == second["preferences"][0]["id"]
+    assert second["preferences"][0]["enabled"] is True
+
+
+@pytest.mark.parametrize("method", ["put", "patch"])
+def test_unknown_type_is_rejected_without_changes(client, auth_headers, catalog, method):
+    client.patch("/notifications/preferences", json=_toggles(("news", False)), headers=auth_headers)
+
+    response = getattr(client, method)(
+        "/notifications/preferences", json=_toggles(("billing", False), ("nope", True)), headers=auth_headers,
+    )
+
+    assert response.status_code == 422
+    assert "nope" in response.json()["message"]
+    assert _enabled(client, auth_headers) == {"billing": True, "news": False, "security": True}
@@ -0,0 +1,132 @@
+import math
+
+import pytest
+
+from app import rate_limit
+from app.rate_limit import (
+    _TOKEN_BUCKET_SCRIPT,
+    RateLimitExceeded,
+    RateLimiter,
+    RateLimitRule,
+    RedisRateLimitBackend,
+    auth_rate_limiter,
+)
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeRedis:
+    """
+    Stand-in for redis.asyncio.Redis that evaluates the token-bucket script the way
+    Redis runs it (HMGET, refill, HSET and PEXPIRE on KEYS[1]). Arguments arrive as
+    Redis would pass them to Lua, i.e. as strings, and the reply is bytes.
+    """
+
+    def __init__(self, clock: FakeClock):
+        self.clock = clock
+        self.hashes = {}
+        self.expires_at_ms = {}
+
+    async def eval(self, script, numkeys, *keys_and_args):
+        assert script == _TOKEN_BUCKET_SCRIPT
+        (key,), args = keys_and_args[:numkeys], [str(arg) for arg in keys_and_args[numkeys:]]
+        if self.expires_at_ms.get(key, math.inf) <= self.clock() * 1000:
+            del self.hashes[key], self.expires_at_ms[key]
+        capacity, rate, now, cost = (float(arg) for arg in args)
+        bucket = self.hashes.get(key, {})
+        tokens = float(bucket.get("tokens", capacity))
+        ts = float(bucket.get("ts", now))
+        tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+        retry_after = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            retry_after = (cost - tokens) / rate
+        self.hashes[key] = {"tokens": str(tokens), "ts": str(now)}
+        self.expires_at_ms[key] = now * 1000 + math.ceil(capacity / rate * 1000)
+        return str(retry_after).encode()
+
+
+class UnavailableRedis:
+    async def eval(self, *args):
+        raise ConnectionError("redis is down")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "time", clock)
+    return clock
+
+
+@pytest.mark.anyio
+async def test_redis_bucket_empties_and_refills(clock):
+    redis = FakeRedis(clock)
+    backend = RedisRateLimitBackend(redis)
+    rule = RateLimitRule("login_ip", capacity=2, period_seconds=10)
+
+    assert await backend.take("login_ip:10.0.0.1", rule) == 0
+    assert await backend.take("login_ip:10.0.0.1", rule) == 0
+    assert await backend.take("login_ip:10.0.0.1", rule) == pytest.approx(5.0)
+    assert await backend.take("login_ip:10.0.0.2", rule) == 0
+
+    clock.now += 5
+    assert await backend.take("login_ip:10.0.0.1", rule) == 0
+    assert await backend.take("login_ip:10.0.0.1", rule) == pytest.approx(5.0)
+    assert redis.expires_at_ms["ratelimit:login_ip:10.0.0.1"] == clock.now * 1000 + 10_000
+
+
+@pytest.mark.anyio
+async def test_limiter_raises_with_retry_after(clock):
+    limiter = RateLimiter(
+        RedisRateLimitBackend(FakeRedis(clock)), {"register_ip": RateLimitRule("register_ip", 1, 60)}, enabled=True,
+    )
+
+    await limiter.hit("register_ip", "10.0.0.1")
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        await limiter.hit("register_ip", "10.0.0.1")
+
+    assert excinfo.value.rule == "register_ip"
+    assert excinfo.value.retry_after == pytest.approx(60.0)
+
+
+@pytest.mark.anyio
+async def test_limiter_fails_open_when_redis_raises():
+    limiter = RateLimiter(
+        RedisRateLimitBackend(UnavailableRedis()), {"login_ip": RateLimitRule("login_ip", 1, 60)}, enabled=True,
+    )
+
+    for _ in range(3):
+        await limiter.hit("login_ip", "10.0.0.1")
+
+
+def _login(client):
+    return client.post("/auth/login", data={"username": "nobody@example.com", "password": "wrong-password"})
+
+
+def test_login_answers_429_with_retry_after(client, clock, monkeypatch):
+    monkeypatch.setattr(auth_rate_limiter, "backend", RedisRateLimitBackend(FakeRedis(clock)))
+    monkeypatch.setattr(auth_rate_limiter, "enabled", True)
+    capacity = auth_rate_limiter.rules["login_account"].capacity
+
+    for _ in range(capacity):
+        assert _login(client).status_code == 401
+    response = _login(client)
+
+    assert response.status_code == 429
+    rule = auth_rate_limiter.rules["login_account"]
+    assert response.headers["retry-after"] == str(math.ceil(1 / rule.refill_per_second))
+
+
+def test_login_fails_open_when_redis_raises(client, monkeypatch):
+    monkeypatch.setattr(auth_rate_limiter, "backend", RedisRateLimitBackend(UnavailableRedis()))
+    monkeypatch.setattr(auth_rate_limiter, "enabled", True)
+
+    for _ in range(auth_rate_limiter.rules["login_account"].capacity + 1):
+        assert _login(client).status_code == 401
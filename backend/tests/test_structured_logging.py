@@ -0,0 +1,98 @@
+import logging
+
+import pytest
+
+from app import structured_logging
+from app.structured_logging import LogSampler, errors_total, log_error, log_suppressed_total
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(structured_logging.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def captured():
+    logger = logging.getLogger("notification_preferences_app.tests")
+    handler = ListHandler()
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    try:
+        yield logger, handler.records
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = True
+
+
+def test_sampler_allows_a_burst_per_window_and_reports_suppressed(clock):
+    sampler = LogSampler(burst=3, window=10)
+
+    assert [sampler.allow("http_401") for _ in range(5)] == [(True, 0)] * 3 + [(False, 0)] * 2
+    assert sampler.allow("http_404") == (True, 0)
+
+    clock.now += 10
+    assert sampler.allow("http_401") == (True, 2)
+    assert sampler.allow("http_401") == (True, 0)
+
+
+def test_log_error_counts_every_error_but_logs_a_sample(clock, captured, monkeypatch):
+    logger, records = captured
+    monkeypatch.setattr(structured_logging, "error_log_sampler", LogSampler(burst=2, window=60))
+    errors_before = errors_total.value(error_class="test_error")
+    suppressed_before = log_suppressed_total.value(error_class="test_error")
+    built = []
+
+    def fields():
+        built.append(1)
+        return {"path": "/x"}
+
+    for _ in range(5):
+        log_error(logger, logging.WARNING, "test_error", "failed", fields)
+
+    assert errors_total.value(error_class="test_error") - errors_before == 5
+    assert log_suppressed_total.value(error_class="test_error") - suppressed_before == 3
+    assert len(records) == len(built) == 2
+    assert records[0].fields == {"error_class": "test_error", "path": "/x"}
+
+    clock.now += 60
+    log_error(logger, logging.WARNING, "test_error", "failed again", fields)
+    assert records[-1].fields["suppressed"] == 3
+
+
+def test_log_error_below_logger_level_only_counts(captured):
+    logger, records = captured
+    before = errors_total.value(error_class="debug_only")
+
+    log_error(logger, logging.DEBUG, "debug_only", "ignored")
+
+    assert errors_total.value(error_class="debug_only") - before == 1
+    assert records == []
+
+
+def test_http_errors_are_counted_by_class(client):
+    before = errors_total.value(error_class="http_404")
+
+    for _ in range(3):
+        assert client.get("/no-such-route").status_code == 404
+
+    assert errors_total.value(error_class="http_404") - before == 3
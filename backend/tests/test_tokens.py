@@ -0,0 +1,23 @@
+from sqlalchemy import inspect, text
+
+from app.tokens import add_token_generation_column
+
+
+def test_migration_adds_token_generation_to_an_existing_users_table(database):
+    with database.begin() as conn:
+        conn.execute(text("DROP TABLE users"))
+        conn.execute(text(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR(255) NOT NULL, "
+            "hashed_password VARCHAR(255) NOT NULL, is_active BOOLEAN NOT NULL, locale VARCHAR(8) NOT NULL, "
+            "created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)"
+        ))
+        conn.execute(text(
+            "INSERT INTO users VALUES (1, 'old@example.com', 'x', 1, 'en', '2024-01-01', '2024-01-01')"
+        ))
+
+    with database.begin() as conn:
+        assert add_token_generation_column(conn) is True
+    with database.begin() as conn:
+        assert add_token_generation_column(conn) is False
+        assert "token_generation" in {column["name"] for column in inspect(conn).get_columns("users")}
+        assert conn.execute(text("SELECT token_generation FROM users")).scalar_one() == 0
@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal, dispose_engine
+from app.models import NotificationType, NotificationTypeTranslation
+from app.translations import migrate_translations
+
+
+async def _translations():
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(
+                NotificationTypeTranslation.notification_type_id,
+                NotificationTypeTranslation.field,
+                NotificationTypeTranslation.locale,
+                NotificationTypeTranslation.text,
+            )
+        )
+        return sorted(tuple(row) for row in result)
+
+
+@pytest.mark.anyio
+async def test_migration_upserts_and_removes_stale_rows(db):
+    db.add_all([
+        NotificationType(key="news", descriptions={"en": "News", "fr": "Nouvelles"}, deprecated_reason="Old"),
+        NotificationType(key="billing", descriptions={"en": "Billing"}),
+    ])
+    db.commit()
+    try:
+        async with AsyncSessionLocal() as session:
+            assert await migrate_translations(session) == (4, 0)
+
+        news = db.scalars(select(NotificationType).where(NotificationType.key == "news")).one()
+        news.descriptions = {"en": "Newsletter"}
+        news.deprecated_reason = None
+        db.commit()
+        async with AsyncSessionLocal() as session:
+            assert await migrate_translations(session) == (2, 2)
+
+        assert await _translations() == [
+            (1, "description", "en", "Newsletter"),
+            (2, "description", "en", "Billing"),
+        ]
+    finally:
+        await dispose_engine()
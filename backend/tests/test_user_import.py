@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import select
+
+from app.database import dispose_engine
+from app.models import User
+from app.password_hashing import pwd_context
+from app.user_import import import_users, prepare_row
+
+BCRYPT_HASH = pwd_context.hash("password123")
+
+
+def test_prepare_row_keeps_a_recognized_hash():
+    row, password = prepare_row({"email": "a@example.com", "hashed_password": BCRYPT_HASH})
+
+    assert row["hashed_password"] == BCRYPT_HASH
+    assert password is None
+
+
+@pytest.mark.parametrize("hashed_password", ["password123", "$1$salt$md5crypt", "$2b$12$short", 12345])
+def test_prepare_row_rejects_unrecognized_hashes(hashed_password):
+    with pytest.raises(ValueError, match="hashed_password"):
+        prepare_row({"email": "a@example.com", "hashed_password": hashed_password})
+
+
+def test_prepare_row_requires_a_password():
+    with pytest.raises(ValueError, match="required"):
+        prepare_row({"email": "a@example.com"})
+    with pytest.raises(ValueError, match="shorter"):
+        prepare_row({"email": "a@example.com", "password": "short"})
+
+
+@pytest.mark.anyio
+async def test_import_skips_invalid_rows_and_duplicates(db):
+    records = [
+        (2, {"email": "a@example.com", "hashed_password": BCRYPT_HASH, "locale": "fr"}),
+        (3, {"email": "b@example.com", "hashed_password": "plaintext-by-mistake"}),
+        (4, {"email": "c@example.com", "password": "password123", "is_active": "false"}),
+        (5, {"email": "a@example.com", "password": "password123"}),
+    ]
+    try:
+        summary = await import_users(iter(records), batch_size=2)
+    finally:
+        await dispose_engine()
+
+    assert summary.as_dict() == {"inserted": 2, "duplicates": 1, "invalid": 1}
+    users = {user.email: user for user in db.scalars(select(User))}
+    assert sorted(users) == ["a@example.com", "c@example.com"]
+    assert users["a@example.com"].locale == "fr"
+    assert users["c@example.com"].is_active is False
+    assert pwd_context.verify("password123", users["c@example.com"].hashed_password)
@@ -81,5 +81,82 @@ export async function fetchNotificationTypes(locale: string): Promise<Notificati
   return response.data;
 }
 
+export interface CatalogChange {
+  op: "insert" | "update" | "delete" | "resync";
+  table: string;
+  id?: number | null;
+  key?: string | null;
+}
+
+const STREAM_RETRY_MS = 5000;
+
+function parseServerSentEvent(block: string): { event: string; data: string } {
+  let event = "message";
+  const data: string[] = [];
+  for (const line of block.split("\n")) {
+    if (line.startsWith("event:")) {
+      event = line.slice(6).trim();
+    } else if (line.startsWith("data:")) {
+      data.push(line.slice(5).trim());
+    }
+  }
+  return { event, data: data.join("\n") };
+}
+
+// Subscribe to catalog changes pushed by the backend (Server-Sent Events).
+// Uses fetch rather than EventSource so the bearer token goes in a header, not the URL.
+// Reconnects until the returned unsubscribe function is called.
+export function subscribeToCatalogChanges(onChange: (change: CatalogChange) => void): () => void {
+  const controller = new AbortController();
+
+  const run = async () => {
+    while (!controller.signal.aborted) {
+      try {
+        const token = getAuthToken();
+        const response = await fetch(`${API_BASE_URL}/notifications/stream`, {
+          headers: {
+            Accept: "text/event-stream",
+            ...(token ? { Authorization: `Bearer ${token}` } : {}),
+          },
+          credentials: "include",
+          signal: controller.signal,
+        });
+        if (response.status === 401) {
+          return;
+        }
+        if (response.ok && response.body) {
+          const reader = response.body.getReader();
+          const decoder = new TextDecoder();
+          let buffer = "";
+          for (;;) {
+            const { value, done } = await reader.read();
+            if (done) {
+              break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            let boundary = buffer.indexOf("\n\n");
+            while (boundary >= 0) {
+              const { event, data } = parseServerSentEvent(buffer.slice(0, boundary));
+              buffer = buffer.slice(boundary + 2);
+              if (event === "catalog" && data) {
+                onChange(JSON.parse(data));
+              }
+              boundary = buffer.indexOf("\n\n");
+            }
+          }
+        }
+      } catch (err) {
+        if (controller.signal.aborted) {
+          return;
+        }
+      }
+      await new Promise((resolve) => setTimeout(resolve, STREAM_RETRY_MS));
+    }
+  };
+
+  run();
+  return () => controller.abort();
+}
+
 // Export apiClient for other endpoints
 export { apiClient };
\ No newline at end of file
@@ -1,7 +1,7 @@
 import React, { useEffect, useState, useCallback } from "react";
 import { useTranslation } from "react-i18next";
 import { NotificationTypeCard } from "./NotificationTypeCard";
-import { fetchNotificationTypes } from "../api/api";
+import { fetchNotificationTypes, subscribeToCatalogChanges } from "../api/api";
 import "../styles/NotificationPreferences.scss";
 
 interface NotificationType {
@@ -18,8 +18,10 @@ export const NotificationPreferences: React.FC = () => {
   const [loading, setLoading] = useState<boolean>(true);
   const [error, setError] = useState<string | null>(null);
 
-  const loadNotificationTypes = useCallback(async () => {
-    setLoading(true);
+  const loadNotificationTypes = useCallback(async (showLoading: boolean = true) => {
+    if (showLoading) {
+      setLoading(true);
+    }
     setError(null);
     try {
       const data = await fetchNotificationTypes(i18n.language);
@@ -40,6 +42,14 @@ export const NotificationPreferences: React.FC = () => {
     // Re-fetch when language changes
   }, [loadNotificationTypes]);
 
+  useEffect(() => {
+    // Refresh in place when the backend reports a catalog change (no polling)
+    const unsubscribe = subscribeToCatalogChanges(() => {
+      loadNotificationTypes(false);
+    });
+    return unsubscribe;
+  }, [loadNotificationTypes]);
+
   return (
     <section
       className="notification-preferences"
@@ -1,7 +1,7 @@
 import React from "react";
-import { render, screen, waitFor } from "@testing-library/react";
+import { act, render, screen, waitFor } from "@testing-library/react";
 import { NotificationPreferences } from "../NotificationPreferences";
-import { fetchNotificationTypes } from "../../api/api";
+import { fetchNotificationTypes, subscribeToCatalogChanges } from "../../api/api";
 import { I18nextProvider } from "react-i18next";
 import i18n from "../../i18n/i18n";
 import userEvent from "@testing-library/user-event";
@@ -9,10 +9,14 @@ import userEvent from "@testing-library/user-event";
 // Mock API
 jest.mock("../../api/api");
 const mockedFetchNotificationTypes = fetchNotificationTypes as jest.MockedFunction<typeof fetchNotificationTypes>;
+const mockedSubscribeToCatalogChanges = subscribeToCatalogChanges as jest.MockedFunction<
+  typeof subscribeToCatalogChanges
+>;
 
 describe("NotificationPreferences", () => {
   beforeEach(() => {
     jest.clearAllMocks();
+    mockedSubscribeToCatalogChanges.mockReturnValue(jest.fn());
   });
 
   it("renders loading indicator initially", async () => {
@@ -160,4 +164,65 @@ describe("NotificationPreferences", () => {
       expect(card).toHaveFocus();
     });
   });
-});
\ No newline at end of file
+
+  it("re-fetches notification types when the catalog changes", async () => {
+    mockedFetchNotificationTypes
+      .mockResolvedValueOnce({
+        notification_types: [
+          {
+            key: "email_alert",
+            description: "Email Alert",
+            is_active: true,
+            is_deprecated: false,
+          },
+        ],
+      })
+      .mockResolvedValueOnce({
+        notification_types: [
+          {
+            key: "email_alert",
+            description: "Email Alert",
+            is_active: true,
+            is_deprecated: true,
+            deprecated_reason: "This type is no longer supported.",
+          },
+        ],
+      });
+
+    render(
+      <I18nextProvider i18n={i18n}>
+        <NotificationPreferences />
+      </I18nextProvider>
+    );
+
+    await waitFor(() => {
+      expect(screen.getByText("Email Alert")).toBeInTheDocument();
+    });
+    const onChange = mockedSubscribeToCatalogChanges.mock.calls[0][0];
+    act(() => {
+      onChange({ op: "update", table: "notification_types", key: "email_alert" });
+    });
+
+    await waitFor(() => {
+      expect(screen.getByText(/no longer supported/i)).toBeInTheDocument();
+    });
+    expect(mockedFetchNotificationTypes).toHaveBeenCalledTimes(2);
+  });
+
+  it("unsubscribes from catalog changes on unmount", async () => {
+    const unsubscribe = jest.fn();
+    mockedSubscribeToCatalogChanges.mockReturnValue(unsubscribe);
+    mockedFetchNotificationTypes.mockResolvedValue({ notification_types: [] });
+
+    const { unmount } = render(
+      <I18nextProvider i18n={i18n}>
+        <NotificationPreferences />
+      </I18nextProvider>
+    );
+    await waitFor(() => {
+      expect(screen.getByText(/no notification types/i)).toBeInTheDocument();
+    });
+    unmount();
+    expect(unsubscribe).toHaveBeenCalled();
+  });
+});